@@ -1,16 +1,47 @@
 import sqlite3
 import functools
+import inspect
+import time
 from datetime import datetime
 
+QueryProfiler = __import__('query_profiler').QueryProfiler
 
-def log_queries(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        value = func(*args, **kwargs)
-        query = kwargs.get('query') or (args[0] if args else None) # retrieve the query from the kwargs or the args
-        print(query) # print the query before executing it
-        return value
-    return wrapper
+
+# log_queries times every call of the decorated function and writes the query, its
+# parameters, the duration and the row count as a JSON line to query_log.jsonl (rotated at
+# 10 MB). Statements slower than slow_ms get their EXPLAIN QUERY PLAN logged with them, and
+# sample_rate keeps hot paths from flooding the log:
+#   @log_queries
+#   @log_queries(slow_ms=50, sample_rate=0.01, path='queries.jsonl')
+#   @log_queries(arg='sql', params_arg='args')   # when the query is not in an argument called `query`
+# A call without the query argument is run but not logged.
+def log_queries(func=None, *, profiler=None, arg='query', params_arg='params', **options):
+    def decorator(func):
+        active = profiler or QueryProfiler(**options)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # retrieve the query (and its parameters, and a connection to explain it on) however they were passed
+            arguments = signature.bind(*args, **kwargs).arguments
+            query = arguments.get(arg)
+            if query is None:
+                return func(*args, **kwargs)
+            params = arguments.get(params_arg, ())
+            conn = next((value for value in arguments.values() if isinstance(value, sqlite3.Connection)), None)
+            start = time.perf_counter()
+            try:
+                value = func(*args, **kwargs)
+            except Exception as e:
+                active.record(func.__name__, query, params, time.perf_counter() - start, error=e, conn=conn)
+                raise
+            active.record(func.__name__, query, params, time.perf_counter() - start, value, conn=conn)
+            return value
+
+        wrapper.profiler = active
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
 
 @log_queries
 def fetch_all_users(query):
@@ -21,5 +52,6 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-users = fetch_all_users("SELECT name FROM users LIMIT 5;")
-print(users)
+if __name__ == "__main__":
+    users = fetch_all_users("SELECT name FROM users LIMIT 5;")
+    print(users)
@@ -1,17 +1,17 @@
 # create a decorator that automatically handles opening and closing database connections
 
-import sqlite3
 import functools
 from sqlite3 import Error
 
+db_pool = __import__('db_pool')
+
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            connection = sqlite3.connect('users.db')
-            value = func(connection, *args, **kwargs)
-            connection.close()
-            return value
+            # Borrow an open, tuned connection instead of connecting on every call
+            with db_pool.connection() as connection:
+                return func(connection, *args, **kwargs)
         except Error as e:
             print(f"Error occured: {e}")
     return wrapper
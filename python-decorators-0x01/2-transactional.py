@@ -1,14 +1,25 @@
 import functools
-import sqlite3
 from sqlite3 import Error
 
+cache_module = __import__('query_cache')
+db_pool = __import__('db_pool')
+unit_of_work = __import__('unit_of_work')
+
 
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        uow = unit_of_work.current()
+        if isinstance(uow, unit_of_work.UnitOfWork) and uow.connection is conn:
+            # Part of a unit of work: a savepoint now, one commit for all of them at its end
+            return uow.run(func, conn, *args, **kwargs)
         try:
-            value = func(conn, *args, **kwargs)
+            # Note every statement the transaction runs, to know which tables it writes
+            with cache_module.track_writes(conn) as statements:
+                value = func(conn, *args, **kwargs)
             conn.commit()  # Commit if successful
+            # Results cached by cache_query that read those tables are stale from now on
+            cache_module.invalidate_writes(conn, statements)
             return value
         except Error as e:
             conn.rollback()  # Rollback on error
@@ -20,18 +31,21 @@ def transactional(func):
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        connection = None
+        active = unit_of_work.current()
+        if isinstance(active, unit_of_work.WriteBehind):
+            # Queued; it runs (with a connection) when the write-behind queue is flushed
+            return active.submit(func, *args, **kwargs)
+        if active is not None:
+            # Inside a unit of work every call shares its connection and transaction
+            return func(active.connection, *args, **kwargs)
         try:
-            connection = sqlite3.connect('users.db')
-            # Pass connection as first argument
-            value = func(connection, *args, **kwargs)
-            return value
+            # Borrow a pooled connection; it goes back (rolled back if left mid-transaction) afterwards
+            with db_pool.connection() as connection:
+                # Pass connection as first argument
+                return func(connection, *args, **kwargs)
         except Error as e:
             print(f"Error occurred: {e}")
             raise
-        finally:
-            if connection:
-                connection.close()
     return wrapper
 
 
@@ -42,6 +56,7 @@ def update_user_email(conn, name, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE name = ?", (new_email, name))
 
 
-# Now call without conn (it's provided by decorator)
-update_user_email(name='Johnnie Mayer', new_email='Crawford_Cartwright@hotmail.com')
-print(update_user_email)
\ No newline at end of file
+if __name__ == "__main__":
+    # Now call without conn (it's provided by decorator)
+    update_user_email(name='Johnnie Mayer', new_email='Crawford_Cartwright@hotmail.com')
+    print(update_user_email)
@@ -1,28 +1,37 @@
 # create a decorator that retries database operations if they fail due to transient errors
-import sqlite3
 from sqlite3 import Error
 import functools
-import time
+import inspect
+
+db_pool = __import__('db_pool')
+retry_policy = __import__('retry_policy')
 
 # When dealing with decorators that take arguments, you have three levels:
 # Level 1 - Takes in the arguments of the decorator
 # Level 2 - Takes in the func to decorate
 # Level 3 - Takes the args of the func and executes it
-def retry_on_failure(retries=3, delays=2):
+#
+# Only transient errors ("database is locked", busy...) are retried, after a random sleep of
+# up to delays * 2**attempt seconds (capped at max_delay), within an optional overall
+# deadline. Retries draw on a process-wide budget and stop when the circuit breaker is
+# open (see retry_policy.py). Coroutine functions get an async wrapper that awaits the sleep.
+# The counters are on the wrapper: fetch_users_with_retry.metrics.snapshot()
+def retry_on_failure(retries=3, delays=0.05, max_delay=5.0, errors=retry_policy.RETRYABLE_ERRORS,
+                     messages=retry_policy.RETRYABLE_MESSAGES, deadline=None, budget=retry_policy.default_budget,
+                     breaker=retry_policy.default_breaker):
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(retries):
-                try:
-                    value = func(*args, **kwargs)
-                    return value # If func is successful, we return the value and it exits the loop completely
-                except Error as e:
-                    print(f"Error occured: {e}.Attempt {attempt + 1}/{retries}")
-                    if attempt < retries - 1:
-                        time.sleep(delays)
-                    else:
-                        print("All retries depleted")
-                        raise # Re-raise the exception
+        policy = retry_policy.RetryPolicy(retries, delays, max_delay, errors, messages, deadline, budget, breaker)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await policy.call_async(func, *args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return policy.call(func, *args, **kwargs)
+        wrapper.policy = policy
+        wrapper.metrics = policy.metrics
         # Ensure you return these in their correct position: yaani (outside)
         return wrapper
     return decorator
@@ -31,10 +40,9 @@ def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            connection = sqlite3.connect('users.db')
-            value = func(connection, *args, **kwargs)
-            connection.close()
-            return value
+            # Borrow an open, tuned connection instead of connecting on every call
+            with db_pool.connection() as connection:
+                return func(connection, *args, **kwargs)
         except Error as e:
             return e
     return wrapper
@@ -46,7 +54,8 @@ def fetch_users_with_retry(conn):
     cursor.execute("SELECT * FROM users")
     return cursor.fetchall()
 
-#### attempt to fetch users with automatic retry on failure
-
-users = fetch_users_with_retry()
-print(users)
\ No newline at end of file
+if __name__ == "__main__":
+    #### attempt to fetch users with automatic retry on failure
+    users = fetch_users_with_retry()
+    print(users)
+    print(fetch_users_with_retry.metrics.snapshot())
\ No newline at end of file
@@ -1,40 +1,74 @@
 # create a decorator that will caches the results of a database queries inorder to avoid redundant calls
 
-import time
 import functools
-import sqlite3
+import inspect
 from sqlite3 import Error
 
-query_cache = {}
+cache_module = __import__('query_cache')
+db_pool = __import__('db_pool')
 
-# Use the cache key and its results as the value. This will help in querying
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Retrieve the cache_key from the query argument passed
-        cache_key = kwargs.get('query')
+# Kept under its old name: the shared, bounded cache the decorator stores results in
+query_cache = cache_module.default_cache
 
-        # Check whether the cache_key exists and then return the results it has instead.
-        if cache_key in query_cache:
-            return query_cache[cache_key]
-        
-        try:
-            # Run the function
-            items = func(*args, **kwargs)
-            query_cache[cache_key] = items # Store the cache_key and its results in the query_cache db
-            return items
-        except Error as e:
-            print(f"Error occured: {e}")
-    return wrapper
+# The key is the database file + the normalised SQL + every other argument of the call (the
+# query parameters), so a positional query, different parameters or another database
+# never get each other's results.
+# Use @cache_query, or @cache_query(ttl=60) / @cache_query(cache=QueryCache(...)) to tune it.
+# Concurrent misses on one key run the query once: the other threads wait for that result
+# (see fetch_users_with_cache.stampede_info()).
+def cache_query(func=None, *, cache=None, ttl=...):
+    def decorator(func):
+        store = query_cache if cache is None else cache
+        signature = inspect.signature(func)
+        flights = cache_module.SingleFlight()
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            # Retrieve the query and its parameters however they were passed
+            arguments = signature.bind(conn, *args, **kwargs).arguments
+            arguments.pop(next(iter(signature.parameters)))  # the connection is not part of the key
+            query = arguments.pop('query')
+            database = cache_module.database_of(conn)
+            cache_key = cache_module.make_key(database, query, arguments)
+
+            # Check whether the cache_key exists (and no commit wrote to its tables since) and then return the results it has instead.
+            hit, items = store.get(cache_key)
+            if hit:
+                return items
+
+            def run():
+                # A leader that finished between our miss and this flight may have stored it already
+                hit, items = store.get(cache_key, count=False)
+                if hit:
+                    return items
+                # Note the versions of the tables the query reads before running it
+                depends_on = cache_module.dependencies(database, query)
+                stamp = store.versions.current(depends_on)
+                # Run the function
+                items = func(conn, *args, **kwargs)
+                store.set(cache_key, items, ttl, depends_on, stamp) # Store the results under the cache_key
+                return items
+
+            try:
+                # Only one thread per cache_key runs it, the others get the same items (or error)
+                return flights.do(cache_key, run)
+            except Error as e:
+                print(f"Error occured: {e}")
+
+        wrapper.cache_info = store.info
+        wrapper.cache_clear = store.clear
+        wrapper.stampede_info = flights.info
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            connection = sqlite3.connect('users.db')
-            value = func(connection, *args, **kwargs)
-            connection.close()
-            return value
+            # Borrow an open, tuned connection instead of connecting on every call
+            with db_pool.connection() as connection:
+                return func(connection, *args, **kwargs)
         except Error as e:
             return e
     return wrapper
@@ -48,11 +82,13 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
-#### First call will cache the result
-users = fetch_users_with_cache(query="SELECT * FROM users LIMIT 5")
+if __name__ == "__main__":
+    #### First call will cache the result
+    users = fetch_users_with_cache(query="SELECT * FROM users LIMIT 5")
 
 
-#### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    #### Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users LIMIT 5")
 
-print(users_again)
\ No newline at end of file
+    print(users_again)
+    print(fetch_users_with_cache.cache_info())
@@ -0,0 +1,120 @@
+# async versions of with_db_connection, transactional, retry_on_failure and cache_query for
+# aiosqlite query functions (async def f(conn, ...)), so they get the same connection
+# management and caching without blocking the event loop
+import asyncio
+import functools
+import inspect
+from sqlite3 import Error
+
+cache_module = __import__('query_cache')
+async_db_pool = __import__('async_db_pool')
+
+# retry_on_failure already awaits the backoff sleep when it decorates a coroutine function
+retry_on_failure = __import__('3-retry_on_failure').retry_on_failure
+
+
+def with_db_connection(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            # Borrow a pooled aiosqlite connection; it goes back (rolled back if left mid-transaction) afterwards
+            async with async_db_pool.connection() as connection:
+                return await func(connection, *args, **kwargs)
+        except Error as e:
+            print(f"Error occurred: {e}")
+            raise
+    return wrapper
+
+
+def transactional(func):
+    @functools.wraps(func)
+    async def wrapper(conn, *args, **kwargs):
+        statements = []
+        try:
+            # Note every statement the transaction runs, to know which tables it writes
+            await conn.set_trace_callback(statements.append)
+            try:
+                value = await func(conn, *args, **kwargs)
+            finally:
+                await conn.set_trace_callback(None)
+            await conn.commit()  # Commit if successful
+            # Results cached by cache_query (sync or async) that read those tables are stale from now on
+            cache_module.bump_written(await async_db_pool.database_of(conn), statements)
+            return value
+        except Error as e:
+            await conn.rollback()  # Rollback on error
+            print(f"Error occurred: {e}")
+            raise  # Re-raise so caller knows it failed
+    return wrapper
+
+
+# Same keys, shared cache and invalidation as the sync cache_query. On a miss only one task
+# per key runs the query; the others wait for its result (see .stampede_info()).
+def cache_query(func=None, *, cache=None, ttl=...):
+    def decorator(func):
+        store = cache_module.default_cache if cache is None else cache
+        signature = inspect.signature(func)
+        flights = cache_module.AsyncSingleFlight()
+
+        @functools.wraps(func)
+        async def wrapper(conn, *args, **kwargs):
+            # Retrieve the query and its parameters however they were passed
+            arguments = signature.bind(conn, *args, **kwargs).arguments
+            arguments.pop(next(iter(signature.parameters)))  # the connection is not part of the key
+            query = arguments.pop('query')
+            database = await async_db_pool.database_of(conn)
+            cache_key = cache_module.make_key(database, query, arguments)
+
+            hit, items = store.get(cache_key)
+            if hit:
+                return items
+
+            async def run():
+                # A leader that finished between our miss and this flight may have stored it already
+                hit, items = store.get(cache_key, count=False)
+                if hit:
+                    return items
+                # Note the versions of the tables the query reads before running it
+                depends_on = cache_module.dependencies(database, query)
+                stamp = store.versions.current(depends_on)
+                items = await func(conn, *args, **kwargs)
+                store.set(cache_key, items, ttl, depends_on, stamp)
+                return items
+
+            try:
+                return await flights.do(cache_key, run)
+            except Error as e:
+                print(f"Error occured: {e}")
+
+        wrapper.cache_info = store.info
+        wrapper.cache_clear = store.clear
+        wrapper.stampede_info = flights.info
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+@with_db_connection
+@cache_query
+async def async_fetch_users(conn, query):
+    cursor = await conn.execute(query)
+    return await cursor.fetchall()
+
+
+@with_db_connection
+@retry_on_failure(retries=3, delays=0.1)
+@transactional
+async def async_update_user_email(conn, name, new_email):
+    await conn.execute("UPDATE users SET email = ? WHERE name = ?", (new_email, name))
+
+
+async def main():
+    # Ten concurrent identical queries run it once; the rest wait for the cached result
+    results = await asyncio.gather(*(async_fetch_users(query="SELECT * FROM users WHERE age > 100")
+                                     for _ in range(10)))
+    print(len(results[0]), async_fetch_users.cache_info(), async_fetch_users.stampede_info())
+    await async_db_pool.get_pool().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+# aiosqlite counterpart of db_pool.py, for the async decorators (5-async_decorators.py):
+#
+#   async with async_db_pool.connection() as connection:
+#       ...
+#
+# Up to `size` connections per event loop, tuned once when opened with the same PRAGMAs as
+# db_pool and instrumented for statement_stats the same way (aiosqlite runs the sqlite3
+# connection in its own thread, so none of this blocks the loop). On the way back a
+# connection has its open transaction rolled back and its callbacks cleared.
+import asyncio
+import os
+import sqlite3
+import weakref
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+db_pool = __import__('db_pool')
+InstrumentedConnection = __import__('statement_stats').InstrumentedConnection
+
+# aiosqlite connection -> the file it is attached to, as query_cache.database_of reports it
+_databases = weakref.WeakKeyDictionary()
+
+
+async def tune(connection, pragmas=db_pool.DEFAULT_PRAGMAS):
+    """The default init hook: apply db_pool's PRAGMAs to a freshly opened connection"""
+    for pragma in pragmas:
+        await connection.execute(pragma)
+
+
+async def database_of(connection):
+    """query_cache.database_of for aiosqlite connections (looked up once per connection)"""
+    database = _databases.get(connection)
+    if database is None:
+        database = ''
+        for _, name, path in await connection.execute_fetchall("PRAGMA database_list"):
+            if name == 'main':
+                database = path
+        _databases[connection] = database
+    return database
+
+
+class AsyncSQLitePool:
+    """Reusable aiosqlite connections to one database file, for one event loop.
+
+    A checkout waits up to `timeout` seconds when all `size` connections are in use;
+    `init` runs once on each new connection (None skips tuning).
+    """
+
+    def __init__(self, database='users.db', size=5, init=tune, cached_statements=512, timeout=30, instrument=True):
+        self.database = database
+        self.size = size
+        self.init = init
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.instrument = instrument
+        self._idle = []
+        self._all = []
+        self._slots = asyncio.Semaphore(size)
+        self._counters = dict(created=0, checkouts=0, waits=0, discarded=0)
+
+    async def _create(self):
+        connection = await aiosqlite.connect(self.database, cached_statements=self.cached_statements,
+                                             factory=InstrumentedConnection if self.instrument else sqlite3.Connection)
+        try:
+            if self.init is not None:
+                await self.init(connection)
+            await database_of(connection)
+        except BaseException:
+            await connection.close()
+            raise
+        self._all.append(connection)
+        self._counters['created'] += 1
+        return connection
+
+    async def acquire(self):
+        """Check a connection out; prefer `async with pool.connection()` which gives it back"""
+        self._counters['checkouts'] += 1
+        if not self._slots.locked():
+            await self._slots.acquire()  # returns at once, without wait_for's extra task
+        else:
+            self._counters['waits'] += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise sqlite3.OperationalError(
+                    f"No connection available after {self.timeout}s (pool size {self.size})")
+        try:
+            return self._idle.pop() if self._idle else await self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, connection):
+        """Reset the connection and make it available again"""
+        try:
+            if connection.in_transaction:
+                await connection.rollback()
+            await connection.set_trace_callback(None)
+            connection.row_factory = None
+        except (sqlite3.Error, ValueError):  # aiosqlite raises ValueError once a connection is closed
+            await self._discard(connection)
+        else:
+            self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    async def _discard(self, connection):
+        if connection in self._all:
+            self._all.remove(connection)
+        self._counters['discarded'] += 1
+        try:
+            await connection.close()
+        except (sqlite3.Error, ValueError):
+            pass
+
+    @asynccontextmanager
+    async def connection(self):
+        connection = await self.acquire()
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    async def close(self):
+        """Close every connection (await it when no task is using the pool any more)"""
+        connections, self._all, self._idle = self._all, [], []
+        for connection in connections:
+            try:
+                await connection.close()
+            except (sqlite3.Error, ValueError):
+                pass
+
+    def stats(self):
+        return dict(self._counters, open=len(self._all), idle=len(self._idle))
+
+
+# one pool per event loop: asyncio primitives and tasks do not cross loops
+_pools = weakref.WeakKeyDictionary()
+_options = {}
+
+
+def configure(database=None, **options):
+    """Settings for the shared pools, e.g. configure(database='test.db', size=10)
+
+    Pools opened before keep their connections; close them with `await get_pool().close()`.
+    """
+    _options.clear()
+    _options.update(options, database=database or os.environ.get('database', 'users.db'))
+    _pools.clear()
+
+
+def get_pool():
+    """The shared pool of the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        options = _options or dict(database=os.environ.get('database', 'users.db'))
+        pool = _pools[loop] = AsyncSQLitePool(**options)
+    return pool
+
+
+def connection():
+    """`async with async_db_pool.connection() as connection:` on the shared pool"""
+    return get_pool().connection()
@@ -0,0 +1,57 @@
+# Microbenchmark for db_pool.py: per-call cost of a with_db_connection-style call that
+# connects to users.db, runs one primary-key (rowid) lookup and closes, against the same call on a
+# pooled or per-thread connection (and on a pooled one without statement_stats instrumentation).
+#
+# usage: python bench_connection.py [--calls 20000] [--database ../users.db]
+import argparse
+import sqlite3
+import time
+
+db_pool = __import__('db_pool')
+
+
+def lookup(connection, rowid):
+    return connection.execute("SELECT * FROM users WHERE rowid = ?", (rowid,)).fetchone()
+
+
+def connect_per_call(database, rowids):
+    for rowid in rowids:
+        connection = sqlite3.connect(database)
+        lookup(connection, rowid)
+        connection.close()
+
+
+def pooled(pool, rowids):
+    for rowid in rowids:
+        with pool.connection() as connection:
+            lookup(connection, rowid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sqlite3.connect per call vs db_pool connections")
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--database', default='../users.db')
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.database) as connection:
+        ids = [row[0] for row in connection.execute("SELECT rowid FROM users")]
+    rowids = [ids[i % len(ids)] for i in range(args.calls)]
+
+    runs = [('connect per call', lambda: connect_per_call(args.database, rowids))]
+    for mode in db_pool.MODES:
+        pool = db_pool.SQLitePool(args.database, mode=mode)
+        runs.append((f"db_pool mode={mode}", lambda pool=pool: pooled(pool, rowids)))
+    plain = db_pool.SQLitePool(args.database, instrument=False)
+    runs.append(("db_pool uninstrumented", lambda: pooled(plain, rowids)))
+
+    baseline = None
+    for name, run in runs:
+        start = time.perf_counter()
+        run()
+        per_call = (time.perf_counter() - start) / args.calls
+        baseline = baseline or per_call
+        print(f"{name:>22}: {1e6 * per_call:>8.1f} us/call  {baseline / per_call:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
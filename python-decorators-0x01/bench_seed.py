@@ -0,0 +1,48 @@
+# Benchmark for seed_data: the original row-by-row loop against the bulk path on a generated CSV.
+# Both runs load into fresh SQLite files in a temporary directory, users.db is left alone.
+#
+# usage: python bench_seed.py [--rows 1000000]
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+seed = __import__('seed')
+
+
+def write_csv(path, rows):
+    random.seed(0)
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(['name', 'email', 'age'])
+        for n in range(rows):
+            writer.writerow([f"Bench User {n}", f"bench.user{n}@example.com", random.randint(18, 100)])
+
+
+def timed_seed(csv_path, database, bulk):
+    seed.connect_to_db(database)
+    start = time.perf_counter()
+    count = seed.seed_data(csv_path, database, bulk=bulk)
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Row loop vs bulk seeding into SQLite")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'user_data.csv')
+        write_csv(csv_path, args.rows)
+        results = {}
+        for bulk in (False, True):
+            count, elapsed = timed_seed(csv_path, os.path.join(tmp, f"users-{bulk}.db"), bulk)
+            results[bulk] = count / elapsed
+        print(f"row loop: {results[False]:,.0f} rows/s  bulk: {results[True]:,.0f} rows/s  "
+              f"speedup: {results[True] / results[False]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Benchmark for unit_of_work.py: bulk update_user_email calls (2-transactional.py) committed
+# one by one, grouped in a UnitOfWork, and queued in a WriteBehind (with and without coalescing).
+# The copy gets an index on users(name), so each UPDATE is a cheap index lookup and what is
+# measured is the cost of a commit per call. It runs first with the pool's own settings
+# (journal_mode=WAL, synchronous=NORMAL), where grouping is worth about 2x, then with
+# SQLite's defaults (DELETE, FULL), where every commit fsyncs and it is worth 10-20x.
+# --journal / --synchronous run a single setting instead; --no-index makes every UPDATE a scan.
+# Work on a copy, the updates are real:
+#
+# usage: cp ../users.db /tmp/users.db
+#        python bench_unit_of_work.py --database /tmp/users.db [--calls 10000] [--journal DELETE] [--synchronous FULL]
+import argparse
+import sqlite3
+import time
+
+db_pool = __import__('db_pool')
+unit_of_work = __import__('unit_of_work')
+update_user_email = __import__('2-transactional').update_user_email
+
+
+def one_by_one(changes):
+    for name, email in changes:
+        update_user_email(name=name, new_email=email)
+
+
+def grouped(changes):
+    with unit_of_work.UnitOfWork():
+        for name, email in changes:
+            update_user_email(name=name, new_email=email)
+
+
+def write_behind(changes):
+    with unit_of_work.WriteBehind(flush_every=1000, flush_ms=50):
+        for name, email in changes:
+            update_user_email(name=name, new_email=email)
+
+
+def coalesced(changes):
+    # only the last email queued for a name is written
+    with unit_of_work.WriteBehind(flush_every=1000, flush_ms=50, key=lambda call: call['name']):
+        for name, email in changes:
+            update_user_email(name=name, new_email=email)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-call commits vs UnitOfWork vs WriteBehind")
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--calls', type=int, default=10_000)
+    parser.add_argument('--synchronous', help="NORMAL (the pool's) or FULL (SQLite's default)")
+    parser.add_argument('--journal', help="WAL (the pool's) or DELETE (SQLite's default)")
+    parser.add_argument('--no-index', dest='index', action='store_false',
+                        help="leave users(name) unindexed: every UPDATE scans the table")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    names = [row[0] for row in connection.execute("SELECT name FROM users")]
+    if args.index:
+        connection.execute("CREATE INDEX IF NOT EXISTS users_name ON users(name)")
+    connection.close()
+    changes = [(names[i % len(names)], f"user{i}@example.com") for i in range(args.calls)]
+
+    # the pool's settings first: that is what the decorators run with
+    settings = [('WAL', 'NORMAL'), ('DELETE', 'FULL')]
+    if args.journal or args.synchronous:
+        settings = [(args.journal or 'WAL', args.synchronous or 'NORMAL')]
+    for journal, synchronous in settings:
+        run_setting(args.database, changes, journal, synchronous, args.index)
+
+
+def run_setting(database, changes, journal, synchronous, index):
+    connection = sqlite3.connect(database)
+    connection.execute(f"PRAGMA journal_mode = {journal}")
+    connection.close()
+
+    pragmas = [pragma for pragma in db_pool.DEFAULT_PRAGMAS if 'journal_mode' not in pragma]
+    pragmas.append(f"PRAGMA synchronous = {synchronous}")
+
+    def init(connection):
+        db_pool.tune(connection, pragmas)
+
+    pool = db_pool.configure(database, init=init)
+    print(f"journal_mode={journal} synchronous={synchronous} index={index}")
+    baseline = None
+    for name, run in (('commit per call', one_by_one), ('UnitOfWork', grouped), ('WriteBehind', write_behind),
+                      ('WriteBehind key=name', coalesced)):
+        start = time.perf_counter()
+        run(changes)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{name:>20}: {len(changes) / elapsed:>10,.0f} updates/s  {baseline / elapsed:>6.1f}x")
+    # the journal mode cannot change while the pool still has the database open
+    pool.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Connection provider for the with_db_connection decorators.
+# sqlite3.connect() opens the file and parses the schema on every call; this module keeps
+# connections open and hands them out again instead:
+#
+#   with db_pool.connection() as connection:
+#       ...
+#
+# Connections are either pooled (shared by all threads, one at a time) or kept one per
+# thread, are tuned once when opened (WAL, synchronous=NORMAL, mmap, cache size, busy
+# timeout) and get a larger statement cache. On the way back a connection has its open
+# transaction rolled back and its callbacks cleared, so no call sees another one's state.
+# Every statement run on them is counted in statement_stats (instrument=False turns that off).
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+InstrumentedConnection = __import__('statement_stats').InstrumentedConnection
+
+DEFAULT_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",        # readers no longer block the writer (and vice versa)
+    "PRAGMA synchronous = NORMAL",      # safe with WAL, skips an fsync per commit
+    "PRAGMA mmap_size = 268435456",     # read pages straight from a 256 MiB memory map
+    "PRAGMA cache_size = -65536",       # 64 MiB page cache per connection
+    "PRAGMA busy_timeout = 5000",       # wait up to 5s for a lock instead of failing at once
+)
+MODES = ('pool', 'thread')
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced (query_cache remembers its database)"""
+
+
+def tune(connection, pragmas=DEFAULT_PRAGMAS):
+    """The default init hook: apply the PRAGMAs above to a freshly opened connection"""
+    for pragma in pragmas:
+        connection.execute(pragma)
+
+
+class SQLitePool:
+    """Reusable SQLite connections to one database file.
+
+    mode='pool' shares up to `size` connections between all threads (a checkout waits up to
+    `timeout` seconds when they are all in use); mode='thread' gives every thread its own
+    connection. `init` runs once on each new connection (None skips tuning).
+    """
+
+    def __init__(self, database='users.db', size=5, mode='pool', init=tune, cached_statements=512, timeout=30,
+                 instrument=True):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.database = database
+        self.size = size
+        self.mode = mode
+        self.init = init
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.instrument = instrument
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+        self._open = 0  # connections open or being opened in 'pool' mode, at most `size`
+        self._counters = dict(created=0, checkouts=0, waits=0, discarded=0)
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._open < self.size:
+                self._open += 1
+                return True
+            return False
+
+    def _release_slot(self):
+        with self._lock:
+            self._open -= 1
+
+    def _create(self):
+        connection = sqlite3.connect(self.database, cached_statements=self.cached_statements,
+                                     check_same_thread=self.mode == 'thread',
+                                     factory=InstrumentedConnection if self.instrument else PooledConnection)
+        if self.init is not None:
+            self.init(connection)
+        with self._lock:
+            self._all.append(connection)
+            self._counters['created'] += 1
+        return connection
+
+    def acquire(self):
+        """Check a connection out; prefer `with pool.connection()` which gives it back"""
+        with self._lock:
+            self._counters['checkouts'] += 1
+        if self.mode == 'thread':
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = self._create()
+            return connection
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            # reserve the slot before connecting, so concurrent checkouts cannot open more than `size`
+            if self._reserve_slot():
+                try:
+                    return self._create()
+                except BaseException:
+                    self._release_slot()
+                    raise
+            if not waited:
+                waited = True
+                with self._lock:
+                    self._counters['waits'] += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise sqlite3.OperationalError(f"No connection available after {self.timeout}s (pool size {self.size})")
+            try:
+                # short waits: a discarded connection frees a slot without anything being put back
+                return self._idle.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                continue
+
+    def release(self, connection):
+        """Reset the connection and make it available again"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            connection.set_trace_callback(None)
+            connection.row_factory = None
+        except sqlite3.Error:
+            self._discard(connection)
+            return
+        if self.mode == 'pool':
+            self._idle.put(connection)
+
+    def _discard(self, connection):
+        with self._lock:
+            if connection in self._all:
+                self._all.remove(connection)
+                if self.mode == 'pool':
+                    self._open -= 1
+            self._counters['discarded'] += 1
+        if getattr(self._local, 'connection', None) is connection:
+            self._local.connection = None
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Close every connection (call it when no thread is using the pool any more)"""
+        with self._lock:
+            connections, self._all = self._all, []
+            self._open = 0
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters, open=len(self._all))
+        counters['idle'] = self._idle.qsize()
+        return counters
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def configure(database=None, **options):
+    """Replace the shared pool, e.g. configure(database='test.db', mode='thread')"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        _default_pool = SQLitePool(database or os.environ.get('database', 'users.db'), **options)
+        return _default_pool
+
+
+def get_pool():
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SQLitePool(os.environ.get('database', 'users.db'))
+        return _default_pool
+
+
+def connection():
+    """`with db_pool.connection() as connection:` on the shared pool"""
+    return get_pool().connection()
@@ -0,0 +1,411 @@
+# Result cache behind the cache_query decorator (4-cache_query.py).
+# Entries are keyed on the database file, the normalised SQL and the query parameters, expire
+# after a TTL, and are evicted least-recently-used first once the cache holds more than
+# `max_entries` results or more than `max_bytes` (an estimate of the size of the rows).
+#
+# Every entry also remembers the tables its query reads and the version of each of those
+# tables when it was stored. transactional (2-transactional.py) bumps the version of every
+# table a commit wrote to, which turns exactly the entries that read them into misses.
+# A query whose FROM clauses cannot be parsed depends on every table of its database.
+#
+# SingleFlight (and AsyncSingleFlight for coroutines) coalesce concurrent misses: while one
+# caller runs the query for a key, the others arriving with the same key wait for its result
+# instead of running it again (no stampede after a restart or when a hot entry expires).
+import asyncio
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions expirations invalidations entries bytes '
+                                    'max_entries max_bytes')
+StampedeInfo = namedtuple('StampedeInfo', 'leaders coalesced errors in_flight max_waiters')
+
+# string literals, quoted identifiers, then runs of whitespace
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)|(\s+)")
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NAME = r'[`"\[]?\w+[`"\]]?'
+_TABLE = rf'((?:{_NAME}\.)?{_NAME})'
+# identifiers (bare or quoted), numbers, and single punctuation characters
+_WORDS = re.compile(r'"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|\w+|[^\w\s]')
+# words that end a FROM list (or a table alias) where another table or alias could not be
+_CLAUSE_WORDS = frozenset('''
+    WHERE GROUP ORDER LIMIT OFFSET HAVING WINDOW JOIN INNER LEFT RIGHT FULL CROSS NATURAL OUTER ON
+    USING UNION EXCEPT INTERSECT INDEXED NOT RETURNING SET VALUES AS SELECT FROM
+'''.split())
+ALL_TABLES = '*'  # stands for every table of a database when a query's tables are not known
+_WRITTEN_TABLES = re.compile(
+    r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM'
+    r'|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+' + _TABLE,
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside of quotes and drop the trailing semicolon
+
+    "SELECT *  FROM users;" and "SELECT * FROM users" then share one cache entry, while
+    'a  b' inside a string literal is left alone.
+    """
+    sql = _SQL_TOKENS.sub(lambda m: m.group(1) or ' ', sql.strip())
+    return sql.rstrip('; ')
+
+
+def freeze(value):
+    """A hashable stand-in for query parameters (lists, dicts and sets are common there)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+
+# connection -> the file it is attached to, so cache hits do not run a PRAGMA every time
+_databases = weakref.WeakKeyDictionary()
+
+
+def database_of(conn):
+    """The file an sqlite3 connection is attached to ('' for in-memory databases)"""
+    try:
+        return _databases[conn]
+    except (KeyError, TypeError):  # TypeError: a plain sqlite3.Connection cannot be weakly referenced
+        pass
+    database = ''
+    # sqlite3.Connection.execute skips statement_stats' instrumentation: this is bookkeeping, not a query
+    for _, name, path in sqlite3.Connection.execute(conn, "PRAGMA database_list"):
+        if name == 'main':
+            database = path
+    try:
+        _databases[conn] = database
+    except TypeError:
+        pass
+    return database
+
+
+def _table_names(pattern, sql):
+    names = set()
+    for match in pattern.finditer(_STRING_LITERALS.sub("''", sql)):
+        # main.users -> users
+        names.add(match.group(1).split('.')[-1].strip('`"[]').lower())
+    return names
+
+
+def _unquote(word):
+    return word.strip('`"[]').lower()
+
+
+def _read_list(words, i):
+    """The tables of the FROM list (or JOIN target) starting at words[i], None when it is not understood"""
+    tables = set()
+    while True:
+        if i >= len(words):
+            return None
+        if words[i] == '(':
+            # a subquery or a parenthesised join: its own FROMs are read where they are
+            depth = 0
+            for i in range(i, len(words)):
+                depth += {'(': 1, ')': -1}.get(words[i], 0)
+                if not depth:
+                    break
+            else:
+                return None
+            i += 1
+        elif words[i][0] in '"`[' or words[i][0].isalpha() or words[i][0] == '_':
+            name = words[i]
+            i += 1
+            while i + 1 < len(words) and words[i] == '.':
+                name = words[i + 1]  # schema.table -> table
+                i += 2
+            if i < len(words) and words[i] == '(':
+                return None  # a table-valued function (json_each(...)): what it reads is not a table name
+            tables.add(_unquote(name))
+        else:
+            return None
+        # optional alias
+        if i < len(words) and words[i].upper() == 'AS':
+            i += 2
+        elif i < len(words) and words[i] not in ',;)' and words[i].upper() not in _CLAUSE_WORDS:
+            i += 1
+        if i < len(words) and words[i] == ',':
+            i += 1
+            continue
+        return tables
+
+
+def tables_read(sql):
+    """The tables a statement reads from (every FROM list and JOIN, subqueries included)
+
+    None when a FROM clause cannot be parsed with confidence: callers must then assume the
+    statement may read any table.
+    """
+    words = _WORDS.findall(_STRING_LITERALS.sub("''", sql))
+    tables = set()
+    for i, word in enumerate(words):
+        if word.upper() in ('FROM', 'JOIN'):
+            found = _read_list(words, i + 1)
+            if found is None:
+                return None
+            tables |= found
+    return tables
+
+
+def tables_written(sql):
+    """The tables a statement writes to (INSERT, REPLACE, UPDATE, DELETE, DROP/ALTER TABLE)"""
+    return _table_names(_WRITTEN_TABLES, sql)
+
+
+class TableVersions:
+    """A counter per (database, table), bumped whenever a commit wrote to that table"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def current(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+table_versions = TableVersions()
+
+
+def dependencies(database, query):
+    """The (database, table) pairs a cached result of `query` depends on
+
+    A query whose tables are not known depends on ALL_TABLES, which every write to the
+    database bumps.
+    """
+    tables = tables_read(query)
+    if tables is None:
+        return ((database, ALL_TABLES),)
+    return tuple(sorted((database, table) for table in tables))
+
+
+@contextmanager
+def track_writes(conn):
+    """Collect every statement run on `conn` inside the block (sqlite3 trace callback)"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        conn.set_trace_callback(None)
+
+
+def invalidate_writes(conn, statements, versions=None):
+    """Bump the version of every table these (committed) statements wrote to"""
+    return bump_written(database_of(conn), statements, versions)
+
+
+def bump_written(database, statements, versions=None):
+    """invalidate_writes for a database given by its path (async connections look it up themselves)"""
+    written = set()
+    for statement in set(statements):  # a batch of writes repeats the same few statements
+        written.update(tables_written(statement))
+    if written:
+        written_keys = [(database, table) for table in written]
+        (versions or table_versions).bump(written_keys + [(database, ALL_TABLES)])
+    return written
+
+
+def make_key(database, query, params=()):
+    return (database, normalize_sql(query), freeze(params))
+
+
+def approximate_size(value, _depth=0):
+    """sys.getsizeof of a result and of the rows/values inside it (two levels deep)"""
+    size = sys.getsizeof(value)
+    if _depth < 2 and isinstance(value, (list, tuple)):
+        size += sum(approximate_size(item, _depth + 1) for item in value)
+    elif _depth < 2 and isinstance(value, dict):
+        size += sum(approximate_size(item, _depth + 1) for item in value.values())
+    return size
+
+
+class QueryCache:
+    """A thread-safe LRU cache with a per-entry TTL, bounded by entry count and bytes"""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300, versions=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.versions = versions or table_versions
+        # key -> (value, size, expires_at, depends_on, stamp); ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+
+    def get(self, key, count=True):
+        """(True, value) on a hit, (False, None) on a miss
+
+        count=False looks again without counting a second hit or miss for one lookup.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires_at, depends_on, stamp = entry
+                if expires_at is not None and time.monotonic() >= expires_at:
+                    self._remove(key)
+                    self._expirations += 1
+                elif depends_on and self.versions.current(depends_on) != stamp:
+                    # a commit wrote to one of the tables this result was read from
+                    self._remove(key)
+                    self._invalidations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += count
+                    return True, value
+            self._misses += count
+            return False, None
+
+    def set(self, key, value, ttl=..., depends_on=(), stamp=None):
+        """Store `value`; depends_on lists the (database, table) pairs it was read from.
+
+        Take the stamp (self.versions.current(depends_on)) before running the query, so a
+        commit that lands while it runs still invalidates the result.
+        """
+        ttl = self.ttl if ttl is ... else ttl
+        size = approximate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        depends_on = tuple(depends_on)
+        if stamp is None:
+            stamp = self.versions.current(depends_on)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at, depends_on, stamp)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes and self._bytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[1]
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._expirations, self._invalidations,
+                             len(self._entries), self._bytes, self.max_entries, self.max_bytes)
+
+
+# the cache cache_query uses unless it is given its own
+default_cache = QueryCache()
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error', 'abandoned', 'waiters')
+
+    def __init__(self, done):
+        self.done = done
+        self.value = self.error = None
+        self.abandoned = False  # the leader stopped on a BaseException (KeyboardInterrupt, cancellation)
+        self.waiters = 0
+
+
+class SingleFlight:
+    """One call per key at a time; threads asking for a key already in flight share its outcome"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._leaders = self._coalesced = self._errors = self._max_waiters = 0
+
+    def _join(self, key, new_done):
+        """(flight, True) for the caller that has to run it, (flight, False) for the ones that wait"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(new_done())
+                self._leaders += 1
+                return flight, True
+            flight.waiters += 1
+            self._coalesced += 1
+            self._max_waiters = max(self._max_waiters, flight.waiters)
+            return flight, False
+
+    def _land(self, key, flight, error):
+        with self._lock:
+            del self._flights[key]
+            if error is None:
+                return
+            self._errors += 1
+            if isinstance(error, Exception):
+                flight.error = error
+            else:
+                # it is the leader's to handle, not the waiters': they run the call themselves
+                flight.abandoned = True
+
+    def do(self, key, func, *args, **kwargs):
+        """func(*args, **kwargs), unless a call for `key` is already running: then its result (or error)"""
+        flight, leader = self._join(key, threading.Event)
+        if not leader:
+            flight.done.wait()
+            if flight.abandoned:
+                return self.do(key, func, *args, **kwargs)
+        else:
+            error = None
+            try:
+                flight.value = func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._land(key, flight, error)
+                flight.done.set()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def info(self):
+        with self._lock:
+            return StampedeInfo(self._leaders, self._coalesced, self._errors, len(self._flights), self._max_waiters)
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutine functions, within one event loop"""
+
+    async def do(self, key, func, *args, **kwargs):
+        flight, leader = self._join(key, asyncio.Event)
+        if not leader:
+            # shielded: a waiter that is cancelled must not cancel the call the others wait for
+            await asyncio.shield(flight.done.wait())
+            if flight.abandoned:
+                # the task running it was cancelled, not ours: one of the waiters runs it again
+                return await self.do(key, func, *args, **kwargs)
+        else:
+            error = None
+            try:
+                flight.value = await func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._land(key, flight, error)
+                flight.done.set()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
@@ -0,0 +1,105 @@
+# Profiling backend of the log_queries decorator (0-log_queries.py).
+# Every profiled call is timed and counted in statement_stats; sampled calls and every call slower than `slow_ms` are
+# written as one JSON object per line to a size-rotated log file. Slow statements also get
+# their EXPLAIN QUERY PLAN attached, with full table scans flagged:
+#
+#   {"ts": ..., "function": "fetch_all_users", "query": "SELECT ...", "params": [...],
+#    "duration_ms": 12.4, "rows": 1000, "slow": true, "full_scan": true, "plan": ["SCAN users"]}
+import json
+import logging
+import random
+import sqlite3
+import time
+from logging.handlers import RotatingFileHandler
+
+db_pool = __import__('db_pool')
+statement_stats = __import__('statement_stats')
+
+_loggers = {}
+
+
+def _logger(path, max_bytes, backup_count):
+    """One logger (and rotating file) per log path, shared by every profiler writing there"""
+    if path not in _loggers:
+        logger = logging.getLogger(f"query_profiler.{path}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False  # JSON lines only, never on stdout through the root logger
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8',
+                                      delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _loggers[path] = logger
+    return _loggers[path]
+
+
+def row_count(result):
+    """fetchall() results count their rows, fetchone() counts 1 (0 when nothing matched)"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def explain(conn, query, params=()):
+    """EXPLAIN QUERY PLAN details of `query` ([] when it cannot be explained)"""
+    try:
+        if not params and '?' in query:
+            # the plan does not depend on the values, only on where they go
+            params = (None,) * query.count('?')
+        # plain sqlite3.Connection.execute, so the EXPLAIN does not show up in statement_stats
+        return [row[3] for row in sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {query}", params)]
+    except sqlite3.Error:
+        return []
+
+
+def is_full_scan(plan):
+    # "SCAN users" reads the whole table; "SCAN users USING COVERING INDEX ..." only an index
+    return any(step.startswith('SCAN') and 'INDEX' not in step for step in plan)
+
+
+class QueryProfiler:
+    """Times queries and logs them as JSON lines.
+
+    sample_rate is the share of ordinary calls that get logged (1.0 logs all of them);
+    calls slower than slow_ms (and failed ones) are always logged, slow ones with their plan.
+    """
+
+    def __init__(self, path='query_log.jsonl', slow_ms=100.0, sample_rate=1.0, explain_slow=True,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.explain_slow = explain_slow
+        self.logger = _logger(path, max_bytes, backup_count)
+
+    def record(self, function, query, params, duration, result=None, error=None, conn=None):
+        if query and not isinstance(conn, statement_stats.InstrumentedConnection):
+            # queries on db_pool connections are already counted by their cursors
+            statement_stats.statements.record(query, duration, 0 if error is not None else row_count(result),
+                                              error is not None)
+        duration_ms = 1000 * duration
+        slow = self.slow_ms is not None and duration_ms >= self.slow_ms
+        if not (slow or error is not None or random.random() < self.sample_rate):
+            return None
+        entry = {
+            'ts': time.time(),
+            'function': function,
+            'query': query,
+            'params': list(params) if isinstance(params, (list, tuple)) else params,
+            'duration_ms': round(duration_ms, 3),
+            'rows': None if error is not None else row_count(result),
+            'slow': slow,
+        }
+        if error is not None:
+            entry['error'] = f"{type(error).__name__}: {error}"
+        if slow and self.explain_slow and query and error is None:
+            if conn is not None:
+                plan = explain(conn, query, params)
+            else:
+                with db_pool.connection() as pooled:
+                    plan = explain(pooled, query, params)
+            entry['plan'] = plan
+            entry['full_scan'] = is_full_scan(plan)
+        self.logger.info(json.dumps(entry, default=str))
+        return entry
@@ -0,0 +1,287 @@
+# Retry policy behind the retry_on_failure decorator (3-retry_on_failure.py).
+# Only transient errors are retried (by default an OperationalError saying the database is
+# locked or busy), the n-th retry sleeps a random time between 0 and base * 2**n seconds
+# (exponential backoff with full jitter, so contending workers spread out instead of
+# retrying in lockstep), and no retry starts past the call's deadline.
+#
+# Two process-wide guards keep retries from piling onto a database that is already in
+# trouble: a RetryBudget caps retries to a share of the calls made, and a CircuitBreaker
+# fails calls fast for a while once too many of the recent ones failed.
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+RETRYABLE_ERRORS = (sqlite3.OperationalError,)
+RETRYABLE_MESSAGES = ('database is locked', 'database table is locked', 'database is busy', 'disk i/o error')
+GIVE_UP_REASONS = ('exhausted', 'deadline', 'budget', 'not_retryable', 'circuit_open')
+
+
+class CircuitOpenError(sqlite3.OperationalError):
+    """Raised instead of calling the function while the circuit breaker is open"""
+
+
+def is_retryable(error, errors=RETRYABLE_ERRORS, messages=RETRYABLE_MESSAGES):
+    """True when `error` is one of `errors` and (if messages are given) mentions one of them"""
+    if isinstance(error, CircuitOpenError) or not isinstance(error, errors):
+        return False
+    if not messages:
+        return True
+    text = str(error).lower()
+    return any(message in text for message in messages)
+
+
+def backoff(attempt, base=0.05, cap=5.0):
+    """Full jitter: a random delay between 0 and min(cap, base * 2**attempt)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RetryBudget:
+    """Token bucket that allows retries for about `ratio` of the calls (plus a small floor)
+
+    Every call deposits `ratio` tokens and every retry withdraws one, so when everything
+    fails at once retries add at most `ratio` extra load instead of multiplying it.
+    `min_per_second` tokens trickle in regardless, so rare calls can still retry.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=5.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, deposit):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + deposit + self.min_per_second * (now - self._updated))
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self):
+        """Take one retry token; False when the budget is spent"""
+        with self._lock:
+            self._refill(0)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill(0)
+            return self._tokens
+
+
+class CircuitBreaker:
+    """Opens when at least `threshold` of the calls in the last `window` seconds failed.
+
+    Only transient failures count (a syntax error says nothing about the database's health),
+    and only once `min_calls` calls were seen. While open every call fails with
+    CircuitOpenError; after `cooldown` seconds one probe call is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=0.5, window=10.0, min_calls=20, cooldown=5.0):
+        self.threshold = threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._opened_at = 0.0
+        self._probing = False
+        self._outcomes = deque()  # (time, failed)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return 'probe'  # truthy, and tells the caller it holds the probe slot
+            return False
+
+    def record(self, failed):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'half_open':
+                self._probing = False
+                self._outcomes.clear()
+                if failed:
+                    self.state, self._opened_at = 'open', now
+                else:
+                    self.state = 'closed'
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(failed for _, failed in self._outcomes)
+            if self.state == 'closed' and calls >= self.min_calls and failures >= self.threshold * calls:
+                self.state, self._opened_at = 'open', now
+
+    def abandon(self):
+        """The probe allow() let through ended without an outcome (cancelled, interrupted):
+        the next call gets to probe instead"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self.state = 'closed'
+            self._probing = False
+            self._outcomes.clear()
+
+
+class RetryMetrics:
+    """Counters of one retrying function: calls, attempts, retries, successes and give-ups"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.attempts = self.retries = self.successes = 0
+            self.slept = 0.0
+            self.give_ups = dict.fromkeys(GIVE_UP_REASONS, 0)
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                if name in self.give_ups:
+                    self.give_ups[name] += count
+                else:
+                    setattr(self, name, getattr(self, name) + count)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(calls=self.calls, attempts=self.attempts, retries=self.retries, successes=self.successes,
+                        slept=self.slept, give_ups=dict(self.give_ups))
+
+
+# shared by every retry_on_failure in the process unless one is given its own
+default_budget = RetryBudget()
+default_breaker = CircuitBreaker()
+
+
+class RetryPolicy:
+    """How one function is retried: run it with policy.call(func, ...) or await policy.call_async(...)
+
+    retries is the number of attempts, delays the base of the backoff (capped at max_delay),
+    deadline the most seconds a call may take including its sleeps (None: no limit).
+    Pass budget=None / breaker=None to do without the shared guards.
+    """
+
+    def __init__(self, retries=3, delays=0.05, max_delay=5.0, errors=RETRYABLE_ERRORS, messages=RETRYABLE_MESSAGES,
+                 deadline=None, budget=default_budget, breaker=default_breaker):
+        if retries < 1:
+            raise ValueError("retries is the number of attempts and must be at least 1")
+        self.retries = retries
+        self.delays = delays
+        self.max_delay = max_delay
+        self.errors = errors
+        self.messages = messages
+        self.deadline = deadline
+        self.budget = budget
+        self.breaker = breaker
+        self.metrics = RetryMetrics()
+
+    def _start(self):
+        """(start time, whether this call is the breaker's half-open probe)"""
+        allowed = True if self.breaker is None else self.breaker.allow()
+        if not allowed:
+            self.metrics.add(calls=1, circuit_open=1)
+            raise CircuitOpenError("Circuit open: too many recent failures, not calling the database")
+        if self.budget is not None:
+            self.budget.deposit()
+        self.metrics.add(calls=1)
+        return time.monotonic(), allowed == 'probe'
+
+    def _done(self, failed):
+        if self.breaker is not None:
+            self.breaker.record(failed)
+
+    def _abandon(self, probe):
+        if probe:
+            self.breaker.abandon()
+
+    def _next_delay(self, error, attempt, started):
+        """Seconds to sleep before the next attempt, or None to give up (the reason is counted)"""
+        if not is_retryable(error, self.errors, self.messages):
+            self._done(False)
+            self.metrics.add(not_retryable=1)
+            return None
+        if attempt + 1 >= self.retries:
+            reason = 'exhausted'
+        else:
+            delay = backoff(attempt, self.delays, self.max_delay)
+            if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                reason = 'deadline'
+            elif self.budget is not None and not self.budget.withdraw():
+                reason = 'budget'
+            else:
+                self.metrics.add(retries=1, slept=delay)
+                return delay
+        self._done(True)
+        self.metrics.add(**{reason: 1})
+        return None
+
+    def call(self, func, *args, **kwargs):
+        started, probe = self._start()
+        settled = False
+        try:
+            for attempt in range(self.retries):
+                self.metrics.add(attempts=1)
+                try:
+                    value = func(*args, **kwargs)
+                except Exception as e:
+                    delay = self._next_delay(e, attempt, started)
+                    if delay is None:
+                        settled = True
+                        raise
+                    print(f"Error occured: {e}. Attempt {attempt + 1}/{self.retries}, retrying in {delay:.3f}s")
+                    time.sleep(delay)
+                    continue
+                settled = True
+                self._done(False)
+                self.metrics.add(successes=1)
+                return value
+        finally:
+            if not settled:
+                # interrupted (KeyboardInterrupt...): free the breaker's probe slot if this call held it
+                self._abandon(probe)
+
+    async def call_async(self, func, *args, **kwargs):
+        started, probe = self._start()
+        settled = False
+        try:
+            for attempt in range(self.retries):
+                self.metrics.add(attempts=1)
+                try:
+                    value = await func(*args, **kwargs)
+                except Exception as e:
+                    delay = self._next_delay(e, attempt, started)
+                    if delay is None:
+                        settled = True
+                        raise
+                    print(f"Error occured: {e}. Attempt {attempt + 1}/{self.retries}, retrying in {delay:.3f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                settled = True
+                self._done(False)
+                self.metrics.add(successes=1)
+                return value
+        finally:
+            if not settled:
+                # cancelled (or timed out by wait_for): free the breaker's probe slot if this call held it
+                self._abandon(probe)
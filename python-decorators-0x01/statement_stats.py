@@ -0,0 +1,216 @@
+# Aggregated statement statistics, in the spirit of pg_stat_statements.
+# Queries are reduced to a fingerprint (literals and parameters replaced by ?, IN lists
+# folded, whitespace collapsed), and per fingerprint we keep calls, total/min/max time,
+# mean and p95 latency and rows. Statements run on db_pool connections are recorded
+# automatically (see InstrumentedConnection), and log_queries records the calls it times:
+#
+#   statement_stats.statements.top(10)               # the 10 most expensive query shapes
+#   statement_stats.statements.dump('stats.json')
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+# string literals, blobs, numbers, runs of whitespace
+_LITERALS = re.compile(r"'(?:[^']|'')*'|[xX]'[0-9a-fA-F]*'|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b|:\w+|\$\w+|@\w+")
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+SAMPLES = 1000
+
+
+@functools.lru_cache(maxsize=4096)  # the same few statement strings come back over and over
+def fingerprint(sql):
+    """The shape of a query: SELECT * FROM users WHERE age > 25 -> SELECT * FROM users WHERE age > ?"""
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip().rstrip(';').strip()
+
+
+def query_id(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:16]
+
+
+class _Statement:
+    __slots__ = ('query', 'calls', 'total', 'min', 'max', 'rows', 'errors', 'samples')
+
+    def __init__(self, query):
+        self.query = query
+        self.calls = self.rows = self.errors = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds, rows, error):
+        self.calls += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.rows += rows or 0
+        self.errors += bool(error)
+        # reservoir sampling keeps a uniform sample of every call for the p95
+        if len(self.samples) < SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.calls)
+            if slot < SAMPLES:
+                self.samples[slot] = seconds
+
+    def as_dict(self):
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+        return {
+            'queryid': query_id(self.query),
+            'query': self.query,
+            'calls': self.calls,
+            'total_ms': 1000 * self.total,
+            'mean_ms': 1000 * self.total / self.calls if self.calls else 0.0,
+            'min_ms': 1000 * self.min if self.calls else 0.0,
+            'max_ms': 1000 * self.max,
+            'p95_ms': 1000 * p95,
+            'rows': self.rows,
+            'rows_per_call': self.rows / self.calls if self.calls else 0.0,
+            'errors': self.errors,
+        }
+
+
+class StatementStats:
+    """Thread-safe registry of per-fingerprint statistics"""
+
+    def __init__(self, max_statements=5000):
+        self.max_statements = max_statements
+        self._statements = {}
+        self._lock = threading.Lock()
+        self.since = time.time()
+
+    def record(self, sql, seconds, rows=0, error=False):
+        shape = fingerprint(sql)
+        with self._lock:
+            statement = self._statements.get(shape)
+            if statement is None:
+                if len(self._statements) >= self.max_statements:
+                    return  # like pg_stat_statements.max, but we drop the newcomer instead of the least used
+                statement = self._statements[shape] = _Statement(shape)
+            statement.add(seconds, rows, error)
+
+    def snapshot(self):
+        with self._lock:
+            return [statement.as_dict() for statement in self._statements.values()]
+
+    def top(self, n=10, by='total_ms'):
+        """The n query shapes with the highest `by` (total_ms, mean_ms, p95_ms, calls, rows...)"""
+        return sorted(self.snapshot(), key=lambda row: row[by], reverse=True)[:n]
+
+    def get(self, sql):
+        """Statistics of the shape `sql` belongs to (None when it never ran)"""
+        with self._lock:
+            statement = self._statements.get(fingerprint(sql))
+            return statement.as_dict() if statement else None
+
+    def dump(self, path, by='total_ms'):
+        """Write every shape, most expensive first, to a JSON file (replaced atomically)"""
+        report = {'since': self.since, 'dumped_at': time.time(), 'statements': self.top(len(self._statements), by)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(report, file, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.since = time.time()
+
+    def __len__(self):
+        return len(self._statements)
+
+
+# the registry the decorators record into
+statements = StatementStats()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that records each statement's execute + fetch time and rows in `statements`
+
+    A call is closed off (and recorded) when the cursor runs its next statement, is closed
+    or is garbage collected, so the time spent fetching the rows is part of it.
+    """
+    registry = statements
+    _pending = None
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self.registry.record(*pending)
+
+    def _run(self, method, sql, params):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            method(sql, params)
+        except sqlite3.Error:
+            self.registry.record(sql, time.perf_counter() - start, 0, True)
+            raise
+        # DML reports its rows straight away; SELECT rows are added as they are fetched
+        self._pending = [sql, time.perf_counter() - start, max(self.rowcount, 0)]
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(super().executemany, sql, seq_of_params)
+
+    def _fetched(self, start, rows):
+        if self._pending is not None:
+            self._pending[1] += time.perf_counter() - start
+            self._pending[2] += rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.Connection whose cursors (conn.cursor(), conn.execute()) are InstrumentedCursors"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
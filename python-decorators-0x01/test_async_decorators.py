@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async decorator stack and its aiosqlite pool.
+"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+async_decorators = __import__('5-async_decorators')
+async_db_pool = __import__('async_db_pool')
+cache_module = __import__('query_cache')
+
+
+class AsyncTestCase(unittest.TestCase):
+    """A users table in a temporary file behind the shared async pool"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'users.db')
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE users (name TEXT, email TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         [('alice', 'a@example.com', 101), ('bob', 'b@example.com', 30)])
+        conn.commit()
+        conn.close()
+        async_db_pool.configure(self.database, size=2, timeout=0.2)
+        cache_module.default_cache.clear()
+
+    def tearDown(self):
+        async_db_pool.configure()
+        cache_module.default_cache.clear()
+        shutil.rmtree(self.directory)
+
+    def run_closing(self, coroutine):
+        """Run `coroutine`, then close the pool of its event loop"""
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await async_db_pool.get_pool().close()
+        return asyncio.run(main())
+
+
+class TestAsyncDecorators(AsyncTestCase):
+    """Testing caching, coalescing and invalidation through the decorators"""
+    def test_concurrent_fetches_run_once(self):
+        """Identical concurrent queries run once and share the rows."""
+        fetch = async_decorators.async_fetch_users
+        query = "SELECT name FROM users WHERE age > 100"
+
+        async def main():
+            return await asyncio.gather(*(fetch(query=query) for _ in range(10)))
+
+        leaders = fetch.stampede_info().leaders
+        results = self.run_closing(main())
+        self.assertEqual(results, [[('alice',)]] * 10)
+        self.assertEqual(fetch.stampede_info().leaders - leaders, 1)
+
+    def test_commit_invalidates(self):
+        """A committed update turns cached reads of its table into misses."""
+        fetch = async_decorators.async_fetch_users
+        query = "SELECT email FROM users WHERE name = 'alice'"
+
+        async def main():
+            before = await fetch(query=query)
+            await async_decorators.async_update_user_email(name='alice', new_email='alice@new.example.com')
+            return before, await fetch(query=query)
+
+        before, after = self.run_closing(main())
+        self.assertEqual(before, [('a@example.com',)])
+        self.assertEqual(after, [('alice@new.example.com',)])
+
+    def test_rollback_on_error(self):
+        """A failing transaction is rolled back and its error re-raised."""
+        @async_decorators.with_db_connection
+        @async_decorators.transactional
+        async def broken(conn):
+            await conn.execute("UPDATE users SET age = 0")
+            await conn.execute("UPDATE missing SET age = 0")
+
+        with patch('builtins.print'), self.assertRaises(sqlite3.OperationalError):
+            self.run_closing(broken())
+        conn = sqlite3.connect(self.database)
+        self.assertEqual(conn.execute("SELECT MIN(age) FROM users").fetchone()[0], 30)
+        conn.close()
+
+
+class TestAsyncPool(AsyncTestCase):
+    """Testing checkout limits and the reset on release"""
+    def test_connection_reused(self):
+        """A released connection is handed out again, rolled back."""
+        async def main():
+            pool = async_db_pool.get_pool()
+            async with pool.connection() as first:
+                await first.execute("UPDATE users SET age = 0")
+            async with pool.connection() as second:
+                age = await (await second.execute("SELECT MIN(age) FROM users")).fetchone()
+            return first is second, age, pool.stats()
+
+        same, age, stats = self.run_closing(main())
+        self.assertTrue(same)
+        self.assertEqual(age, (30,))
+        self.assertEqual((stats['created'], stats['idle']), (1, 1))
+
+    def test_timeout(self):
+        """With every connection out a checkout fails after `timeout` seconds."""
+        async def main():
+            pool = async_db_pool.get_pool()
+            held = [await pool.acquire(), await pool.acquire()]
+            try:
+                with self.assertRaises(sqlite3.OperationalError):
+                    await pool.acquire()
+            finally:
+                for connection in held:
+                    await pool.release(connection)
+            return pool.stats()
+
+        self.assertEqual(self.run_closing(main())['waits'], 1)
+
+    def test_database_of(self):
+        """database_of reports the pool's file."""
+        async def main():
+            async with async_db_pool.connection() as connection:
+                return await async_db_pool.database_of(connection)
+
+        self.assertEqual(os.path.realpath(self.run_closing(main())), os.path.realpath(self.database))
+
+
+if __name__ == '__main__':
+    unittest.main()
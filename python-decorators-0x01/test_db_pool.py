@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the SQLite connection pool behind with_db_connection.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+db_pool = __import__('db_pool')
+
+
+class TestSQLitePool(unittest.TestCase):
+    """Testing checkout limits, the reset on release and discards"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'users.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE users (name TEXT, email TEXT)")
+        conn.close()
+        self.pool = db_pool.SQLitePool(self.database, size=2, timeout=0.2)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_tuned(self):
+        """New connections get the default PRAGMAs."""
+        with self.pool.connection() as connection:
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            self.assertEqual(connection.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_release_rolls_back(self):
+        """A transaction left open is rolled back before the connection is reused."""
+        with self.pool.connection() as first:
+            first.execute("INSERT INTO users VALUES ('alice', 'a@example.com')")
+            self.assertTrue(first.in_transaction)
+        with self.pool.connection() as second:
+            self.assertIs(second, first)
+            self.assertFalse(second.in_transaction)
+            self.assertEqual(second.execute("SELECT COUNT(*) FROM users").fetchone()[0], 0)
+
+    def test_release_clears_callbacks(self):
+        """Row factories and trace callbacks do not leak into the next checkout."""
+        statements = []
+        with self.pool.connection() as connection:
+            connection.row_factory = sqlite3.Row
+            connection.set_trace_callback(statements.append)
+        with self.pool.connection() as connection:
+            connection.execute("SELECT 1")
+            self.assertIsNone(connection.row_factory)
+        self.assertEqual(statements, [])
+
+    def test_broken_connection_discarded(self):
+        """A connection that cannot be reset is dropped and its slot freed."""
+        with self.pool.connection() as broken:
+            broken.close()
+        stats = self.pool.stats()
+        self.assertEqual((stats['open'], stats['idle'], stats['discarded']), (0, 0, 1))
+        with self.pool.connection() as connection:
+            self.assertIsNot(connection, broken)
+            connection.execute("SELECT 1")
+
+    def test_size_limit(self):
+        """Concurrent checkouts never open more than `size` connections."""
+        self.pool.timeout = 5
+        barrier = threading.Barrier(8)
+
+        def work():
+            barrier.wait()
+            for _ in range(20):
+                with self.pool.connection() as connection:
+                    connection.execute("SELECT 1")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['checkouts'], 160)
+
+    def test_timeout(self):
+        """With every connection out a checkout fails after `timeout` seconds."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        start = time.monotonic()
+        with self.assertRaises(sqlite3.OperationalError):
+            self.pool.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        for connection in held:
+            self.pool.release(connection)
+
+    def test_discard_frees_a_waiter(self):
+        """A checkout waiting for a slot gets one when a connection is discarded."""
+        self.pool.timeout = 2
+        held = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        held[0].close()
+        self.pool.release(held[0])
+        waiter.join()
+        self.assertNotIn(got[0], held)
+        self.pool.release(got[0])
+        self.pool.release(held[1])
+
+    def test_thread_mode(self):
+        """mode='thread' keeps one connection per thread."""
+        pool = db_pool.SQLitePool(self.database, mode='thread')
+        seen = []
+
+        def work():
+            with pool.connection() as first, pool.connection() as second:
+                seen.append((first, second))
+
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(first is second for first, second in seen))
+        self.assertEqual(len({id(first) for first, _ in seen}), 3)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
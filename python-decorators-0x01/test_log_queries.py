@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the log_queries decorator and its QueryProfiler backend.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+log_queries = __import__('0-log_queries').log_queries
+query_profiler = __import__('query_profiler')
+
+
+class ProfilerTestCase(unittest.TestCase):
+    """A profiler logging to a file of its own in a temporary directory"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, 'queries.jsonl')
+        self.profiler = query_profiler.QueryProfiler(path=self.log, slow_ms=None)
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE users (name TEXT, age INTEGER)")
+        self.conn.executemany("INSERT INTO users VALUES (?, ?)", [('alice', 30), ('bob', 40)])
+
+    def tearDown(self):
+        self.conn.close()
+        for handler in self.profiler.logger.handlers:
+            handler.close()
+        shutil.rmtree(self.directory)
+
+    def entries(self):
+        for handler in self.profiler.logger.handlers:
+            handler.flush()
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+
+class TestLogQueries(ProfilerTestCase):
+    """Testing which query and parameters get logged"""
+    def test_keyword_and_positional(self):
+        """The `query` argument is found however it is passed."""
+        @log_queries(profiler=self.profiler)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        fetch(self.conn, "SELECT * FROM users WHERE age > ?", (35,))
+        fetch(self.conn, query="SELECT name FROM users")
+        self.assertEqual([(e['query'], e['params'], e['rows']) for e in self.entries()],
+                         [("SELECT * FROM users WHERE age > ?", [35], 1), ("SELECT name FROM users", [], 2)])
+
+    def test_named_argument(self):
+        """arg= and params_arg= name the arguments to log, instead of guessing among strings."""
+        @log_queries(profiler=self.profiler, arg='sql', params_arg='args')
+        def fetch(label, conn, sql, args=()):
+            return conn.execute(sql, args).fetchall()
+
+        fetch('report', self.conn, "SELECT name FROM users WHERE age = ?", args=(30,))
+        self.assertEqual([(e['query'], e['params']) for e in self.entries()],
+                         [("SELECT name FROM users WHERE age = ?", [30])])
+
+    def test_no_query_argument(self):
+        """A call without the query argument runs but is not logged."""
+        @log_queries(profiler=self.profiler)
+        def count(conn, table='users'):
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+
+        self.assertEqual(count(self.conn), (2,))
+        self.assertEqual(self.entries(), [])
+
+    def test_error_logged(self):
+        """A failed query is logged with its error and re-raised."""
+        @log_queries(profiler=self.profiler)
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            fetch(self.conn, "SELECT * FROM missing")
+        entry, = self.entries()
+        self.assertIsNone(entry['rows'])
+        self.assertTrue(entry['error'].startswith('OperationalError'))
+
+
+class TestQueryProfiler(ProfilerTestCase):
+    """Testing sampling, slow queries and their plans"""
+    def test_slow_query_explained(self):
+        """Calls slower than slow_ms get their plan, and a table scan is flagged."""
+        self.profiler.slow_ms = 0
+        entry = self.profiler.record('fetch', "SELECT * FROM users WHERE age > ?", (), 0.001, [], conn=self.conn)
+        self.assertTrue(entry['slow'])
+        self.assertTrue(entry['full_scan'])
+        self.assertEqual(entry['plan'], ['SCAN users'])
+
+    def test_sampling(self):
+        """With sample_rate=0 only slow and failed calls are logged."""
+        self.profiler.sample_rate = 0
+        self.assertIsNone(self.profiler.record('fetch', "SELECT 1", (), 0.001, [(1,)]))
+        self.assertIsNotNone(self.profiler.record('fetch', "SELECT 1", (), 0.001, error=ValueError("x")))
+
+    @parameterized.expand([
+        (None, 0),
+        ([], 0),
+        ([(1,), (2,)], 2),
+        ((1, 'alice'), 1),
+    ])
+    def test_row_count(self, result, rows):
+        """fetchall lists count their rows, a fetchone row counts 1."""
+        self.assertEqual(query_profiler.row_count(result), rows)
+
+    @parameterized.expand([
+        (['SCAN users'], True),
+        (['SCAN users USING COVERING INDEX users_name'], False),
+        (['SEARCH users USING INDEX users_age (age>?)'], False),
+    ])
+    def test_full_scan(self, plan, full_scan):
+        """Only a SCAN without an index reads the whole table."""
+        self.assertEqual(query_profiler.is_full_scan(plan), full_scan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the result cache behind cache_query: keys, bounds, coalescing and lookups.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+cache_module = __import__('query_cache')
+cache_query = __import__('4-cache_query').cache_query
+
+
+def wait_until(condition, timeout=5):
+    """Poll `condition` until it holds or `timeout` seconds passed"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Testing that concurrent calls for one key run it once"""
+    def test_concurrent_calls_run_once(self):
+        """Every thread gets the value of the one call that ran."""
+        flights = cache_module.SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def query():
+            calls.append(1)
+            release.wait()
+            return ['row']
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do('key', query)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        # let the leader run only once every other thread waits on it
+        wait_until(lambda: flights.info().coalesced == 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['row']] * 8)
+        self.assertEqual(flights.info(), cache_module.StampedeInfo(1, 7, 0, 0, 7))
+
+    def test_error_is_shared(self):
+        """The waiters get the leader's error instead of running it again."""
+        flights = cache_module.SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def query():
+            release.wait()
+            raise sqlite3.OperationalError("database is locked")
+
+        def call():
+            try:
+                flights.do('key', query)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: flights.info().coalesced == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(len({id(e) for e in errors}), 1)
+        self.assertEqual(flights.info().errors, 1)
+
+    def test_interrupted_leader(self):
+        """A KeyboardInterrupt stays in the leader's thread; a waiter runs the call itself."""
+        flights = cache_module.SingleFlight()
+        release = threading.Event()
+        calls, outcomes = [], []
+
+        def query():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait()
+                raise KeyboardInterrupt
+            return ['row']
+
+        def call():
+            try:
+                outcomes.append(flights.do('key', query))
+            except KeyboardInterrupt:
+                outcomes.append('interrupted')
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        wait_until(lambda: calls)
+        waiter = threading.Thread(target=call)
+        waiter.start()
+        wait_until(lambda: flights.info().coalesced == 1)
+        release.set()
+        leader.join()
+        waiter.join()
+
+        self.assertEqual(sorted(outcomes, key=str), [['row'], 'interrupted'])
+        self.assertEqual(len(calls), 2)
+
+    def test_next_call_runs_again(self):
+        """A key is only shared while its call is in flight."""
+        flights = cache_module.SingleFlight()
+        self.assertEqual(flights.do('key', lambda: 1), 1)
+        self.assertEqual(flights.do('key', lambda: 2), 2)
+        self.assertEqual(flights.info().leaders, 2)
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    """Testing the coroutine version of SingleFlight"""
+    def test_concurrent_tasks_run_once(self):
+        """Ten tasks asking for one key await a single call."""
+        flights = cache_module.AsyncSingleFlight()
+        calls = []
+
+        async def query():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ['row']
+
+        async def main():
+            return await asyncio.gather(*(flights.do('key', query) for _ in range(10)))
+
+        self.assertEqual(asyncio.run(main()), [['row']] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.info().coalesced, 9)
+
+    def test_cancelled_leader(self):
+        """When the leading task is cancelled a waiter runs the call instead."""
+        flights = cache_module.AsyncSingleFlight()
+        calls = []
+
+        async def query():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ['row']
+
+        async def main():
+            leader = asyncio.ensure_future(flights.do('key', query))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flights.do('key', query))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await waiter
+
+        self.assertEqual(asyncio.run(main()), ['row'])
+        self.assertEqual(len(calls), 2)
+
+
+class TestCacheQuery(unittest.TestCase):
+    """Testing the cache_query decorator around SingleFlight"""
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE users (name TEXT)")
+        self.store = cache_module.QueryCache(versions=cache_module.TableVersions())
+        self.calls = []
+
+        @cache_query(cache=self.store)
+        def fetch(conn, query):
+            self.calls.append(query)
+            return conn.execute(query).fetchall()
+
+        self.fetch = fetch
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_second_call_is_a_hit(self):
+        """The query runs once; the second call is served from the cache."""
+        self.fetch(self.conn, query="SELECT * FROM users")
+        self.fetch(self.conn, query="SELECT * FROM users")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.store.info()[:2], (1, 1))
+
+    def test_result_stored_after_the_miss(self):
+        """A leader that stored the result just after our miss saves us the query."""
+        stored = [('alice',)]
+        with patch.object(self.store, 'get', side_effect=[(False, None), (True, stored)]) as get:
+            self.assertIs(self.fetch(self.conn, query="SELECT * FROM users"), stored)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(get.call_count, 2)
+
+
+class TestQueryCache(unittest.TestCase):
+    """Testing the LRU order, TTL and size bounds of QueryCache"""
+    def setUp(self):
+        self.store = cache_module.QueryCache(max_entries=2, max_bytes=0, versions=cache_module.TableVersions())
+
+    def test_lru_eviction(self):
+        """Past max_entries the least recently used entry goes."""
+        self.store.set('a', 1)
+        self.store.set('b', 2)
+        self.store.get('a')
+        self.store.set('c', 3)
+        self.assertEqual(self.store.get('b'), (False, None))
+        self.assertEqual(self.store.get('a'), (True, 1))
+        self.assertEqual(self.store.info().evictions, 1)
+
+    def test_ttl(self):
+        """Entries expire after their TTL; ttl=None never does."""
+        with patch.object(cache_module.time, 'monotonic', return_value=100.0):
+            self.store.set('short', 1, ttl=10)
+            self.store.set('forever', 2, ttl=None)
+        with patch.object(cache_module.time, 'monotonic', return_value=110.0):
+            self.assertEqual(self.store.get('short'), (False, None))
+            self.assertEqual(self.store.get('forever'), (True, 2))
+        self.assertEqual(self.store.info().expirations, 1)
+
+    def test_max_bytes(self):
+        """The byte bound evicts old entries, and a result bigger than it is not stored."""
+        store = cache_module.QueryCache(max_bytes=cache_module.approximate_size([('x' * 100,)]) * 2)
+        store.set('a', [('x' * 100,)])
+        store.set('b', [('y' * 100,)])
+        store.set('c', [('z' * 100,)])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get('a'), (False, None))
+        store.set('huge', [('x' * 10_000,)])
+        self.assertEqual(store.get('huge'), (False, None))
+        self.assertEqual(len(store), 2)
+
+
+class TestKeys(unittest.TestCase):
+    """Testing what makes two calls share a cache entry"""
+    @parameterized.expand([
+        ("SELECT *  FROM users;", "SELECT * FROM users", True),
+        ("SELECT * FROM users WHERE name = 'a  b'", "SELECT * FROM users WHERE name = 'a b'", False),
+        ("select * from users", "SELECT * FROM users", False),
+    ])
+    def test_normalize_sql(self, first, second, same):
+        """Whitespace and a trailing semicolon do not matter; string literals and case do."""
+        self.assertEqual(cache_module.normalize_sql(first) == cache_module.normalize_sql(second), same)
+
+    def test_unhashable_params(self):
+        """Lists, dicts and sets in the parameters make hashable keys."""
+        key = cache_module.make_key('users.db', "SELECT 1", {'ids': [1, 2], 'tags': {'a'}, 'f': {'x': [3]}})
+        self.assertEqual(hash(key), hash(cache_module.make_key('users.db', "SELECT 1",
+                                                               {'f': {'x': [3]}, 'tags': {'a'}, 'ids': [1, 2]})))
+
+    def test_separate_entries(self):
+        """Other parameters and other databases never share results."""
+        keys = {cache_module.make_key('a.db', "SELECT ?", {'params': (1,)}),
+                cache_module.make_key('a.db', "SELECT ?", {'params': (2,)}),
+                cache_module.make_key('b.db', "SELECT ?", {'params': (1,)})}
+        self.assertEqual(len(keys), 3)
+
+    def test_positional_query(self):
+        """cache_query finds the query passed by position as well as by keyword."""
+        conn = sqlite3.connect(':memory:')
+        calls = []
+
+        @cache_query(cache=cache_module.QueryCache(versions=cache_module.TableVersions()))
+        def fetch(conn, query, params=()):
+            calls.append(query)
+            return conn.execute(query, params).fetchall()
+
+        self.assertEqual(fetch(conn, "SELECT ?", (1,)), [(1,)])
+        self.assertEqual(fetch(conn, query="SELECT ?", params=(1,)), [(1,)])
+        self.assertEqual(fetch(conn, "SELECT ?", (2,)), [(2,)])
+        self.assertEqual(len(calls), 2)
+        conn.close()
+
+class TestInvalidation(unittest.TestCase):
+    """Testing which tables a statement reads and writes, and the bump on commit"""
+    @parameterized.expand([
+        ("SELECT * FROM users", {'users'}),
+        ("SELECT * FROM main.users AS u JOIN orders o ON o.user = u.name", {'users', 'orders'}),
+        ("SELECT * FROM users, \"Orders\" WHERE 1", {'users', 'orders'}),
+        ("SELECT * FROM (SELECT name FROM users) WHERE name IN (SELECT name FROM admins)", {'users', 'admins'}),
+        ("SELECT 'FROM nowhere'", set()),
+        ("SELECT * FROM json_each('[1]')", None),
+    ])
+    def test_tables_read(self, sql, tables):
+        """FROM lists, joins and subqueries are read; what cannot be parsed gives None."""
+        self.assertEqual(cache_module.tables_read(sql), tables)
+
+    @parameterized.expand([
+        ("INSERT INTO users VALUES (?)", {'users'}),
+        ("INSERT OR REPLACE INTO `users` VALUES (?)", {'users'}),
+        ("UPDATE users SET email = ? WHERE name = ?", {'users'}),
+        ("DELETE FROM main.orders", {'orders'}),
+        ("DROP TABLE IF EXISTS sessions", {'sessions'}),
+        ("SELECT * FROM users", set()),
+    ])
+    def test_tables_written(self, sql, tables):
+        """Every kind of write names the table it changes."""
+        self.assertEqual(cache_module.tables_written(sql), tables)
+
+    def test_unknown_tables_depend_on_all(self):
+        """A query whose tables are not known is invalidated by any write to its database."""
+        versions = cache_module.TableVersions()
+        depends_on = cache_module.dependencies('a.db', "SELECT * FROM json_each('[1]')")
+        stamp = versions.current(depends_on)
+        cache_module.bump_written('b.db', ["DELETE FROM users"], versions)
+        self.assertEqual(versions.current(depends_on), stamp)
+        cache_module.bump_written('a.db', ["DELETE FROM users"], versions)
+        self.assertNotEqual(versions.current(depends_on), stamp)
+
+    def test_commit_invalidates(self):
+        """A transactional commit turns cached reads of the tables it wrote into misses."""
+        transactional = __import__('2-transactional').transactional
+        conn = sqlite3.connect(':memory:')
+        conn.executescript("CREATE TABLE users (name TEXT, email TEXT); CREATE TABLE orders (id INTEGER);"
+                           "INSERT INTO users VALUES ('alice', 'a@example.com');")
+        store = cache_module.QueryCache()
+
+        @cache_query(cache=store)
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+
+        @transactional
+        def update_email(conn, email):
+            conn.execute("UPDATE users SET email = ?", (email,))
+
+        fetch(conn, query="SELECT email FROM users")
+        fetch(conn, query="SELECT * FROM orders")
+        update_email(conn, 'alice@new.example.com')
+        self.assertEqual(fetch(conn, query="SELECT email FROM users"), [('alice@new.example.com',)])
+        fetch(conn, query="SELECT * FROM orders")
+        info = store.info()
+        self.assertEqual((info.invalidations, info.hits), (1, 1))
+        conn.close()
+
+class TestDatabaseOf(unittest.TestCase):
+    """Testing that a connection's database is looked up once"""
+    def test_looked_up_once(self):
+        """Pooled connections remember their file; plain ones still work, uncached."""
+        pool = __import__('db_pool').SQLitePool(':memory:', size=1, instrument=False)
+        statements = []
+        with pool.connection() as connection:
+            connection.set_trace_callback(statements.append)
+            self.assertEqual(cache_module.database_of(connection), '')
+            self.assertEqual(cache_module.database_of(connection), '')
+            connection.set_trace_callback(None)
+        pool.close()
+        self.assertEqual(statements, ['PRAGMA database_list'])
+        conn = sqlite3.connect(':memory:')
+        self.assertEqual(cache_module.database_of(conn), '')
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the circuit breaker and retry policy behind retry_on_failure.
+"""
+
+import asyncio
+import sqlite3
+import time
+import unittest
+
+from parameterized import parameterized
+
+retry_policy = __import__('retry_policy')
+CircuitBreaker = retry_policy.CircuitBreaker
+RetryPolicy = retry_policy.RetryPolicy
+
+
+def locked():
+    raise sqlite3.OperationalError("database is locked")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Testing the closed -> open -> half_open -> closed/open transitions"""
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=4, cooldown=0.05)
+
+    def open_it(self):
+        for _ in range(4):
+            self.breaker.record(True)
+
+    def test_stays_closed_below_min_calls(self):
+        """Too few calls say nothing about the database yet."""
+        for _ in range(3):
+            self.breaker.record(True)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertIs(self.breaker.allow(), True)
+
+    def test_stays_closed_below_threshold(self):
+        """One failure in four calls is under a 50% threshold."""
+        for failed in (True, False, False, False):
+            self.breaker.record(failed)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_opens(self):
+        """Enough failed calls open the circuit and calls are refused."""
+        self.open_it()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertIs(self.breaker.allow(), False)
+
+    def test_half_open_lets_one_probe_through(self):
+        """After the cooldown exactly one call gets to probe."""
+        self.open_it()
+        time.sleep(0.06)
+        self.assertEqual(self.breaker.allow(), 'probe')
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertIs(self.breaker.allow(), False)
+
+    @parameterized.expand([
+        (False, 'closed'),
+        (True, 'open'),
+    ])
+    def test_probe_outcome(self, failed, state):
+        """The probe's outcome closes or re-opens the circuit."""
+        self.open_it()
+        time.sleep(0.06)
+        self.breaker.allow()
+        self.breaker.record(failed)
+        self.assertEqual(self.breaker.state, state)
+
+    def test_abandoned_probe(self):
+        """A probe that ends without an outcome frees the slot for the next call."""
+        self.open_it()
+        time.sleep(0.06)
+        self.assertEqual(self.breaker.allow(), 'probe')
+        self.breaker.abandon()
+        self.assertEqual(self.breaker.allow(), 'probe')
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Testing RetryPolicy together with its breaker"""
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=2, cooldown=0.05)
+        self.policy = RetryPolicy(retries=3, delays=0.001, budget=None, breaker=self.breaker)
+
+    def test_retries_transient_errors(self):
+        """A locked database is retried until the call succeeds."""
+        outcomes = [sqlite3.OperationalError("database is locked"), None]
+
+        def flaky():
+            error = outcomes.pop(0)
+            if error is not None:
+                raise error
+            return 'ok'
+
+        self.assertEqual(self.policy.call(flaky), 'ok')
+        self.assertEqual(self.policy.metrics.retries, 1)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_not_retryable(self):
+        """A syntax error is raised at once and does not count as a failure."""
+        def broken():
+            raise sqlite3.OperationalError('near "SELEC": syntax error')
+
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.policy.call(broken)
+        self.assertEqual(self.policy.metrics.attempts, 2)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_open_circuit_fails_fast(self):
+        """Once open, calls raise CircuitOpenError without running."""
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.policy.call(locked)
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(retry_policy.CircuitOpenError):
+            self.policy.call(lambda: 'ok')
+        self.assertEqual(self.policy.metrics.give_ups['circuit_open'], 1)
+
+    def test_interrupted_probe(self):
+        """A probe interrupted by KeyboardInterrupt gives the slot back."""
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.policy.call(locked)
+        time.sleep(0.06)
+
+        def interrupted():
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.policy.call(interrupted)
+        self.assertEqual(self.policy.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_cancelled_async_probe(self):
+        """A probe cancelled by wait_for gives the slot back."""
+        for _ in range(2):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.policy.call(locked)
+        time.sleep(0.06)
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        async def fast():
+            return 'ok'
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.policy.call_async(slow), 0.01)
+            return await self.policy.call_async(fast)
+
+        self.assertEqual(asyncio.run(main()), 'ok')
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
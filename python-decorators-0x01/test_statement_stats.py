@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-fingerprint statement statistics.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+statement_stats = __import__('statement_stats')
+
+
+class TestFingerprint(unittest.TestCase):
+    """Testing that queries of the same shape share a fingerprint"""
+    @parameterized.expand([
+        ("SELECT * FROM users WHERE age > 25", "SELECT * FROM users WHERE age > ?"),
+        ("SELECT * FROM users WHERE name = 'O''Brien';", "SELECT * FROM users WHERE name = ?"),
+        ("SELECT *\n  FROM users   WHERE age = 1.5e3", "SELECT * FROM users WHERE age = ?"),
+        ("SELECT * FROM users WHERE id IN (1, 2, 3)", "SELECT * FROM users WHERE id IN (...)"),
+        ("SELECT * FROM users WHERE id IN (?,?)", "SELECT * FROM users WHERE id IN (...)"),
+        ("SELECT * FROM users WHERE name = :name", "SELECT * FROM users WHERE name = ?"),
+        ("SELECT * FROM users2", "SELECT * FROM users2"),
+    ])
+    def test_fingerprint(self, sql, shape):
+        """Literals, parameters and IN lists are folded; identifiers are kept."""
+        self.assertEqual(statement_stats.fingerprint(sql), shape)
+
+
+class TestStatementStats(unittest.TestCase):
+    """Testing the registry's aggregates and reports"""
+    def setUp(self):
+        self.stats = statement_stats.StatementStats()
+
+    def test_aggregates(self):
+        """Calls of one shape add up; min, max, mean and rows follow."""
+        for seconds, rows in ((0.001, 1), (0.003, 2), (0.002, 0)):
+            self.stats.record(f"SELECT * FROM users WHERE age > {rows}", seconds, rows)
+        self.stats.record("SELECT * FROM users WHERE age > 9", 0.5, 0, error=True)
+        stat = self.stats.get("SELECT * FROM users WHERE age > 100")
+        self.assertEqual(len(self.stats), 1)
+        self.assertEqual((stat['calls'], stat['rows'], stat['errors']), (4, 3, 1))
+        self.assertAlmostEqual(stat['min_ms'], 1)
+        self.assertAlmostEqual(stat['max_ms'], 500)
+        self.assertAlmostEqual(stat['mean_ms'], 126.5)
+        self.assertAlmostEqual(stat['p95_ms'], 500)
+
+    def test_top(self):
+        """top() orders shapes by the column asked for."""
+        self.stats.record("SELECT 1", 0.010)
+        for _ in range(5):
+            self.stats.record("SELECT * FROM users", 0.001)
+        self.assertEqual([row['query'] for row in self.stats.top(by='total_ms')], ["SELECT ?", "SELECT * FROM users"])
+        self.assertEqual(self.stats.top(1, by='calls')[0]['query'], "SELECT * FROM users")
+
+    def test_max_statements(self):
+        """Past max_statements new shapes are dropped, known ones still counted."""
+        self.stats.max_statements = 1
+        self.stats.record("SELECT * FROM users", 0.001)
+        self.stats.record("SELECT * FROM orders", 0.001)
+        self.stats.record("SELECT * FROM users", 0.001)
+        self.assertEqual(len(self.stats), 1)
+        self.assertEqual(self.stats.get("SELECT * FROM users")['calls'], 2)
+        self.assertIsNone(self.stats.get("SELECT * FROM orders"))
+
+    def test_dump_and_reset(self):
+        """dump() writes every shape as JSON; reset() starts over."""
+        directory = tempfile.mkdtemp()
+        try:
+            self.stats.record("SELECT 1", 0.001)
+            path = self.stats.dump(os.path.join(directory, 'stats.json'))
+            with open(path) as f:
+                report = json.load(f)
+            self.assertEqual([row['query'] for row in report['statements']], ["SELECT ?"])
+        finally:
+            shutil.rmtree(directory)
+        self.stats.reset()
+        self.assertEqual(len(self.stats), 0)
+
+
+class TestInstrumentedConnection(unittest.TestCase):
+    """Testing that pooled connections record their statements on their own"""
+    def setUp(self):
+        registry = self.registry = statement_stats.StatementStats()
+
+        class Cursor(statement_stats.InstrumentedCursor):
+            pass
+
+        Cursor.registry = registry
+
+        class Connection(statement_stats.InstrumentedConnection):
+            def cursor(self, factory=Cursor):
+                return super().cursor(factory)
+
+        self.conn = sqlite3.connect(':memory:', factory=Connection)
+        self.conn.execute("CREATE TABLE users (name TEXT, age INTEGER)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_rows_counted(self):
+        """DML counts its rows at once, SELECT the rows fetched."""
+        self.conn.executemany("INSERT INTO users VALUES (?, ?)", [('a', 20), ('b', 30), ('c', 40)])
+        cursor = self.conn.execute("SELECT * FROM users WHERE age > ?", (25,))
+        self.assertEqual(len(cursor.fetchall()), 2)
+        cursor.close()
+        self.assertEqual(self.registry.get("INSERT INTO users VALUES (?, ?)")['rows'], 3)
+        self.assertEqual(self.registry.get("SELECT * FROM users WHERE age > 1")['rows'], 2)
+
+    def test_error_recorded(self):
+        """A failing statement is recorded as an error and re-raised."""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.conn.execute("SELECT * FROM missing")
+        self.assertEqual(self.registry.get("SELECT * FROM missing")['errors'], 1)
+
+    def test_recorded_on_next_statement(self):
+        """A cursor's call is recorded when it runs its next statement."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM users")
+        self.assertIsNone(self.registry.get("SELECT * FROM users"))
+        cursor.execute("SELECT 1")
+        self.assertEqual(self.registry.get("SELECT * FROM users")['calls'], 1)
+        cursor.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
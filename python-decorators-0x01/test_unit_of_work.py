@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Unit tests for UnitOfWork savepoints and WriteBehind batching.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+db_pool = __import__('db_pool')
+unit_of_work = __import__('unit_of_work')
+transactional_module = __import__('2-transactional')
+with_db_connection = transactional_module.with_db_connection
+transactional = transactional_module.transactional
+
+
+@with_db_connection
+@transactional
+def add_user(conn, name, email):
+    conn.execute("INSERT INTO users (name, email) VALUES (?, ?)", (name, email))
+
+
+@with_db_connection
+@transactional
+def set_email(conn, name, email):
+    conn.execute("UPDATE users SET email = ? WHERE name = ?", (email, name))
+
+
+class TestUnitOfWork(unittest.TestCase):
+    """Testing that calls inside a UnitOfWork commit together, each in its own savepoint"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'users.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE users (name TEXT PRIMARY KEY, email TEXT UNIQUE)")
+        conn.close()
+        self.pool = db_pool.SQLitePool(self.database, size=2)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def names(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return [row[0] for row in conn.execute("SELECT name FROM users ORDER BY name")]
+        finally:
+            conn.close()
+
+    def test_failed_call_is_rolled_back_alone(self):
+        """A call that fails undoes only its own writes; the others commit."""
+        with unit_of_work.UnitOfWork(self.pool) as uow:
+            add_user(name='alice', email='a@example.com')
+            with self.assertRaises(sqlite3.IntegrityError):
+                add_user(name='bob', email='a@example.com')
+            add_user(name='carol', email='c@example.com')
+        self.assertEqual((uow.calls, uow.failed), (3, 1))
+        self.assertEqual(self.names(), ['alice', 'carol'])
+
+    def test_partial_writes_are_undone(self):
+        """The savepoint also takes back what the failing call wrote before it failed."""
+        @with_db_connection
+        @transactional
+        def add_two(conn, first, second):
+            conn.execute("INSERT INTO users (name, email) VALUES (?, ?)", first)
+            conn.execute("INSERT INTO users (name, email) VALUES (?, ?)", second)
+
+        with unit_of_work.UnitOfWork(self.pool):
+            add_user(name='alice', email='a@example.com')
+            with self.assertRaises(sqlite3.IntegrityError):
+                add_two(('bob', 'b@example.com'), ('carol', 'a@example.com'))
+        self.assertEqual(self.names(), ['alice'])
+
+    def test_nothing_is_written_before_the_end(self):
+        """Other connections see the writes only once the block ends."""
+        with unit_of_work.UnitOfWork(self.pool):
+            add_user(name='alice', email='a@example.com')
+            self.assertEqual(self.names(), [])
+        self.assertEqual(self.names(), ['alice'])
+
+    def test_error_leaving_the_block(self):
+        """An exception leaving the block rolls every call back."""
+        with self.assertRaises(RuntimeError):
+            with unit_of_work.UnitOfWork(self.pool):
+                add_user(name='alice', email='a@example.com')
+                raise RuntimeError("abort")
+        self.assertEqual(self.names(), [])
+        self.assertIsNone(unit_of_work.current())
+
+    def test_nested_unit_joins(self):
+        """A unit entered inside another shares its connection and transaction."""
+        with unit_of_work.UnitOfWork(self.pool) as outer:
+            with unit_of_work.UnitOfWork(self.pool) as inner:
+                add_user(name='alice', email='a@example.com')
+            self.assertIs(inner, outer)
+            self.assertEqual(self.names(), [])
+        self.assertEqual(self.names(), ['alice'])
+
+
+class TestWriteBehind(unittest.TestCase):
+    """Testing that WriteBehind queues calls and flushes them as units of work"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'users.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE users (name TEXT PRIMARY KEY, email TEXT UNIQUE)")
+            conn.executemany("INSERT INTO users VALUES (?, ?)", [('alice', 'a0'), ('bob', 'b0')])
+        conn.close()
+        self.pool = db_pool.SQLitePool(self.database, size=2)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def emails(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return dict(conn.execute("SELECT name, email FROM users"))
+        finally:
+            conn.close()
+
+    def test_flushed_on_exit(self):
+        """Queued calls return None and are written when the block ends."""
+        with unit_of_work.WriteBehind(flush_every=100, flush_ms=10_000, pool=self.pool) as queue:
+            self.assertIsNone(set_email(name='alice', email='a1'))
+            self.assertEqual(self.emails()['alice'], 'a0')
+        self.assertEqual(self.emails()['alice'], 'a1')
+        self.assertEqual(queue.counters['written'], 1)
+
+    def test_last_write_wins(self):
+        """With a key only the last call queued for it is run."""
+        with unit_of_work.WriteBehind(flush_every=100, flush_ms=10_000, pool=self.pool,
+                                      key=lambda call: call['name']) as queue:
+            for n in range(5):
+                set_email(name='alice', email=f"a{n + 1}")
+            set_email(name='bob', email='b1')
+        self.assertEqual(self.emails(), {'alice': 'a5', 'bob': 'b1'})
+        self.assertEqual(queue.counters['coalesced'], 4)
+        self.assertEqual(queue.counters['written'], 2)
+
+    def test_failed_call_is_kept(self):
+        """A failing queued call is recorded and does not undo the rest of its batch."""
+        with unit_of_work.WriteBehind(flush_every=100, flush_ms=10_000, pool=self.pool) as queue:
+            set_email(name='alice', email='b0')
+            set_email(name='bob', email='b1')
+        self.assertEqual(self.emails(), {'alice': 'a0', 'bob': 'b1'})
+        self.assertEqual(len(queue.errors), 1)
+        self.assertIsInstance(queue.errors[0], sqlite3.IntegrityError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# Unit of work for the transactional decorator (2-transactional.py).
+# Every decorated write normally borrows a connection, commits and syncs on its own. Inside
+#
+#   with unit_of_work.UnitOfWork():
+#       for name, email in changes:
+#           update_user_email(name=name, new_email=email)
+#
+# with_db_connection hands every call the unit's connection and transactional runs each one
+# in a SAVEPOINT instead of committing: a failing call is rolled back on its own (and still
+# raises), the others are committed together once the block ends.
+#
+# WriteBehind goes one step further: the calls return at once and are queued, then run as
+# one unit of work every `flush_every` calls or `flush_ms` milliseconds, whichever comes
+# first. With `key=` later writes replace queued ones with the same key (last write wins):
+#
+#   with unit_of_work.WriteBehind(key=lambda call: call.get('name')):   # one email per name
+import inspect
+import itertools
+import threading
+import time
+
+cache_module = __import__('query_cache')
+db_pool = __import__('db_pool')
+
+_local = threading.local()
+
+
+def current():
+    """The unit of work (or write-behind queue) active in this thread, if any"""
+    return getattr(_local, 'active', None)
+
+
+class UnitOfWork:
+    """One transaction for every transactional call made inside the `with` block.
+
+    A unit of work entered while another one is active in the same thread joins it.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.connection = None
+        self.calls = self.failed = 0
+        self._outer = None
+        self._joined = False
+
+    def __enter__(self):
+        self._outer = current()
+        if isinstance(self._outer, UnitOfWork):
+            self._joined = True
+            self.connection = self._outer.connection
+            return self._outer
+        self._borrowed = (self.pool or db_pool.get_pool()).connection()
+        self.connection = self._borrowed.__enter__()
+        # BEGIN explicitly: a SAVEPOINT outside a transaction would commit on its RELEASE
+        self.connection.execute("BEGIN")
+        self._tracking = cache_module.track_writes(self.connection)
+        self._statements = self._tracking.__enter__()
+        _local.active = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._joined:
+            return False
+        _local.active = self._outer
+        try:
+            self._tracking.__exit__(None, None, None)
+            if exc_type is None:
+                self.connection.commit()
+                # the results cache_query holds for the tables written are stale from now on
+                cache_module.invalidate_writes(self.connection, self._statements)
+            else:
+                self.connection.rollback()
+        finally:
+            self._borrowed.__exit__(exc_type, exc, tb)
+        return False
+
+    def run(self, func, conn, *args, **kwargs):
+        """Run one transactional call inside its own savepoint"""
+        # one name for every call: the statements stay identical (statement cache, statement_stats),
+        # and a nested call's savepoint of the same name shadows this one until it is released
+        savepoint = "uow_call"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        self.calls += 1
+        try:
+            value = func(conn, *args, **kwargs)
+        except Exception:
+            self.failed += 1
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            raise
+        conn.execute(f"RELEASE {savepoint}")
+        return value
+
+
+class WriteBehind:
+    """Queues with_db_connection calls and runs them in batches, each batch one UnitOfWork.
+
+    Calls made inside the `with` block return None at once; leaving the block flushes what
+    is still queued. `key` gets the arguments of a call by name (the connection left out) and
+    returns its coalescing key, or None for a call that must not replace any other. Errors
+    of queued calls cannot reach their caller any more, so they are printed and kept in
+    `errors` (most recent last, at most `max_errors`).
+    """
+
+    def __init__(self, flush_every=1000, flush_ms=50, key=None, pool=None, max_errors=100):
+        self.flush_every = flush_every
+        self.flush_ms = flush_ms
+        self.key = key
+        self.pool = pool
+        self.max_errors = max_errors
+        self.errors = []
+        self.counters = dict(submitted=0, coalesced=0, flushes=0, written=0, failed=0)
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._signatures = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._flusher = None
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = current()
+        _local.active = self
+        self._flusher = threading.Thread(target=self._flush_periodically, name='write-behind', daemon=True)
+        self._flusher.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.active = self._outer
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        self.flush()
+        return False
+
+    def submit(self, func, *args, **kwargs):
+        key = self._key(func, args, kwargs)
+        with self._lock:
+            self.counters['submitted'] += 1
+            if key is None:
+                key = next(self._sequence)
+            elif key in self._pending:
+                self.counters['coalesced'] += 1
+                del self._pending[key]  # re-queued at the end: it now runs after what came in between
+            self._pending[key] = (func, args, kwargs)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._wakeup.notify()
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def _key(self, func, args, kwargs):
+        if self.key is None:
+            return None
+        if args:
+            signature = self._signatures.get(func)
+            if signature is None:
+                signature = self._signatures[func] = inspect.signature(func)
+            # None stands in for the connection the call will get
+            arguments = signature.bind(None, *args, **kwargs).arguments
+            arguments.pop(next(iter(signature.parameters)))
+        else:
+            arguments = kwargs  # already by name, and Signature.bind is slow next to a write
+        key = self.key(arguments)
+        return None if key is None else (func, key)
+
+    def flush(self):
+        """Run everything queued so far as one unit of work"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._oldest = self._pending, {}, None
+            if not batch:
+                return 0
+            with UnitOfWork(self.pool) as uow:
+                for func, args, kwargs in batch.values():
+                    try:
+                        func(uow.connection, *args, **kwargs)
+                    except Exception as e:
+                        print(f"Error occurred: {e}")
+                        self.errors = (self.errors + [e])[-self.max_errors:]
+            with self._lock:
+                self.counters['flushes'] += 1
+                self.counters['written'] += uow.calls - uow.failed
+                self.counters['failed'] += uow.failed
+            return len(batch)
+
+    def _flush_periodically(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._oldest is None:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                wait = self._oldest + self.flush_ms / 1000 - time.monotonic()
+                if wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+            self.flush()
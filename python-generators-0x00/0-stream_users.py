@@ -1,24 +1,74 @@
 # create a generator that streams rows from the SQL database
-import mysql.connector
 from mysql.connector import Error
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
+pool = __import__('pool')
+partitioned_scan = __import__('partitioned_scan').partitioned_scan
+Query = __import__('query').Query
+checkpoint_module = __import__('checkpoint')
 
-def stream_users():
+ROW_FORMATS = ('tuple', 'dict')
+
+
+def stream_users(fetch_size=1000, row_format='tuple', buffered=False, partitions=1, ordered=True,
+                 checkpoint=None, resume_from=None, checkpoint_every=10_000, checkpoint_seconds=None):
+    """Stream the rows of user_data one by one.
+
+    The cursor is unbuffered by default, so the server sends the rows as we read them
+    and only `fetch_size` rows sit in client memory at any time.
+    Pass buffered=True to get the old behaviour of pulling the whole result set first.
+    With partitions > 1 the table is read by that many connections in parallel
+    (see partitioned_scan); ordered=False yields rows as soon as any of them has some.
+
+    With a checkpoint (a path or a checkpoint.FileCheckpoint/SQLiteCheckpoint) the rows come
+    in user_id order and the last finished user_id is saved every `checkpoint_every` rows or
+    `checkpoint_seconds`. resume_from=True continues after that saved user_id; it also takes
+    a checkpoint object or a user_id.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+    after_id = checkpoint_module.resume_position(resume_from, checkpoint)
+    in_key_order = checkpoint is not None or after_id is not None
+    if in_key_order and partitions > 1 and not ordered:
+        raise ValueError("checkpoints and resume_from need ordered=True")
+
+    query = Query()
+    if in_key_order:
+        # free on InnoDB: the table is stored in user_id order already
+        query = query.order_by('user_id')
+    if after_id is not None:
+        query = query.where('user_id', '>', after_id)
+
+    rows = _stream_rows(query, fetch_size, row_format, buffered, partitions, ordered)
+    if checkpoint is not None:
+        key = 'user_id' if row_format == 'dict' else 0
+        rows = checkpoint_module.checkpointed(rows, checkpoint, lambda row: row[key],
+                                              every=checkpoint_every, seconds=checkpoint_seconds,
+                                              resumed=after_id is not None)
+    yield from rows
+
+
+def _stream_rows(query, fetch_size, row_format, buffered, partitions, ordered):
+    if partitions > 1:
+        for batch in partitioned_scan(partitions, fetch_size, query, ordered=ordered,
+                                      dictionary=(row_format == 'dict')):
+            yield from batch
+        return
+
+    sql, params = query.compile()
     try:
-        with mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password=os.environ.get('password'),
-            database = 'ALX_prodev',
-        ) as connection:
-            with connection.cursor(buffered=True) as cursor: # we put buffered=True to ensure that we don't get the error of Unread result found.
-                cursor.execute("SELECT * FROM user_data;")
-                # Do not load everything in memory
-                for row in cursor:
+        # The pool hands out a connection and takes it back afterwards. If the consumer stopped
+        # early (islice, break, an exception) an unbuffered cursor still has rows waiting on the
+        # socket; the pool drops that connection instead of reading them ("Unread result found").
+        with pool.connection() as connection:
+            cursor = connection.cursor(buffered=buffered, dictionary=(row_format == 'dict'))
+            cursor.execute(sql, params)
+            # Do not load everything in memory
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
                     yield row
-
+            cursor.close()
     except Error as e:
-        print(f"Error occured: {e}")
\ No newline at end of file
+        print(f"Error occured: {e}")
@@ -1,35 +1,95 @@
 # generator to fetch and process data in batches from the users database
 # use def batch_processing(batch_size) that processes each batch to filter users over the age of 25
 # use def stream_users_in_batches(batch_size)
-import mysql.connector
 from mysql.connector import Error
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+pool = __import__('pool')
+prefetch = __import__('prefetch').prefetch
+Query = __import__('query').Query
+partitioned_scan = __import__('partitioned_scan').partitioned_scan
+columnar_batches = __import__('columnar').columnar_batches
+ColumnBatch = __import__('columnar').ColumnBatch
+USER_COLUMNS = __import__('columnar').USER_COLUMNS
+checkpoint_module = __import__('checkpoint')
+Pipeline = __import__('pipeline').Pipeline
+row_converter = __import__('row_factory').row_converter
 
 
-def stream_users_in_batches(batch_size):
+def _last_user_id(batch):
+    return batch['user_id'][-1] if isinstance(batch, ColumnBatch) else batch[-1]['user_id']
+
+def stream_users_in_batches(batch_size, query=None, partitions=1, ordered=True, partition_mode='thread',
+                            columnar=None, checkpoint=None, resume_from=None, checkpoint_every=10_000,
+                            checkpoint_seconds=None, prefetch_depth=0, row_factory=None):
+    # query is a query.Query; by default every column of every row is streamed
+    # columnar='array' or 'numpy' yields columnar.ColumnBatch objects instead of lists of dicts
+    # row_factory='slots' or 'namedtuple' yields lists of compact row_factory.UserRow/UserTuple rows
+    # checkpoint/resume_from work like in stream_users: batches come in user_id order and the
+    # last user_id of every finished batch is recorded
+    query = query or Query()
+    if row_factory == 'dict':
+        row_factory = None
+    if columnar and row_factory:
+        raise ValueError("columnar and row_factory cannot be combined")
+    after_id = checkpoint_module.resume_position(resume_from, checkpoint)
+    if checkpoint is not None or after_id is not None:
+        if partitions > 1 and not ordered:
+            raise ValueError("checkpoints and resume_from need ordered=True")
+        if query.columns and 'user_id' not in query.columns:
+            query = query.select(*query.columns, 'user_id')
+        query = query.order_by('user_id')
+        if after_id is not None:
+            query = query.where('user_id', '>', after_id)
+    batches = _batches(batch_size, query, partitions, ordered, partition_mode, columnar, row_factory)
+    if prefetch_depth:
+        # read ahead below the checkpoint, so a batch only counts as finished once the consumer is done with it
+        batches = prefetch(batches, depth=prefetch_depth)
+    if checkpoint is not None:
+        batches = checkpoint_module.checkpointed(batches, checkpoint, _last_user_id, size_of=len,
+                                                 every=checkpoint_every, seconds=checkpoint_seconds,
+                                                 resumed=after_id is not None)
+    yield from batches
+
+def _batches(batch_size, query, partitions, ordered, partition_mode, columnar, row_factory=None):
+    if partitions > 1:
+        # split the table into user_id ranges read in parallel, each on its own connection
+        batches = partitioned_scan(partitions, batch_size, query, ordered=ordered, mode=partition_mode,
+                                   dictionary=not (columnar or row_factory))
+        if columnar:
+            batches = columnar_batches(batches, query.columns or USER_COLUMNS, columnar)
+        elif row_factory:
+            batches = map(row_converter(row_factory, query.columns or USER_COLUMNS), batches)
+        yield from batches
+        return
+    sql, params = query.compile()
     try:
-        with mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password=os.environ.get('password'),
-            database='ALX_prodev'
-        ) as connection:
-            with connection.cursor(dictionary=True) as cursor: # we use dictionary=True to return a dictionary instead of a tuple
-                cursor.execute("SELECT * FROM user_data;")
-                while True:
-                    batch = cursor.fetchmany(batch_size)
-                    if not batch:
-                        break
-                    yield batch
-                
+        with pool.connection() as connection:
+            cursor = connection.cursor(dictionary=not (columnar or row_factory)) # we use dictionary=True to return a dictionary instead of a tuple
+            cursor.execute(sql, params)
+            convert = row_converter(row_factory, cursor.column_names) if row_factory else None
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                if columnar:
+                    # tuples are transposed straight into columns, no dict is ever built
+                    batch = ColumnBatch.from_rows(batch, cursor.column_names, columnar)
+                elif convert:
+                    batch = convert(batch)
+                yield batch
+            cursor.close()
     except Error as e:
         print(f"Error occured: {e}")
 
-def batch_processing(batch_size):
-    for batch in stream_users_in_batches(batch_size=batch_size):
-        for row in batch:
-            if row['age'] > 25:
-                print(row)
+def batch_processing(batch_size, prefetch_depth=0, columns=(), partitions=1, partition_mode='thread',
+                     columnar=None, checkpoint=None, resume_from=None):
+    # the age filter runs in MySQL (on idx_user_data_age) so the younger users never leave the server
+    query = Query().select(*columns).where('age', '>', 25)
+    batches = stream_users_in_batches(batch_size=batch_size, query=query, partitions=partitions,
+                                      ordered=checkpoint is not None or resume_from is not None,
+                                      partition_mode=partition_mode,
+                                      columnar=columnar, checkpoint=checkpoint, resume_from=resume_from,
+                                      prefetch_depth=prefetch_depth)
+    if columnar:
+        batches = (list(batch.rows()) for batch in batches)
+    Pipeline(batches).sink(print)
@@ -1,8 +1,7 @@
-from itertools import islice
-
 stream_users = __import__('0-stream_users')
+Pipeline = __import__('pipeline').Pipeline
 
 # iterate over the generator function and print only the first 6 rows
+# (the limit also caps what is read: 6 rows are pulled from the stream, not a whole chunk)
 
-for user in islice(stream_users.stream_users(), 6):
-    print(user)
\ No newline at end of file
+Pipeline.rows(stream_users.stream_users()).limit(6).sink(print)
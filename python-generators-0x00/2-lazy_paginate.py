@@ -1,18 +1,99 @@
-seed = __import__('seed')
-
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
+import base64
+import json
+
+pool = __import__('pool')
+prefetch = __import__('prefetch').prefetch
+row_converter = __import__('row_factory').row_converter
+
+# LIMIT/OFFSET makes MySQL walk past every skipped row, so a full walk costs O(n^2).
+# lazy_pagination seeks on the user_id primary key instead: each page starts right after
+# the last user_id of the previous one and costs the same no matter how deep we are.
+TOKEN_VERSION = 1
+
+
+class Page(list):
+    """A page of users that also carries the token to resume right after it"""
+    def __init__(self, rows, next_token=None):
+        super().__init__(rows)
+        self.next_token = next_token
+
+
+def encode_token(after_id):
+    """Turn the last user_id of a page into an opaque continuation token"""
+    payload = json.dumps({'v': TOKEN_VERSION, 'after': after_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return the user_id a continuation token resumes after"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['v'] != TOKEN_VERSION:
+            raise ValueError(f"unsupported token version {payload['v']}")
+        return payload['after']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid continuation token: {token!r}") from e
+
+
+def _cursor(connection, row_factory):
+    # dict rows come straight from the driver; other row factories are built from its tuples
+    return connection.cursor(dictionary=row_factory in (None, 'dict'))
+
+
+def _convert(cursor, rows, row_factory):
+    if row_factory in (None, 'dict') or not rows:
+        return rows
+    return row_converter(row_factory, cursor.column_names)(rows)
+
+
+def paginate_users(page_size, offset, row_factory=None):
+    # row_factory='slots' or 'namedtuple' returns compact row_factory.UserRow/UserTuple rows
+    with pool.connection() as connection:
+        cursor = _cursor(connection, row_factory)
+        cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+        rows = _convert(cursor, cursor.fetchall(), row_factory)
+        cursor.close()
     return rows
 
-def lazy_pagination(page_size):
-    data = paginate_users(page_size=page_size, offset=0)
-    yield data
 
+def fetch_page(cursor, page_size, after_id=None):
+    """Fetch the next `page_size` users ordered by user_id, starting after `after_id`"""
+    if after_id is None:
+        cursor.execute("SELECT * FROM user_data ORDER BY user_id LIMIT %s", (page_size,))
+    else:
+        cursor.execute(
+            "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s",
+            (after_id, page_size),
+        )
+    return cursor.fetchall()
+
+
+def lazy_pagination(page_size, token=None, prefetch_depth=0, row_factory=None):
+    """Yield pages of users until the table is exhausted.
 
+    Pass the `next_token` of a page as `token` to resume right after that page.
+    With prefetch_depth > 0 the next pages are fetched on a background thread.
+    row_factory='slots' or 'namedtuple' fills the pages with compact rows instead of dicts.
+    """
+    after_id = decode_token(token) if token else None
+    pages = _walk_pages(page_size, after_id, row_factory)
+    if prefetch_depth:
+        pages = prefetch(pages, depth=prefetch_depth)
+    yield from pages
 
-    
 
+def _walk_pages(page_size, after_id, row_factory=None):
+    # One connection (and cursor) for the whole walk instead of one per page
+    with pool.connection() as connection:
+        cursor = _cursor(connection, row_factory)
+        while True:
+            rows = _convert(cursor, fetch_page(cursor, page_size, after_id), row_factory)
+            if not rows:
+                break
+            after_id = rows[-1]['user_id']
+            last_page = len(rows) < page_size
+            yield Page(rows, next_token=None if last_page else encode_token(after_id))
+            if last_page:
+                break
+        cursor.close()
@@ -1,39 +1,125 @@
 # Script that yields user ages one by one and then calculates the average age without loading the whole dataset to memory
-import mysql.connector
 from mysql.connector import Error
-from dotenv import load_dotenv
 import os
 import statistics
 
-load_dotenv()
+pool = __import__('pool')
+prefetch = __import__('prefetch').prefetch
+Query = __import__('query').Query
+StreamingStats = __import__('streaming_stats').StreamingStats
+partitioned_scan = __import__('partitioned_scan').partitioned_scan
+processing = __import__('1-batch_processing')
+row_converter = __import__('row_factory').row_converter
 
-def stream_user_ages():
+def _age_query(after_id=None):
+    # user_data is clustered on user_id, so ordering by it is free and gives us a resume point
+    query = Query().select('user_id', 'name', 'age').order_by('user_id')
+    if after_id is not None:
+        query = query.where('user_id', '>', after_id)
+    return query
+
+def _age_batches(batch_size, after_id=None, row_factory=None):
+    sql, params = _age_query(after_id).compile()
     try:
-        with mysql.connector.connect(
-            host="localhost",
-            user='root',
-            password=os.environ.get('password'),
-            database='ALX_prodev'
-        ) as connection:
-                with connection.cursor(dictionary=True, buffered=False) as cursor:
-                    cursor.execute("SELECT name, age FROM user_data;")
-                    for user in cursor:
-                         yield user
+        with pool.connection() as connection:
+                cursor = connection.cursor(dictionary=row_factory is None, buffered=False)
+                cursor.execute(sql, params)
+                convert = row_converter(row_factory, cursor.column_names) if row_factory else None
+                while True:
+                     batch = cursor.fetchmany(batch_size)
+                     if not batch:
+                          break
+                     yield convert(batch) if convert else batch
+                cursor.close()
     except Error as e:
          print(f"Error occured: {e}")
 
+def stream_user_ages(batch_size=1000, prefetch_depth=0, after_id=None, partitions=1, partition_mode='thread',
+                     row_factory=None):
+     # Rows are still yielded one by one, but they are read in batches so that the next
+     # batch can be fetched on a background thread (prefetch_depth > 0) while we consume this one
+     # Rows come in user_id order; pass after_id to start right after a given user
+     # row_factory='slots' or 'namedtuple' yields compact row_factory.UserRow/UserTuple rows
+     if row_factory == 'dict':
+          row_factory = None
+     if partitions > 1:
+          # the ranges are read in parallel but still handed over in order, so after_id stays valid
+          query = _age_query(after_id)
+          batches = partitioned_scan(partitions, batch_size, query, ordered=True, mode=partition_mode,
+                                     dictionary=row_factory is None)
+          if row_factory:
+               batches = map(row_converter(row_factory, query.columns), batches)
+     else:
+          batches = _age_batches(batch_size, after_id, row_factory)
+     if prefetch_depth:
+          batches = prefetch(batches, depth=prefetch_depth)
+     for batch in batches:
+          yield from batch
+
 # It could have been so easy to tackle the problem by initializing an empty list, appending values to it 
 # and then calculating the average. This would have meant loading everything in memory
 # So use the method below to ensure it is still memory efficient
 
-def calculate_average():
+def age_statistics(checkpoint=None, checkpoint_every=100_000, partitions=1, partition_mode='thread'):
+     """Count, mean, variance, min/max, quantiles and a histogram of the ages in one pass.
+
+     With a checkpoint path the running state is saved every `checkpoint_every` rows, and a
+     later call with the same path picks up right after the last user it had counted.
+     """
+     if checkpoint and os.path.exists(checkpoint):
+          stats = StreamingStats.load(checkpoint)
+     else:
+          stats = StreamingStats()
+     since_checkpoint = 0
+     ages = stream_user_ages(after_id=stats.position, partitions=partitions, partition_mode=partition_mode)
+     for person in ages:
+          if person['age'] is not None:
+               stats.update(person['age'])
+          stats.position = person['user_id']
+          since_checkpoint += 1
+          if checkpoint and since_checkpoint >= checkpoint_every:
+               stats.save(checkpoint)
+               since_checkpoint = 0
+     if checkpoint:
+          stats.save(checkpoint)
+     return stats
+
+def average_age_columnar(backend='array', partitions=1, batch_size=10_000):
+     # Only the age column is fetched, and each batch is summed in one call on its age array
+     query = Query().select('age').where('age', 'IS NOT NULL')
+     total, count = 0, 0
+     for batch in processing.stream_users_in_batches(batch_size, query, partitions=partitions,
+                                                     ordered=False, columnar=backend):
+          total += batch.total('age')
+          count += len(batch)
+     return total / count if count else None
+
+def average_age(partitions=1, partition_mode='thread'):
+     # Just a running sum and count: the quantile sketch and histogram of age_statistics
+     # cost several times more per row, and an average needs neither
      total, count = 0, 0
-     for person in stream_user_ages():
-          total += person['age']
-          count +=1
-     if count > 0:
-          print(f"Average age of users: {total/count}")
+     for person in stream_user_ages(partitions=partitions, partition_mode=partition_mode):
+          if person['age'] is not None:
+               total += person['age']
+               count += 1
+     return total / count if count else None
+
+def calculate_average(partitions=1, columnar=None, describe=False):
+     # describe=True also prints age_statistics' variance, quantiles and histogram
+     if columnar:
+          average = average_age_columnar(columnar, partitions)
+     elif describe:
+          stats = age_statistics(partitions=partitions)
+          average = stats.mean if stats.count else None
+          if average is not None:
+               print(stats.summary())
+     else:
+          average = average_age(partitions)
+     if average is not None:
+          print(f"Average age of users: {average}")
+          return average
      else:
           print("You encountered an error")
 
-calculate_average()
\ No newline at end of file
+if __name__ == "__main__":
+     calculate_average()
\ No newline at end of file
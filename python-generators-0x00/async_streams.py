@@ -0,0 +1,115 @@
+# async for versions of stream_users, stream_users_in_batches and stream_user_ages.
+# The generators in 0-4 block the thread that iterates them, so an asyncio service that
+# consumes one stalls its whole event loop for the scan. These read user_data through
+# aiosqlite instead (the SQLite stand-in built by sqlite_standin.py, or any file with the same
+# schema), so several scans can share one event loop:
+#
+#   async for user in async_streams.stream_users():
+#       ...
+#
+# Each scan reads ahead on its own connection through a bounded queue: the reader runs at
+# most `prefetch_depth` batches ahead of the consumer and waits for it otherwise.
+import asyncio
+import os
+
+import aiosqlite
+from aiosqlite import Error
+
+Query = __import__('query').Query
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'user_data_standin.db')
+
+_DONE = object()
+
+
+def default_database():
+    # the same env var that points the pool at the stand-in
+    return os.environ.get('sqlite_standin', STANDIN_PATH)
+
+
+async def prefetch(source, depth=2):
+    """Iterate the async iterator `source` in a task, staying up to `depth` items ahead.
+
+    The queue is bounded, so a slow consumer makes the reader wait (backpressure) instead of
+    buffering the table. Errors from the source are re-raised in the consumer, and closing
+    this generator early cancels the reader and closes the source.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    buffer = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        try:
+            async for item in source:
+                await buffer.put(item)
+            await buffer.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await buffer.put(e)
+        finally:
+            aclose = getattr(source, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def _batches(batch_size, query, dictionary, database):
+    sql, params = query.compile(placeholder='?')
+    try:
+        async with aiosqlite.connect(database or default_database()) as db:
+            async with db.execute(sql, params) as cursor:
+                names = [column[0] for column in cursor.description]
+                while True:
+                    batch = await cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    if dictionary:
+                        batch = [dict(zip(names, row)) for row in batch]
+                    yield batch
+    except Error as e:
+        print(f"Error occured: {e}")
+
+
+def _read_ahead(batches, prefetch_depth):
+    return prefetch(batches, depth=prefetch_depth) if prefetch_depth else batches
+
+
+async def stream_users(fetch_size=1000, row_format='tuple', query=None, prefetch_depth=2, database=None):
+    """async for counterpart of 0-stream_users.stream_users"""
+    if row_format not in ('tuple', 'dict'):
+        raise ValueError("row_format must be 'tuple' or 'dict'")
+    batches = _batches(fetch_size, query or Query(), row_format == 'dict', database)
+    async for batch in _read_ahead(batches, prefetch_depth):
+        for row in batch:
+            yield row
+
+
+async def stream_users_in_batches(batch_size, query=None, prefetch_depth=2, database=None):
+    """async for counterpart of 1-batch_processing.stream_users_in_batches (lists of dicts)"""
+    async for batch in _read_ahead(_batches(batch_size, query or Query(), True, database), prefetch_depth):
+        yield batch
+
+
+async def stream_user_ages(batch_size=1000, after_id=None, prefetch_depth=2, database=None):
+    """async for counterpart of 4-stream_ages.stream_user_ages, in user_id order"""
+    query = Query().select('user_id', 'name', 'age').order_by('user_id')
+    if after_id is not None:
+        query = query.where('user_id', '>', after_id)
+    async for batch in _read_ahead(_batches(batch_size, query, True, database), prefetch_depth):
+        for row in batch:
+            yield row
@@ -0,0 +1,80 @@
+# Benchmark for async_streams.py against the thread-based generators.
+# Runs N full scans of the SQLite stand-in concurrently, either as async generators in one
+# event loop or as the blocking stream_users in N threads, and reports total rows/s. While
+# they run, a ticker task measures how long the event loop is kept from running other work
+# (the blocking generator called straight from a coroutine is included for reference).
+#
+# usage: python bench_async.py [--rows 200000] [--scans 1 4 8]
+import argparse
+import asyncio
+import time
+
+sqlite_standin = __import__('sqlite_standin')
+async_streams = __import__('async_streams')
+stream_users = __import__('0-stream_users').stream_users
+
+
+async def ticker(stop, interval=0.005):
+    """Largest delay between when the loop should have woken us and when it did"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def async_scan():
+    rows = 0
+    async for _ in async_streams.stream_users():
+        rows += 1
+    return rows
+
+
+def blocking_scan():
+    return sum(1 for _ in stream_users())
+
+
+async def run_async(scans):
+    return sum(await asyncio.gather(*(async_scan() for _ in range(scans))))
+
+
+async def run_threads(scans):
+    return sum(await asyncio.gather(*(asyncio.to_thread(blocking_scan) for _ in range(scans))))
+
+
+async def run_blocking(scans):
+    # what happens when a coroutine simply iterates the blocking generator
+    return sum(blocking_scan() for _ in range(scans))
+
+
+async def measure(runner, scans):
+    stop = asyncio.Event()
+    lag = asyncio.create_task(ticker(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    rows = await runner(scans)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return rows, elapsed, await lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="async generators vs threads on the SQLite stand-in")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--scans', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--standin', default=async_streams.STANDIN_PATH)
+    args = parser.parse_args()
+
+    sqlite_standin.build(args.standin, rows=args.rows)
+    sqlite_standin.use(args.standin, size=max(args.scans))
+
+    print(f"{'mode':>10} {'scans':>6} {'rows/s':>12} {'seconds':>9} {'max loop lag ms':>16}")
+    for scans in args.scans:
+        for name, runner in (('async', run_async), ('threads', run_threads), ('blocking', run_blocking)):
+            rows, elapsed, lag = asyncio.run(measure(runner, scans))
+            print(f"{name:>10} {scans:>6} {rows / elapsed:>12,.0f} {elapsed:>9.2f} {1000 * lag:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Memory and throughput of columnar batches against the dict batches of stream_users_in_batches.
+# By default the batches are built from user_data.csv repeated up to --rows, so the numbers
+# do not depend on a database; --mysql streams the real table instead.
+#
+# usage: python bench_columnar.py [--rows 1000000] [--batch-size 1000] [--mysql]
+import argparse
+import csv
+import gc
+import itertools
+import os
+import time
+import tracemalloc
+
+columnar = __import__('columnar')
+processing = __import__('1-batch_processing')
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'user_data.csv')
+
+
+def synthetic_tuple_batches(rows, batch_size):
+    with open(CSV_PATH, newline='') as file:
+        base = [(r['name'], r['email'], int(r['age'])) for r in csv.DictReader(file)]
+    # fresh string objects for every row, like a driver would hand back
+    source = ((f"{n:08x}-0000-4000-8000-000000000000", name.encode().decode(), email.encode().decode(), age)
+              for n, (name, email, age) in zip(range(rows), itertools.cycle(base)))
+    while True:
+        batch = list(itertools.islice(source, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def make_batches(kind, args):
+    if args.mysql:
+        return processing.stream_users_in_batches(args.batch_size, columnar=None if kind == 'dict' else kind)
+    tuples = synthetic_tuple_batches(args.rows, args.batch_size)
+    if kind == 'dict':
+        return ([dict(zip(columnar.USER_COLUMNS, row)) for row in batch] for batch in tuples)
+    return columnar.columnar_batches(tuples, backend=kind)
+
+
+def filter_and_average(kind, batch):
+    """The batch_processing filter and the calculate_average aggregate on one batch"""
+    if kind == 'dict':
+        older = [row for row in batch if row['age'] > 25]
+        return len(older), sum(row['age'] for row in batch), len(batch)
+    older = batch.indexes_where('age', '>', 25)
+    return len(older), batch.total('age'), len(batch)
+
+
+def measure_memory(kind, args):
+    """Bytes allocated to hold every batch of the scan at once"""
+    gc.collect()
+    tracemalloc.start()
+    held = list(make_batches(kind, args))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rows = sum(len(batch) for batch in held)
+    del held
+    return rows, size
+
+
+def measure_throughput(kind, args):
+    start = time.perf_counter()
+    rows = older = total = 0
+    for batch in make_batches(kind, args):
+        kept, batch_total, count = filter_and_average(kind, batch)
+        older += kept
+        total += batch_total
+        rows += count
+    return rows, time.perf_counter() - start, total / rows if rows else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar vs dict batches")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--mysql', action='store_true', help="stream user_data from MySQL")
+    args = parser.parse_args()
+
+    kinds = ['dict', 'array']
+    try:
+        import numpy  # noqa: F401
+        kinds.append('numpy')
+    except ImportError:
+        pass
+
+    print(f"{'batches':>8} {'rows':>10} {'MiB held':>9} {'bytes/row':>10} {'seconds':>8} {'rows/s':>12} {'avg age':>8}")
+    for kind in kinds:
+        rows, size = measure_memory(kind, args)
+        rows, elapsed, average = measure_throughput(kind, args)
+        print(f"{kind:>8} {rows:>10,} {size / 2**20:>9.1f} {size / rows:>10.0f} "
+              f"{elapsed:>8.2f} {rows / elapsed:>12,.0f} {average:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
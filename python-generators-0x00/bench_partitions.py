@@ -0,0 +1,60 @@
+# Benchmark for the partitioned scan: full-table jobs with 1, 2, 4 and 8 partitions.
+# Each job runs once per partition count and worker mode; batch_processing output goes
+# to /dev/null so the terminal is not the bottleneck.
+#
+# usage: python bench_partitions.py [--partitions 1 2 4 8] [--modes thread process]
+import argparse
+import contextlib
+import os
+import time
+
+processing = __import__('1-batch_processing')
+stream_ages = __import__('4-stream_ages')
+partitioned_scan = __import__('partitioned_scan')
+
+
+def full_scan(partitions, mode, batch_size):
+    rows = 0
+    for batch in processing.stream_users_in_batches(batch_size, partitions=partitions,
+                                                    ordered=False, partition_mode=mode):
+        rows += len(batch)
+    return rows
+
+
+def batch_processing(partitions, mode, batch_size):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        processing.batch_processing(batch_size, partitions=partitions, partition_mode=mode)
+
+
+def average_age(partitions, mode, batch_size):
+    return stream_ages.age_statistics(partitions=partitions, partition_mode=mode).count
+
+
+JOBS = {
+    'full scan': full_scan,
+    'batch_processing': batch_processing,
+    'age_statistics': average_age,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitioned scan scaling")
+    parser.add_argument('--partitions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--modes', nargs='+', choices=partitioned_scan.MODES, default=['thread', 'process'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'job':>18} {'mode':>8} {'partitions':>10} {'seconds':>9} {'speedup':>8}")
+    for name, job in JOBS.items():
+        for mode in args.modes:
+            baseline = None
+            for partitions in args.partitions:
+                start = time.perf_counter()
+                job(partitions, mode, args.batch_size)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(f"{name:>18} {mode:>8} {partitions:>10} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Benchmark for pipeline.py: the same filter -> map -> filter -> map chain written as
+# stacked generators and as a fused Pipeline. The batches are read from the SQLite stand-in
+# once and kept in memory, so only the per-row cost of the stages is measured.
+#
+# usage: python bench_pipeline.py [--rows 200000] [--batch-size 1000] [--repeat 5]
+import argparse
+import time
+
+sqlite_standin = __import__('sqlite_standin')
+processing = __import__('1-batch_processing')
+Pipeline = __import__('pipeline').Pipeline
+STANDIN_PATH = __import__('async_streams').STANDIN_PATH
+
+
+def is_adult(user):
+    return user['age'] > 25
+
+
+def to_pair(user):
+    return (user['name'], user['age'])
+
+
+def is_even(pair):
+    return pair[1] % 2 == 0
+
+
+def age_of(pair):
+    return pair[1]
+
+
+def stacked(batches):
+    rows = (row for batch in batches for row in batch)
+    rows = (row for row in rows if is_adult(row))
+    rows = (to_pair(row) for row in rows)
+    rows = (pair for pair in rows if is_even(pair))
+    rows = (age_of(pair) for pair in rows)
+    return sum(rows)
+
+
+def fused(batches):
+    return sum(Pipeline(batches).filter(is_adult).map(to_pair).filter(is_even).map(age_of))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stacked generators vs a fused Pipeline")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--standin', default=STANDIN_PATH)
+    args = parser.parse_args()
+
+    sqlite_standin.build(args.standin, rows=args.rows)
+    sqlite_standin.use(args.standin)
+    batches = list(processing.stream_users_in_batches(args.batch_size))
+    rows = sum(map(len, batches))
+
+    results = {}
+    for name, run in (('stacked generators', stacked), ('fused pipeline', fused)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            total = run(batches)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best
+        print(f"{name:>20}: {rows / best:>12,.0f} rows/s  ({1e9 * best / rows:.0f} ns/row, checksum {total})")
+    print(f"speedup: {results['stacked generators'] / results['fused pipeline']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Benchmark for the connection pool: many short queries through paginate_users, once with
+# a fresh connection per call (what every entry point used to do) and once through the pool.
+#
+# usage: python bench_pool.py [--calls 500] [--threads 1 8]
+import argparse
+import threading
+import time
+
+seed = __import__('seed')
+pool = __import__('pool')
+paginate_users = __import__('2-lazy_paginate').paginate_users
+
+
+def unpooled_page(page_size):
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM user_data LIMIT %s", (page_size,))
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+
+def run(call, calls, threads):
+    per_thread = calls // threads
+
+    def work():
+        for _ in range(per_thread):
+            call()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed, 1000 * elapsed / (per_thread * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency with and without the pool")
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--pool-size', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'variant':>10} {'threads':>8} {'calls/s':>10} {'ms/call':>9}")
+    for threads in args.threads:
+        rate, latency = run(lambda: unpooled_page(args.page_size), args.calls, threads)
+        print(f"{'connect':>10} {threads:>8} {rate:>10,.0f} {latency:>9.2f}")
+        pool.configure(size=args.pool_size)
+        rate, latency = run(lambda: paginate_users(args.page_size, 0), args.calls, threads)
+        print(f"{'pool':>10} {threads:>8} {rate:>10,.0f} {latency:>9.2f}")
+        stats = pool.stats()
+        print(f"{'':>10} pool: {stats['created']} connections, {stats['waits']} waits, "
+              f"mean checkout {stats['mean_checkout_ms']:.3f} ms, max {1000 * stats['max_checkout_seconds']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
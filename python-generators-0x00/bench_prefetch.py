@@ -0,0 +1,70 @@
+# Benchmark for the read-ahead stage: batch_processing-style scans with and without prefetch.
+# The consumer does some real per-row work (serialise + hash, and optionally a simulated
+# downstream call) so there is something for the next fetch to overlap with.
+#
+# usage: python bench_prefetch.py [--batch-size 500] [--depths 0 1 2 4] [--io-us 20]
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+processing = __import__('1-batch_processing')
+prefetch = __import__('prefetch').prefetch
+
+
+def process_row(row):
+    # what a real consumer would do with a row: filter, serialise, hash
+    if row['age'] > 25:
+        hashlib.sha256(json.dumps(row, default=str).encode()).hexdigest()
+
+
+def run_scan(batch_size, depth, io_us):
+    batches = processing.stream_users_in_batches(batch_size)
+    if depth:
+        batches = prefetch(batches, depth=depth)
+    start = time.perf_counter()
+    rows = 0
+    for batch in batches:
+        # simulate per-batch downstream latency in one sleep, per-row sleeps are too coarse
+        for row in batch:
+            process_row(row)
+        if io_us:
+            time.sleep(io_us * len(batch) / 1_000_000)
+        rows += len(batch)
+    return rows, time.perf_counter() - start
+
+
+def run_batch_processing(batch_size, depth):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        processing.batch_processing(batch_size, prefetch_depth=depth)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlap gain of the read-ahead stage")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--io-us', type=float, default=20,
+                        help="simulated downstream latency per row, in microseconds")
+    args = parser.parse_args()
+
+    print(f"{'stage':>18} {'depth':>6} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    baseline = None
+    for depth in args.depths:
+        rows, elapsed = run_scan(args.batch_size, depth, args.io_us)
+        baseline = baseline or elapsed
+        print(f"{'scan + work':>18} {depth:>6} {rows:>10,} {elapsed:>9.2f} "
+              f"{rows / elapsed:>12,.0f} {baseline / elapsed:>7.2f}x")
+
+    baseline = None
+    for depth in args.depths:
+        elapsed = run_batch_processing(args.batch_size, depth)
+        baseline = baseline or elapsed
+        print(f"{'batch_processing':>18} {depth:>6} {'':>10} {elapsed:>9.2f} {'':>12} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Benchmark for predicate/projection pushdown: the old `SELECT *` + Python filter against
+# the query.Query version, reporting bytes sent by the server and rows/s for each.
+# Bytes are read from the session's Bytes_sent counter, so both variants run on this
+# script's own connection with the same SQL stream_users_in_batches would send.
+#
+# usage: python bench_pushdown.py [--min-age 25] [--columns name age]
+import argparse
+import time
+
+seed = __import__('seed')
+Query = __import__('query').Query
+
+
+def bytes_sent(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent';")
+    return int(cursor.fetchone()[1])
+
+
+def run(connection, sql, params, keep, batch_size):
+    cursor = connection.cursor(dictionary=True)
+    status = connection.cursor()
+    before = bytes_sent(status)
+    start = time.perf_counter()
+    kept = 0
+    cursor.execute(sql, params)
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        kept += sum(1 for row in batch if keep(row))
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    transferred = bytes_sent(status) - before
+    status.close()
+    return kept, elapsed, transferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes and rows/s with and without pushdown")
+    parser.add_argument('--min-age', type=int, default=25)
+    parser.add_argument('--columns', nargs='*', default=['name', 'age'],
+                        help="columns the consumer actually needs")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+    seed.create_age_index(connection)
+
+    old_sql, old_params = Query().compile()
+    new_sql, new_params = Query().select(*args.columns).where('age', '>', args.min_age).compile()
+    variants = [
+        ('SELECT * + Python filter', old_sql, old_params, lambda row: row['age'] > args.min_age),
+        ('pushed down', new_sql, new_params, lambda row: True),
+    ]
+
+    print(f"{'variant':>26} {'rows':>10} {'MB sent':>9} {'seconds':>9} {'rows/s':>12}")
+    for name, sql, params, keep in variants:
+        kept, elapsed, transferred = run(connection, sql, params, keep, args.batch_size)
+        print(f"{name:>26} {kept:>10,} {transferred / 1e6:>9.2f} {elapsed:>9.2f} {kept / elapsed:>12,.0f}")
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
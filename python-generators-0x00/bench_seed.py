@@ -0,0 +1,83 @@
+# Benchmark for seed.insert_data: the original row loop against the bulk and LOAD DATA paths.
+# A synthetic CSV is generated in a temporary directory; its rows all get a 'bench.user'
+# email so they can be deleted again after each mode.
+# --sync also times sync_data on the same file: the first load, an unchanged re-run and a
+# re-run after 1% of the rows changed.
+#
+# usage: python bench_seed.py [--rows 1000000] [--modes row bulk infile] [--sync]
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+seed = __import__('seed')
+
+
+def write_csv(path, rows, changed_every=0):
+    random.seed(0)
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow(['name', 'email', 'age'])
+        for n in range(rows):
+            age = random.randint(18, 100)
+            if changed_every and n % changed_every == 0:
+                age += 1
+            writer.writerow([f"Bench User {n}", f"bench.user{n}@example.com", age])
+
+
+def drop_bench_rows(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+    DELETE user_data_hashes FROM user_data_hashes JOIN user_data USING (user_id)
+    WHERE user_data.email LIKE 'bench.user%@example.com';
+    """)
+    cursor.execute("DELETE FROM user_data WHERE email LIKE 'bench.user%@example.com';")
+    connection.commit()
+    cursor.close()
+
+
+def bench_sync(connection, csv_path, rows):
+    for label, changed_every in (('first sync', 0), ('unchanged', 0), ('1% changed', 100)):
+        write_csv(csv_path, rows, changed_every)
+        start = time.perf_counter()
+        summary = seed.sync_data(connection, csv_path) or {}
+        print(f"{label:>12}: {time.perf_counter() - start:>8.2f}s  {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Row loop vs bulk vs LOAD DATA seeding into MySQL")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--modes', nargs='+', choices=seed.INSERT_MODES, default=list(seed.INSERT_MODES))
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--sync', action='store_true', help="also time first and repeated sync_data runs")
+    args = parser.parse_args()
+
+    connection = seed.connect_to_prodev(allow_local_infile=True)
+    if not connection:
+        return
+    seed.create_table(connection)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'user_data.csv')
+        write_csv(csv_path, args.rows)
+        for mode in args.modes:
+            drop_bench_rows(connection)
+            start = time.perf_counter()
+            count = seed.insert_data(connection, csv_path, mode=mode, chunk_size=args.chunk_size)
+            results[mode] = (count or 0) / (time.perf_counter() - start)
+        drop_bench_rows(connection)
+        if args.sync:
+            bench_sync(connection, csv_path, args.rows)
+            drop_bench_rows(connection)
+    connection.close()
+
+    baseline = results.get('row')
+    for mode, rate in results.items():
+        speedup = f"{rate / baseline:.1f}x" if baseline else '-'
+        print(f"{mode:>7}: {rate:>12,.0f} rows/s  {speedup}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Memory benchmark for stream_users: peak RSS of a full scan as user_data grows from 1k to 10M rows.
+# Each scan runs in a fresh child process so its peak RSS is not polluted by the previous one.
+# The extra rows are tagged with a 'bench-' user_id prefix and removed again at the end.
+#
+# usage: python bench_stream_memory.py [--sizes 1000 10000 ...] [--keep]
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+seed = __import__('seed')
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+BENCH_PREFIX = 'bench-'
+
+
+def grow_table(connection, target):
+    """Top user_data up with generated rows until it holds `target` rows"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM user_data;")
+    (count,) = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM user_data WHERE user_id LIKE %s;", (BENCH_PREFIX + '%',))
+    (generated,) = cursor.fetchone()
+    missing = target - count
+    if missing > 0:
+        cursor.execute("SET SESSION cte_max_recursion_depth = %s;", (missing + 1,))
+        cursor.execute(f"""
+        INSERT INTO user_data (user_id, name, email, age)
+        WITH RECURSIVE seq (n) AS (
+            SELECT {generated + 1}
+            UNION ALL
+            SELECT n + 1 FROM seq WHERE n < {generated + missing}
+        )
+        SELECT CONCAT('{BENCH_PREFIX}', LPAD(n, 30, '0')),
+               CONCAT('Bench User ', n),
+               CONCAT('bench.user', n, '@example.com'),
+               18 + n % 80
+        FROM seq;
+        """)
+        connection.commit()
+    cursor.close()
+    return max(count, target)
+
+
+def drop_generated_rows(connection):
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM user_data WHERE user_id LIKE %s;", (BENCH_PREFIX + '%',))
+    connection.commit()
+    cursor.close()
+
+
+def scan(buffered):
+    """Child process: run one full scan and report rows, seconds and peak RSS in KiB"""
+    stream_users = __import__('0-stream_users').stream_users
+    start = time.perf_counter()
+    rows = 0
+    for _ in stream_users(buffered=buffered):
+        rows += 1
+    elapsed = time.perf_counter() - start
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(rows, elapsed, peak_kib)
+
+
+def measure(buffered):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', 'buffered' if buffered else 'streaming'],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    rows, elapsed, peak_kib = int(output[0]), float(output[1]), int(output[2])
+    return rows, elapsed, peak_kib / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of stream_users as user_data grows")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--skip-buffered', action='store_true',
+                        help="only measure the streaming mode (the buffered one needs RAM for the whole table)")
+    parser.add_argument('--keep', action='store_true', help="keep the generated rows afterwards")
+    parser.add_argument('--child', choices=['buffered', 'streaming'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        scan(buffered=args.child == 'buffered')
+        return
+
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+    print(f"{'rows':>12} {'mode':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS MiB':>13}")
+    try:
+        for size in sorted(args.sizes):
+            grow_table(connection, size)
+            modes = [False] if args.skip_buffered else [False, True]
+            for buffered in modes:
+                rows, elapsed, peak_mib = measure(buffered)
+                mode = 'buffered' if buffered else 'streaming'
+                print(f"{rows:>12,} {mode:>10} {elapsed:>9.2f} {rows / elapsed:>12,.0f} {peak_mib:>13.1f}")
+    finally:
+        if not args.keep:
+            drop_generated_rows(connection)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# Benchmark suite for the python-generators-0x00 streaming APIs.
+# Runs stream_users, stream_users_in_batches, lazy_pagination and stream_user_ages against a
+# local SQLite stand-in (user_data.csv scaled up to --rows) and against MySQL when a server
+# is reachable. For every API it reports rows/s, time to first row and peak RSS, and it
+# saves the results as JSON so runs can be compared with --compare.
+#
+# Every measurement runs in a fresh child process, so peak RSS belongs to that API alone.
+# --row-factories runs the APIs that take one with dict, __slots__ and namedtuple rows, and
+# --retain keeps every row alive so the peak RSS shows what a row costs (bytes/row).
+#
+# usage: python bench_suite.py [--rows 1000000] [--backends sqlite mysql] [--compare old.json]
+#                              [--row-factories dict slots namedtuple] [--retain]
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STANDIN_PATH = os.path.join(HERE, 'user_data_standin.db')
+RESULTS_DIR = os.path.join(HERE, 'bench_results')
+BATCH_SIZE = 1000
+
+
+def _stream_users(row_factory):
+    return __import__('0-stream_users').stream_users(), 1
+
+
+def _stream_users_in_batches(row_factory):
+    return __import__('1-batch_processing').stream_users_in_batches(BATCH_SIZE, row_factory=row_factory), len
+
+
+def _lazy_pagination(row_factory):
+    return __import__('2-lazy_paginate').lazy_pagination(BATCH_SIZE, row_factory=row_factory), len
+
+
+def _stream_user_ages(row_factory):
+    return __import__('4-stream_ages').stream_user_ages(row_factory=row_factory), 1
+
+
+APIS = {
+    'stream_users': _stream_users,
+    'stream_users_in_batches': _stream_users_in_batches,
+    'lazy_pagination': _lazy_pagination,
+    'stream_user_ages': _stream_user_ages,
+}
+# stream_users has its own row_format and is only run with its default tuple rows
+ROW_FACTORY_APIS = ('stream_users_in_batches', 'lazy_pagination', 'stream_user_ages')
+
+
+def _rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(api, backend, standin_path, row_factory='dict', retain=False):
+    """Child process: consume one API completely and print its measurements as JSON"""
+    if backend == 'sqlite':
+        __import__('sqlite_standin').use(standin_path)
+    stream, size_of = APIS[api](row_factory)
+    baseline = _rss_mib()
+    kept = []
+    start = time.perf_counter()
+    first_row = None
+    rows = 0
+    for item in stream:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        rows += 1 if size_of == 1 else size_of(item)
+        if retain:
+            kept.append(item)
+    elapsed = time.perf_counter() - start
+    peak = _rss_mib()
+    print(json.dumps({
+        'api': api,
+        'backend': backend,
+        'row_factory': row_factory,
+        'retained': retain,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_s': rows / elapsed if elapsed else None,
+        'first_row_ms': 1000 * first_row if first_row is not None else None,
+        'peak_rss_mib': peak,
+        'bytes_per_row': 1024 * 1024 * (peak - baseline) / rows if retain and rows else None,
+    }))
+
+
+def measure(api, backend, standin_path, row_factory='dict', retain=False):
+    command = [sys.executable, __file__, '--child', api, '--backends', backend, '--standin', standin_path,
+               '--row-factories', row_factory]
+    if retain:
+        command.append('--retain')
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=HERE).stdout
+    # the generators print their errors, so only trust the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def mysql_available():
+    try:
+        connection = __import__('pool')._connect()
+    except Exception:
+        return False
+    connection.close()
+    return True
+
+
+def print_results(results, previous=None):
+    def key(result):
+        return result['api'], result['backend'], result.get('row_factory', 'dict'), result.get('retained', False)
+
+    baseline = {key(r): r for r in (previous or {}).get('results', [])}
+    header = (f"{'api':>24} {'backend':>7} {'rows':>10} {'factory':>10} {'rows/s':>12} {'first row ms':>13} "
+              f"{'peak RSS MiB':>13} {'bytes/row':>10}")
+    print(header + (f" {'vs previous':>12}" if previous else ''))
+    for result in results:
+        bytes_per_row = f"{result['bytes_per_row']:.0f}" if result.get('bytes_per_row') else '-'
+        line = (f"{result['api']:>24} {result['backend']:>7} {result['rows']:>10,} {result['row_factory']:>10} "
+                f"{result['rows_per_s'] or 0:>12,.0f} {result['first_row_ms'] or 0:>13.1f} "
+                f"{result['peak_rss_mib']:>13.1f} {bytes_per_row:>10}")
+        old = baseline.get(key(result))
+        if old and old.get('rows_per_s') and result['rows_per_s']:
+            line += f" {result['rows_per_s'] / old['rows_per_s']:>11.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, first-row latency and peak RSS of the streaming APIs")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="size of the SQLite stand-in")
+    parser.add_argument('--backends', nargs='+', choices=['sqlite', 'mysql'], default=['sqlite', 'mysql'])
+    parser.add_argument('--apis', nargs='+', choices=list(APIS), default=list(APIS))
+    parser.add_argument('--standin', default=STANDIN_PATH, help="path of the SQLite stand-in database")
+    parser.add_argument('--output', help="where to save the JSON results (default: bench_results/<timestamp>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare rows/s against")
+    parser.add_argument('--row-factories', nargs='+', choices=['dict', 'slots', 'namedtuple'], default=['dict'])
+    parser.add_argument('--retain', action='store_true', help="keep every row in memory to measure bytes/row")
+    parser.add_argument('--child', choices=list(APIS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.backends[0], args.standin, args.row_factories[0], args.retain)
+        return
+
+    backends = list(args.backends)
+    if 'mysql' in backends and not mysql_available():
+        print("MySQL is not reachable, running against the SQLite stand-in only")
+        backends.remove('mysql')
+    if 'sqlite' in backends:
+        __import__('sqlite_standin').build(args.standin, rows=args.rows)
+
+    results = []
+    for backend in backends:
+        for api in args.apis:
+            factories = args.row_factories if api in ROW_FACTORY_APIS else ['dict']
+            for row_factory in factories:
+                results.append(measure(api, backend, args.standin, row_factory, args.retain))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_results(results, previous)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'standin_rows': args.rows,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
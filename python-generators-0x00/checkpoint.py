@@ -0,0 +1,155 @@
+# Checkpoints for long-running user_data consumers.
+# A checkpointed stream runs in user_id order and records the last user_id the consumer has
+# finished with, every N rows and/or T seconds, in a local JSON file or SQLite database.
+# A crashed job restarted with resume_from=<the same checkpoint> only redoes the unfinished tail.
+#
+# Delivery is at-least-once, not exactly-once. A row counts as finished once the consumer
+# asks for the next one (or the loop ends normally), so the row in the consumer's hands when
+# it crashes is delivered again on resume. So is every row finished after the last save when
+# the process dies without closing the stream (a kill, a power cut): only rows up to a save
+# are never delivered twice. Consumers that must not repeat work should be idempotent.
+import json
+import os
+import sqlite3
+import time
+
+
+class FileCheckpoint:
+    """Checkpoint kept in a small JSON file, replaced atomically on every save"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, position, rows):
+        state = {'position': position, 'rows': rows, 'updated_at': time.time()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteCheckpoint:
+    """Checkpoints kept in a SQLite database, one row per named job"""
+
+    def __init__(self, path, name='default'):
+        self.path = path
+        self.name = name
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY,
+                position TEXT,
+                rows INTEGER,
+                updated_at REAL
+            )
+            """)
+        connection.close()
+
+    def load(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            row = connection.execute(
+                "SELECT position, rows, updated_at FROM checkpoints WHERE name = ?", (self.name,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return {'position': row[0], 'rows': row[1], 'updated_at': row[2]}
+
+    def save(self, position, rows):
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute("""
+                INSERT INTO checkpoints (name, position, rows, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    position = excluded.position, rows = excluded.rows, updated_at = excluded.updated_at
+                """, (self.name, position, rows, time.time()))
+        finally:
+            connection.close()
+
+    def clear(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute("DELETE FROM checkpoints WHERE name = ?", (self.name,))
+        finally:
+            connection.close()
+
+
+def open_checkpoint(path, name='default'):
+    """A SQLiteCheckpoint for .db/.sqlite/.sqlite3 paths, a FileCheckpoint otherwise"""
+    if os.path.splitext(path)[1] in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteCheckpoint(path, name)
+    return FileCheckpoint(path)
+
+
+def _as_store(checkpoint):
+    return open_checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+
+
+def resume_position(resume_from, checkpoint=None):
+    """The user_id to continue after.
+
+    resume_from is True (resume from `checkpoint`), a checkpoint object, or a user_id.
+    """
+    if resume_from is None or resume_from is False:
+        return None
+    if resume_from is True:
+        if checkpoint is None:
+            raise ValueError("resume_from=True needs a checkpoint to resume from")
+        resume_from = _as_store(checkpoint)
+    if hasattr(resume_from, 'load'):
+        state = resume_from.load()
+        return state['position'] if state else None
+    return resume_from
+
+
+def checkpointed(items, checkpoint, position_of, size_of=lambda item: 1, every=10_000, seconds=None,
+                 resumed=False):
+    """Pass `items` through, saving the position of the finished ones to `checkpoint`.
+
+    position_of(item) gives the user_id to resume after, size_of(item) how many rows
+    the item holds (1 for rows, len(batch) for batches). A save happens once `every` rows
+    have been finished since the last one, or `seconds` have passed, and when the stream
+    ends or is closed. Rows finished after the last save are delivered again on resume
+    (at-least-once).
+    """
+    store = _as_store(checkpoint)
+    state = store.load() if resumed else None
+    # when resuming, keep counting from the rows the earlier runs delivered
+    rows = state['rows'] if state else 0
+    position = None
+    pending = 0
+    last_save = time.monotonic()
+    try:
+        for item in items:
+            yield item
+            # the consumer came back for more, so it is done with this item
+            position = position_of(item)
+            size = size_of(item)
+            rows += size
+            pending += size
+            if pending >= every or (seconds is not None and time.monotonic() - last_save >= seconds):
+                store.save(position, rows)
+                pending = 0
+                last_save = time.monotonic()
+    finally:
+        if pending:
+            store.save(position, rows)
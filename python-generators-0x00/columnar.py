@@ -0,0 +1,150 @@
+# Columnar batches for the user_data generators.
+# A batch of dict rows pays for a dict per row plus a pointer to the same key strings
+# every time. A ColumnBatch keeps one column per field instead: ages in a typed
+# array('i') (or a NumPy array), and names/emails concatenated into one string with an
+# offsets array, so a batch is a handful of objects no matter how many rows it holds.
+import operator
+from array import array
+from itertools import accumulate, compress
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+BACKENDS = ('array', 'numpy')
+_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt,
+              '<=': operator.le, '=': operator.eq, '!=': operator.ne}
+
+
+class StringColumn:
+    """Strings stored back to back in one str, with their end offsets in an array"""
+    __slots__ = ('text', 'ends')
+
+    def __init__(self, values):
+        self.text = ''.join(values)
+        self.ends = array('L', accumulate(map(len, values)))
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ends)
+        start = self.ends[index - 1] if index else 0
+        return self.text[start:self.ends[index]]
+
+    def __iter__(self):
+        start = 0
+        for end in self.ends:
+            yield self.text[start:end]
+            start = end
+
+    def take(self, indexes):
+        return StringColumn([self[i] for i in indexes])
+
+
+def _int_column(values, backend):
+    if backend == 'numpy':
+        import numpy
+        try:
+            return numpy.fromiter(values, dtype=numpy.int32, count=len(values))
+        except TypeError:
+            # NULLs do not fit in an int32 array either; mask them out for this batch
+            nulls = [v is None for v in values]
+            data = numpy.fromiter((0 if v is None else v for v in values), dtype=numpy.int32, count=len(values))
+            return numpy.ma.masked_array(data, mask=nulls)
+    try:
+        return array('i', values)
+    except TypeError:
+        # NULLs do not fit in a typed array; keep a plain list for this batch
+        return list(values)
+
+
+def _value(column, index):
+    value = column[index]
+    if isinstance(column, (StringColumn, array, list)):
+        return value
+    # a NumPy column: numpy.int32 scalars back to int, masked entries back to None
+    import numpy
+    return None if value is numpy.ma.masked else int(value)
+
+
+class ColumnBatch:
+    """A batch of rows stored column by column"""
+
+    def __init__(self, columns, backend='array'):
+        self.columns = columns
+        self.backend = backend
+
+    @classmethod
+    def from_rows(cls, rows, names=USER_COLUMNS, backend='array'):
+        """Build a batch from tuple rows (the transpose runs in C via zip)"""
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}")
+        values = list(zip(*rows)) if rows else [() for _ in names]
+        columns = {}
+        for name, column in zip(names, values):
+            if name == 'age':
+                columns[name] = _int_column(column, backend)
+            else:
+                columns[name] = StringColumn(column)
+        return cls(columns, backend)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def row(self, index):
+        return {name: _value(column, index) for name, column in self.columns.items()}
+
+    def rows(self):
+        """Rows as dicts, for consumers that still want them one at a time"""
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def indexes_where(self, name, op, value):
+        """Positions of the rows where `column op value` holds"""
+        column = self.columns[name]
+        if self.backend == 'numpy' and name == 'age':
+            import numpy
+            mask = {'>': column > value, '>=': column >= value, '<': column < value,
+                    '<=': column <= value, '=': column == value, '!=': column != value}[op]
+            # a masked (NULL) age never matches, like in SQL
+            return numpy.flatnonzero(numpy.ma.filled(mask, False))
+        if isinstance(column, list):
+            # an int column holding NULLs: NULL never matches, like in SQL
+            test = _OPERATORS[op]
+            return [i for i, v in enumerate(column) if v is not None and test(v, value)]
+        compare = {'>': value.__lt__, '>=': value.__le__, '<': value.__gt__,
+                   '<=': value.__ge__, '=': value.__eq__, '!=': value.__ne__}[op]
+        # map + compress keep the loop in C: no Python bytecode runs per row
+        return list(compress(range(len(column)), map(compare, column)))
+
+    def take(self, indexes):
+        """A new batch with only the rows at `indexes`"""
+        columns = {}
+        for name, column in self.columns.items():
+            if isinstance(column, StringColumn):
+                columns[name] = column.take(indexes)
+            elif self.backend == 'numpy':
+                columns[name] = column[indexes]
+            else:
+                columns[name] = _int_column([column[i] for i in indexes], self.backend)
+        return ColumnBatch(columns, self.backend)
+
+    def where(self, name, op, value):
+        return self.take(self.indexes_where(name, op, value))
+
+    def total(self, name):
+        column = self.columns[name]
+        if self.backend == 'numpy':
+            import numpy
+            return int(numpy.ma.filled(column, 0).sum())
+        if isinstance(column, list):
+            return sum(v for v in column if v is not None)
+        return sum(column)
+
+
+def columnar_batches(batches, names=USER_COLUMNS, backend='array'):
+    """Turn a stream of tuple batches into ColumnBatches"""
+    for batch in batches:
+        yield ColumnBatch.from_rows(batch, names, backend)
@@ -0,0 +1,223 @@
+# Streaming export of user_data to CSV or JSONL files.
+# Rows come from the batch generators and each batch is rendered and written in one go,
+# so memory stays at one batch plus the write buffer however big the table is.
+# Output can be gzip or zstd compressed (zstd needs the zstandard package), split into
+# files of about --rotate-mb each, and written as one shard per partition in parallel.
+#
+# usage: python export.py users.csv.gz [--format csv|jsonl] [--compression gzip|zstd]
+#                         [--rotate-mb 100] [--partitions 4] [--batch-size 10000]
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+
+partitioned_scan = __import__('partitioned_scan')
+Query = __import__('query').Query
+USER_COLUMNS = __import__('columnar').USER_COLUMNS
+
+FORMATS = ('csv', 'jsonl')
+COMPRESSIONS = (None, 'gzip', 'zstd')
+_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _render(batch, columns, fmt, header):
+    """One batch as text: CSV from tuple rows, JSONL from dict rows"""
+    if fmt == 'jsonl':
+        return ''.join(json.dumps(row, default=str) + '\n' for row in batch)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    if header:
+        writer.writerow(columns)
+    writer.writerows(batch)
+    return out.getvalue()
+
+
+class RotatingWriter:
+    """Writes rendered batches to `path`, moving on to path.00001, path.00002... past rotate_bytes
+
+    The size is checked between batches and counts compressed bytes on disk, so a file can
+    overshoot rotate_bytes by about one batch. Every CSV file gets its own header row.
+    """
+
+    def __init__(self, path, fmt='csv', columns=USER_COLUMNS, compression=None, rotate_bytes=None,
+                 buffer_size=1 << 20, level=None):
+        self.path = path
+        self.fmt = fmt
+        self.columns = columns
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.buffer_size = buffer_size
+        self.level = level
+        self.files = []
+        self.rows = 0
+        self.text_bytes = 0
+        self._raw = self._stream = None
+        self._needs_header = True
+
+    def _file_path(self):
+        if not self.rotate_bytes:
+            return self.path
+        # users.csv.gz -> users.00000.csv.gz, keeping the suffixes tools look at
+        base, ext = os.path.splitext(self.path)
+        if self.compression:
+            base, inner = os.path.splitext(base)
+            ext = inner + ext
+        return f"{base}.{len(self.files):05d}{ext}"
+
+    def _open(self):
+        path = self._file_path()
+        self._raw = open(path, 'wb', buffering=self.buffer_size)
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=self.level or 6)
+        elif self.compression == 'zstd':
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=self.level or 3)
+            self._stream = compressor.stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self.files.append(path)
+        self._needs_header = True
+
+    def _close_file(self):
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._raw = self._stream = None
+
+    def write(self, batch):
+        if not batch:
+            return
+        if self._stream is None:
+            self._open()
+        text = _render(batch, self.columns, self.fmt, self.fmt == 'csv' and self._needs_header)
+        self._needs_header = False
+        data = text.encode()
+        self._stream.write(data)
+        self.rows += len(batch)
+        self.text_bytes += len(data)
+        if self.rotate_bytes and self._raw.tell() >= self.rotate_bytes:
+            self._close_file()
+
+    def close(self):
+        if self._stream is None and not self.files:
+            # an empty export still leaves an (empty, header-only for CSV) file behind
+            self._open()
+            if self.fmt == 'csv':
+                self._stream.write(_render([], self.columns, 'csv', True).encode())
+        if self._stream is not None:
+            self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def shard_path(path, index):
+    """users.csv.gz -> users.shard03.csv.gz"""
+    directory, name = os.path.split(path)
+    stem, _, suffixes = name.partition('.')
+    return os.path.join(directory, f"{stem}.shard{index:02d}" + (f".{suffixes}" if suffixes else ''))
+
+
+def _export_batches(batches, path, fmt, columns, options):
+    with RotatingWriter(path, fmt, columns, **options) as writer:
+        for batch in batches:
+            writer.write(batch)
+    return writer
+
+
+def export_users(path, fmt=None, compression=None, rotate_bytes=None, query=None, batch_size=10_000,
+                 partitions=1, buffer_size=1 << 20, level=None):
+    """Stream user_data (or `query`) to `path` and return a summary of what was written.
+
+    fmt and compression default to what the path ends with (.csv/.jsonl, .gz/.zst).
+    With partitions > 1 the table is split into user_id ranges and each one is written
+    to its own shard file (see shard_path) by its own thread.
+    """
+    name = path
+    if compression is None:
+        compression = {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(name)[1])
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {COMPRESSIONS[1:]}")
+    if compression:
+        name = os.path.splitext(name)[0] if name.endswith(_SUFFIXES[compression]) else name
+    fmt = fmt or ('jsonl' if name.endswith(('.jsonl', '.json')) else 'csv')
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+
+    query = query or Query()
+    columns = query.columns or USER_COLUMNS
+    options = dict(compression=compression, rotate_bytes=rotate_bytes, buffer_size=buffer_size, level=level)
+    # CSV is written from tuples, JSONL needs the column names in every row
+    dictionary = fmt == 'jsonl'
+    start = time.perf_counter()
+
+    if partitions > 1:
+        writers, errors = [], []
+
+        def write_shard(index, low, high):
+            try:
+                batches = partitioned_scan.scan_range(low, high, batch_size, query, dictionary)
+                writers.append(_export_batches(batches, shard_path(path, index), fmt, columns, options))
+            except Exception as e:
+                errors.append(e)
+
+        ranges = partitioned_scan.partition_ranges(partitions)
+        threads = [threading.Thread(target=write_shard, args=(i, low, high), name=f'export-{i}')
+                   for i, (low, high) in enumerate(ranges)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+    else:
+        # the whole table is just one unbounded range
+        batches = partitioned_scan.scan_range(None, None, batch_size, query, dictionary)
+        writers = [_export_batches(batches, path, fmt, columns, options)]
+
+    elapsed = time.perf_counter() - start
+    files = sorted(f for writer in writers for f in writer.files)
+    written = sum(os.path.getsize(f) for f in files)
+    summary = {
+        'rows': sum(writer.rows for writer in writers),
+        'files': files,
+        'bytes': written,
+        'text_bytes': sum(writer.text_bytes for writer in writers),
+        'seconds': elapsed,
+        'mb_per_s': written / elapsed / 1e6 if elapsed else None,
+    }
+    # a tiny export can finish within the clock's resolution: no rate then
+    rates = (f" ({summary['mb_per_s']:.1f} MB/s written, {summary['text_bytes'] / elapsed / 1e6:.1f} MB/s rendered)"
+             if elapsed else '')
+    print(f"Exported {summary['rows']} rows to {len(files)} file(s): {written / 1e6:.1f} MB "
+          f"({summary['text_bytes'] / 1e6:.1f} MB uncompressed) in {elapsed:.2f}s{rates}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream user_data to CSV or JSONL files")
+    parser.add_argument('path', help="output file; .csv/.jsonl and .gz/.zst pick the defaults")
+    parser.add_argument('--format', choices=FORMATS)
+    parser.add_argument('--compression', choices=COMPRESSIONS[1:])
+    parser.add_argument('--level', type=int, help="compression level")
+    parser.add_argument('--rotate-mb', type=float, help="start a new file after about this many MB")
+    parser.add_argument('--partitions', type=int, default=1, help="write this many shards in parallel")
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--columns', nargs='+', help="only export these columns")
+    args = parser.parse_args()
+
+    query = Query().select(*args.columns) if args.columns else None
+    export_users(args.path, args.format, args.compression,
+                 rotate_bytes=int(args.rotate_mb * 1e6) if args.rotate_mb else None,
+                 query=query, batch_size=args.batch_size, partitions=args.partitions, level=args.level)
+
+
+if __name__ == '__main__':
+    main()
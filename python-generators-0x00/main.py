@@ -26,7 +26,7 @@ def run_func():
 
         if connection:
             seed.create_table(connection)
-            seed.insert_data(connection, 'user_data.csv')
+            seed.sync_data(connection, 'user_data.csv')
             cursor = connection.cursor()
             cursor.execute(f"SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = 'ALX_prodev';")
             result = cursor.fetchone()
@@ -0,0 +1,148 @@
+# Parallel partitioned scan of user_data.
+# The table is split into N contiguous user_id ranges with roughly the same number of rows;
+# each range is streamed on its own connection by a worker thread (or process), and the
+# batches are merged back into a single generator, in user_id order or as they arrive.
+import multiprocessing
+import queue
+import threading
+
+pool = __import__('pool')
+Query = __import__('query').Query
+
+MODES = ('thread', 'process')
+
+
+def partition_bounds(partitions):
+    """Split points that cut user_data into `partitions` ranges of about the same size.
+
+    Every split point costs one index walk up to its offset, which is cheap next to
+    the scan itself.
+    """
+    with pool.connection() as connection:
+        cursor = connection.cursor(buffered=True)
+        cursor.execute("SELECT COUNT(*) FROM user_data;")
+        (count,) = cursor.fetchone()
+        bounds = []
+        for i in range(1, partitions):
+            offset = i * count // partitions
+            if offset == 0:
+                continue  # more partitions than rows: splitting at the first row leaves an empty range
+            cursor.execute("SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s;", (offset,))
+            row = cursor.fetchone()
+            if row and (not bounds or row[0] > bounds[-1]):
+                bounds.append(row[0])
+        cursor.close()
+        return bounds
+
+
+def partition_ranges(partitions):
+    """[(low, high), ...] with low inclusive and high exclusive; None means unbounded"""
+    bounds = partition_bounds(partitions)
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def scan_range(low, high, batch_size=1000, query=None, dictionary=True):
+    """Stream the batches of one user_id range on its own connection, in user_id order"""
+    query = (query or Query()).order_by('user_id')
+    if low is not None:
+        query = query.where('user_id', '>=', low)
+    if high is not None:
+        query = query.where('user_id', '<', high)
+    sql, params = query.compile()
+    # partitioned_scan never runs more workers than there are pooled connections, so a
+    # worker waiting here waits for one that is being drained and will be released
+    with pool.connection(timeout=None) as connection:
+        cursor = connection.cursor(dictionary=dictionary)
+        cursor.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+        cursor.close()
+
+
+def _put(buffer, message, stop):
+    while not stop.is_set():
+        try:
+            buffer.put(message, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _worker(index, low, high, batch_size, query, dictionary, buffer, stop):
+    # Messages are tagged tuples rather than sentinel objects so they survive pickling
+    # when the workers are processes
+    batches = scan_range(low, high, batch_size, query, dictionary)
+    try:
+        for batch in batches:
+            if not _put(buffer, ('batch', index, batch), stop):
+                return
+        _put(buffer, ('done', index, None), stop)
+    except Exception as e:
+        _put(buffer, ('error', index, e), stop)
+    finally:
+        batches.close()
+
+
+def partitioned_scan(partitions=4, batch_size=1000, query=None, ordered=False, mode='thread', depth=4,
+                     dictionary=True):
+    """Yield the batches of a full scan read by `partitions` parallel workers.
+
+    ordered=True yields the ranges one after the other (so rows come in user_id order)
+    while the next ranges are already being read ahead; ordered=False yields each batch
+    as soon as any worker has it. Every worker stays at most `depth` batches ahead.
+    With threads at most pool-size workers run at once: range i + size only starts once
+    range i is finished, so a blocked worker never holds a connection the consumer needs.
+    mode='process' runs the workers in processes, so decoding the rows scales with cores.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    ranges = partition_ranges(partitions)
+
+    if mode == 'process':
+        context = multiprocessing.get_context('spawn')
+        make_queue, stop, start = context.Queue, context.Event(), context.Process
+    else:
+        make_queue, stop, start = queue.Queue, threading.Event(), threading.Thread
+    if ordered:
+        buffers = [make_queue(maxsize=depth) for _ in ranges]
+    else:
+        shared = make_queue(maxsize=depth * len(ranges))
+        buffers = [shared for _ in ranges]
+
+    workers = [
+        start(target=_worker, args=(i, low, high, batch_size, query, dictionary, buffers[i], stop), daemon=True)
+        for i, (low, high) in enumerate(ranges)
+    ]
+    # processes have a pool each; threads share this one, so they must not outnumber it
+    window = len(workers) if mode == 'process' else max(1, min(len(workers), pool.get_pool().size))
+    for worker in workers[:window]:
+        worker.start()
+    started = window
+
+    try:
+        # ordered: drain range 0 to its end, then range 1, ...; unordered: one shared queue
+        pending = set(range(len(ranges)))
+        current = 0
+        while pending:
+            kind, index, payload = buffers[current if ordered else 0].get()
+            if kind == 'batch':
+                yield payload
+            elif kind == 'done':
+                pending.discard(index)
+                current += 1
+                # the finished range gave its connection back: start the next waiting one
+                if started < len(workers):
+                    workers[started].start()
+                    started += 1
+            else:
+                raise payload
+    finally:
+        stop.set()
+        for worker in workers[:started]:
+            worker.join(timeout=5)
+            if mode == 'process' and worker.is_alive():
+                worker.terminate()
@@ -0,0 +1,298 @@
+# Pipeline combinators on top of the batch generators.
+# Stacking one generator per stage (filter -> map -> window -> ...) costs a generator
+# resume per row at every stage. A Pipeline keeps the rows in the batches the generators
+# already produce and runs each batch through its stages, fusing consecutive filter/map
+# stages into a single loop per batch:
+#
+#   Pipeline.rows(stream_users()).limit(6).sink(print)                  # 1-main.py
+#   Pipeline(batches).sink(print)                                       # batch_processing, run by 2-main.py
+#   Pipeline.users(50, Query().where('age', '>', 25)).map(f).window(3).collect()
+#
+# pipeline.stats() afterwards gives rows in/out and seconds spent per stage.
+import time
+from collections import deque
+from itertools import islice
+
+_END = object()
+
+
+class _Stage:
+    """One step of a compiled pipeline, with its counters"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = 0
+        self.rows_out = 0
+        self.seconds = 0.0
+        self.done = False
+
+    def run(self, chunk):
+        start = time.perf_counter()
+        out = self.process(chunk)
+        self.seconds += time.perf_counter() - start
+        self.rows_in += len(chunk)
+        self.rows_out += len(out)
+        return out
+
+    def finish(self):
+        out = self.flush()
+        self.rows_out += len(out)
+        return out
+
+    def process(self, chunk):
+        # as is: the source and sink entries only count rows and time
+        return chunk
+
+    def flush(self):
+        return []
+
+    def stats(self):
+        return {'stage': self.name, 'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'seconds': self.seconds}
+
+
+def _fuse(steps):
+    """One function running every filter/map step on a chunk in a single pass"""
+    def fused(chunk):
+        # filter and map objects are lazy, so chained they take each row through every
+        # step before reading the next one, and the loop itself runs in C
+        items = iter(chunk)
+        for kind, fn in steps:
+            items = filter(fn, items) if kind == 'filter' else map(fn, items)
+        return list(items)
+    return fused
+
+
+class _Fused(_Stage):
+    def __init__(self, steps):
+        super().__init__('+'.join(kind for kind, _ in steps))
+        self.maps_only = all(kind == 'map' for kind, _ in steps)
+        self._fused = _fuse(steps)
+
+    def process(self, chunk):
+        return self._fused(chunk)
+
+
+class _Batch(_Stage):
+    def __init__(self, size):
+        super().__init__('batch')
+        self.size = size
+        self.pending = []
+
+    def process(self, chunk):
+        self.pending.extend(chunk)
+        size = self.size
+        full = len(self.pending) - len(self.pending) % size
+        out = [self.pending[i:i + size] for i in range(0, full, size)]
+        del self.pending[:full]
+        return out
+
+    def flush(self):
+        out = [self.pending] if self.pending else []
+        self.pending = []
+        return out
+
+
+class _Window(_Stage):
+    def __init__(self, size, step):
+        super().__init__('window')
+        self.size = size
+        self.step = step
+        self.window = deque(maxlen=size)
+        self.seen = 0
+
+    def process(self, chunk):
+        out = []
+        window, size, step = self.window, self.size, self.step
+        for item in chunk:
+            window.append(item)
+            self.seen += 1
+            if self.seen >= size and (self.seen - size) % step == 0:
+                out.append(tuple(window))
+        return out
+
+
+class _Limit(_Stage):
+    def __init__(self, count):
+        super().__init__('limit')
+        self.remaining = count
+
+    def process(self, chunk):
+        out = chunk[:self.remaining]
+        self.remaining -= len(out)
+        # nothing else is needed: stop pulling from the source
+        self.done = self.remaining <= 0
+        return out
+
+
+class _Source:
+    """What a pipeline reads: a callable giving a fresh iterable on every run, or an
+    iterable. A one-shot iterator (a generator) can only feed a single run, whichever of
+    the pipelines built on it runs first.
+    """
+
+    def __init__(self, source, chunk_size=None):
+        self.source = source
+        self.chunk_size = chunk_size  # set when the source yields rows instead of batches
+        self.used = False
+
+    def open(self):
+        if callable(self.source):
+            return iter(self.source())
+        iterator = iter(self.source)
+        if iterator is self.source:
+            if self.used:
+                raise RuntimeError("the pipeline's source is a one-shot iterator and was already consumed; "
+                                   "pass a callable returning a new one to run it again")
+            self.used = True
+        return iterator
+
+
+class Pipeline:
+    """A chain of stages over a source of batches (lists of rows)
+
+    `batches` is an iterable of batches or a callable returning one. Builder methods return
+    a new Pipeline, like query.Query; pipelines over a callable source (Pipeline.users, or
+    Pipeline(lambda: ...)) can be shared and run again, ones over a generator run once.
+    """
+
+    def __init__(self, batches, steps=()):
+        self._source = batches if isinstance(batches, _Source) else _Source(batches)
+        self.steps = tuple(steps)
+        self._stages = []
+
+    @classmethod
+    def rows(cls, rows, chunk_size=1000):
+        """A pipeline over a row-at-a-time generator such as stream_users() (or a callable returning one)
+
+        Rows are taken `chunk_size` at a time, but never more than a limit right after the
+        source (maps aside) still needs.
+        """
+        return cls(_Source(rows, chunk_size))
+
+    @classmethod
+    def users(cls, batch_size=1000, query=None, **options):
+        """A pipeline over stream_users_in_batches (options are passed through)"""
+        processing = __import__('1-batch_processing')
+        return cls(lambda: processing.stream_users_in_batches(batch_size, query, **options))
+
+    def _then(self, kind, *args):
+        return Pipeline(self._source, self.steps + ((kind, *args),))
+
+    def filter(self, predicate):
+        return self._then('filter', predicate)
+
+    def map(self, fn):
+        return self._then('map', fn)
+
+    def batch(self, size):
+        """Group rows into lists of `size` (the last one may be shorter)"""
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        return self._then('batch', size)
+
+    def window(self, size, step=1):
+        """Sliding windows: a tuple of the last `size` rows, every `step` rows"""
+        if size < 1 or step < 1:
+            raise ValueError("size and step must be at least 1")
+        return self._then('window', size, step)
+
+    def limit(self, count):
+        return self._then('limit', count)
+
+    def _compile(self):
+        stages, row_steps = [], []
+        for kind, *args in self.steps:
+            if kind in ('filter', 'map'):
+                row_steps.append((kind, args[0]))
+                continue
+            if row_steps:
+                stages.append(_Fused(row_steps))
+                row_steps = []
+            stages.append({'batch': _Batch, 'window': _Window, 'limit': _Limit}[kind](*args))
+        if row_steps:
+            stages.append(_Fused(row_steps))
+        return stages
+
+    @staticmethod
+    def _chunks(rows, chunk_size, stages):
+        # a limit that only maps stand in front of needs no more rows than it has left
+        limit = None
+        for stage in stages:
+            if isinstance(stage, _Limit):
+                limit = stage
+            if not (isinstance(stage, _Fused) and stage.maps_only):
+                break
+        while True:
+            size = chunk_size if limit is None else min(chunk_size, limit.remaining)
+            chunk = list(islice(rows, size)) if size > 0 else []
+            if not chunk:
+                return
+            yield chunk
+
+    def batches(self):
+        """Run the pipeline, yielding its output a batch at a time"""
+        stages = self._compile()
+        source = _Stage('source')
+        self._stages = [source, *stages]
+        opened = self._source.open()
+        iterator = opened
+        if self._source.chunk_size is not None:
+            iterator = self._chunks(opened, self._source.chunk_size, stages)
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = next(iterator, _END)
+                source.seconds += time.perf_counter() - start
+                if chunk is _END:
+                    break
+                source.rows_in += len(chunk)
+                source.rows_out += len(chunk)
+                for stage in stages:
+                    if not chunk:
+                        break
+                    chunk = stage.run(chunk)
+                if chunk:
+                    yield chunk
+                if any(stage.done for stage in stages):
+                    break
+            # stateful stages (batch) may still hold rows: push them through the rest of the chain
+            for position, stage in enumerate(stages):
+                chunk = stage.finish()
+                for later in stages[position + 1:]:
+                    if not chunk:
+                        break
+                    chunk = later.run(chunk)
+                if chunk:
+                    yield chunk
+        finally:
+            # closes the generator, and with it the database connection, when we stop early
+            for running in (iterator, opened):
+                close = getattr(running, 'close', None)
+                if close is not None:
+                    close()
+
+    def __iter__(self):
+        for chunk in self.batches():
+            yield from chunk
+
+    def collect(self):
+        return [item for chunk in self.batches() for item in chunk]
+
+    def sink(self, fn):
+        """Run the pipeline, calling fn on every output row; returns how many there were"""
+        sink = _Stage('sink')
+        count = 0
+        for chunk in self.batches():
+            start = time.perf_counter()
+            for item in chunk:
+                fn(item)
+            sink.seconds += time.perf_counter() - start
+            count += len(chunk)
+        sink.rows_in = sink.rows_out = count
+        self._stages.append(sink)
+        return count
+
+    def stats(self):
+        """Counters of the last run, one dict per stage (fused stages share one entry)"""
+        return [stage.stats() for stage in self._stages]
@@ -0,0 +1,248 @@
+# Connection pool shared by the python-generators-0x00 entry points.
+# Opening a MySQL connection (TCP + auth) costs more than most of the queries we run on it,
+# so the generators check a connection out of this pool instead of connecting each time:
+#
+#   with pool.connection() as connection:
+#       ...
+#
+# Connections are health-checked on checkout when they have been idle for a while,
+# their session is reset on return, and counters for waits and checkout latency are kept.
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _connect():
+    return mysql.connector.connect(
+        host='localhost',
+        user='root',
+        password=os.environ.get('password'),
+        database='ALX_prodev',
+    )
+
+
+class ConnectionPool:
+    """A bounded LIFO pool of MySQL connections.
+
+    `size` caps the number of open connections; a checkout waits up to `timeout` seconds
+    for one to come back (None waits forever). Connections idle for more than
+    `ping_after` seconds are pinged before being handed out.
+    """
+
+    def __init__(self, size=5, timeout=30, ping_after=30, factory=_connect):
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.factory = factory
+        # LIFO keeps reusing the most recently returned (warmest) connections
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self._counters = dict(checkouts=0, waits=0, wait_seconds=0.0, checkout_seconds=0.0,
+                              max_checkout_seconds=0.0, created=0, discarded=0, failed_health_checks=0)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counters[name] += delta
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._open < self.size:
+                self._open += 1
+                return True
+            return False
+
+    def _release_slot(self):
+        with self._lock:
+            self._open -= 1
+
+    def _create(self):
+        try:
+            connection = self.factory()
+        except BaseException:
+            self._release_slot()
+            raise
+        self._count(created=1)
+        return connection
+
+    def _healthy(self, connection, idle_since):
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            self._count(failed_health_checks=1)
+            return False
+
+    def acquire(self, timeout=...):
+        """Check a connection out; prefer `with pool.connection()` which gives it back"""
+        timeout = self.timeout if timeout is ... else timeout
+        start = time.perf_counter()
+        waited = False
+        while True:
+            if self._closed:
+                raise PoolError("The pool is closed")
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve_slot():
+                    connection = self._create()
+                    break
+                # every connection is checked out: wait for one to come back
+                waited = True
+                remaining = None if timeout is None else timeout - (time.perf_counter() - start)
+                if remaining is not None and remaining <= 0:
+                    self._count(waits=1, wait_seconds=time.perf_counter() - start)
+                    raise PoolError(f"No connection available after {timeout}s (pool size {self.size})")
+                try:
+                    # wake up now and then: a discarded connection frees a slot without coming back
+                    connection, idle_since = self._idle.get(timeout=min(remaining or 0.1, 0.1))
+                except queue.Empty:
+                    continue
+            if self._healthy(connection, idle_since):
+                break
+            self._discard(connection)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            counters = self._counters
+            counters['checkouts'] += 1
+            counters['checkout_seconds'] += elapsed
+            counters['max_checkout_seconds'] = max(counters['max_checkout_seconds'], elapsed)
+            if waited:
+                counters['waits'] += 1
+                counters['wait_seconds'] += elapsed
+        return connection
+
+    def release(self, connection):
+        """Reset the session and put the connection back, or drop it if it is not reusable"""
+        if getattr(connection, 'unread_result', False):
+            # a scan was abandoned halfway: draining the rest would cost more than a new connection
+            self._discard(connection)
+            return
+        try:
+            # COM_RESET_CONNECTION: rolls back, drops temp tables and user variables, restores autocommit
+            if not connection.cmd_reset_connection():
+                # servers older than 5.7.3: reset by re-authenticating instead
+                connection.reset_session()
+        except Error:
+            self._discard(connection)
+            return
+        with self._lock:
+            # under the lock, so close() either sees it in the idle queue or we see the pool closed
+            if not self._closed:
+                self._idle.put((connection, time.monotonic()))
+                return
+        self._discard(connection)  # checked out while the pool was closed
+
+    def _discard(self, connection):
+        try:
+            connection.shutdown()
+        except (NotImplementedError, Error):
+            try:
+                connection.close()
+            except Error:
+                pass
+        self._release_slot()
+        self._count(discarded=1)
+
+    @contextmanager
+    def connection(self, timeout=...):
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except BaseException:
+            # an error or GeneratorExit in the middle of a query can leave the protocol in any state
+            if getattr(connection, 'unread_result', False):
+                self._discard(connection)
+            else:
+                self.release(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self):
+        """Close the pool: idle connections now, checked-out ones as they are released.
+
+        No connection is handed out any more; acquire() raises PoolError.
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                connection.close()
+            except Error:
+                pass
+            self._release_slot()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['open'] = self._open
+        counters['idle'] = self._idle.qsize()
+        counters['in_use'] = counters['open'] - counters['idle']
+        counters['size'] = self.size
+        checkouts = counters['checkouts']
+        counters['mean_checkout_ms'] = 1000 * counters['checkout_seconds'] / checkouts if checkouts else 0.0
+        return counters
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def _default_size():
+    return int(os.environ.get('pool_size', 5))
+
+
+def _default_factory():
+    # the sqlite_standin env var points every generator at a local SQLite copy (see sqlite_standin.py)
+    path = os.environ.get('sqlite_standin')
+    if path:
+        StandinConnection = __import__('sqlite_standin').StandinConnection
+        return lambda: StandinConnection(path)
+    return _connect
+
+
+def configure(size=None, **options):
+    """Replace the shared pool, e.g. configure(size=16) before a partitioned scan"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        options.setdefault('factory', _default_factory())
+        _default_pool = ConnectionPool(size=size or _default_size(), **options)
+        return _default_pool
+
+
+def get_pool():
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool(size=_default_size(), factory=_default_factory())
+        return _default_pool
+
+
+def connection(timeout=...):
+    """`with pool.connection() as connection:` on the shared pool"""
+    return get_pool().connection(timeout)
+
+
+def stats():
+    return get_pool().stats()
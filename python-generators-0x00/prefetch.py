@@ -0,0 +1,67 @@
+# Read-ahead stage for the generator pipelines.
+# While the consumer works on batch N, a background thread is already fetching batch N+1,
+# so the database and the consumer are no longer waiting on each other.
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised by the source over to the consumer thread"""
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(source, depth=2):
+    """Iterate `source` on a background thread, staying up to `depth` items ahead of the consumer.
+
+    The queue is bounded, so a slow consumer makes the producer wait instead of buffering
+    the whole table. Errors raised by the source are re-raised in the consumer, and closing
+    this generator early stops the producer and closes the source (and its connection).
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # Wait for room in the queue, but give up as soon as the consumer has gone away
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(source)
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            # Generators must be closed on the thread that runs them
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name='prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
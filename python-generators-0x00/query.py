@@ -0,0 +1,80 @@
+# A small query builder so generator consumers can push their filters and columns down to MySQL.
+# Instead of `SELECT *` and an `if` in Python, the consumer declares what it needs:
+#
+#   Query().select('name', 'age').where('age', '>', 25)
+#
+# and only the matching rows and columns travel over the wire.
+import re
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'LIKE', 'IN', 'IS NULL', 'IS NOT NULL')
+
+
+def _quote(identifier):
+    # identifiers cannot be sent as parameters, so only accept plain names
+    if not _IDENTIFIER.match(identifier):
+        raise ValueError(f"Invalid identifier: {identifier!r}")
+    return f"`{identifier}`"
+
+
+class Query:
+    """Declarative SELECT over a single table that compiles to SQL plus parameters"""
+
+    def __init__(self, table='user_data', columns=None, filters=None, order=None, limit=None):
+        self.table = table
+        self.columns = tuple(columns or ())
+        self.filters = tuple(filters or ())
+        self.order = tuple(order or ())
+        self.limit = limit
+
+    def _copy(self, **changes):
+        state = dict(table=self.table, columns=self.columns, filters=self.filters,
+                     order=self.order, limit=self.limit)
+        state.update(changes)
+        return Query(**state)
+
+    def select(self, *columns):
+        """Only fetch these columns (all of them when none are given)"""
+        return self._copy(columns=columns)
+
+    def where(self, column, op, value=None):
+        """Add a filter; filters are combined with AND"""
+        op = op.upper()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator {op!r}, expected one of {OPERATORS}")
+        if op == 'IN' and not value:
+            raise ValueError("IN needs a non-empty sequence of values")
+        return self._copy(filters=self.filters + ((column, op, value),))
+
+    def order_by(self, *columns):
+        return self._copy(order=columns)
+
+    def limit_to(self, count):
+        return self._copy(limit=count)
+
+    def compile(self, placeholder='%s'):
+        """Return (sql, params) for the cursor; placeholder is '%s' for MySQL and '?' for SQLite"""
+        columns = ', '.join(_quote(c) for c in self.columns) if self.columns else '*'
+        sql = f"SELECT {columns} FROM {_quote(self.table)}"
+        params = []
+        clauses = []
+        for column, op, value in self.filters:
+            if op in ('IS NULL', 'IS NOT NULL'):
+                clauses.append(f"{_quote(column)} {op}")
+            elif op == 'IN':
+                values = list(value)
+                clauses.append(f"{_quote(column)} IN ({', '.join([placeholder] * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{_quote(column)} {op} {placeholder}")
+                params.append(value)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if self.order:
+            sql += " ORDER BY " + ', '.join(_quote(c) for c in self.order)
+        if self.limit is not None:
+            sql += f" LIMIT {int(self.limit)}"
+        return sql, tuple(params)
+
+    def __repr__(self):
+        return f"Query({self.compile()[0]!r})"
@@ -0,0 +1,99 @@
+# Compact row objects for the user_data generators.
+# A dict row costs ~180 bytes before a single value is stored; with row_factory='slots' the
+# generators build UserRow objects (a fixed __slots__ layout, ~64 bytes) and with
+# row_factory='namedtuple' UserTuple rows (a plain tuple underneath, ~72 bytes) instead.
+# Both still answer row['age'], so code written against the dict rows keeps working.
+#
+# The cursor returns tuples; which tuple position feeds which field is worked out once per
+# set of column names and cached, so converting a batch costs one call per row.
+from collections import namedtuple
+from functools import lru_cache
+from itertools import starmap
+from operator import itemgetter
+
+USER_FIELDS = ('user_id', 'name', 'email', 'age')
+ROW_FACTORIES = ('dict', 'slots', 'namedtuple')
+
+
+class UserRow:
+    """A user_data row with attribute access and no per-instance dict"""
+    __slots__ = USER_FIELDS
+    _fields = USER_FIELDS
+
+    def __init__(self, user_id=None, name=None, email=None, age=None):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __getitem__(self, key):
+        # row['age'] like the dict rows, row[3] like the tuple rows
+        return getattr(self, key if isinstance(key, str) else USER_FIELDS[key])
+
+    def __iter__(self):
+        return iter((self.user_id, self.name, self.email, self.age))
+
+    def __len__(self):
+        return len(USER_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def _asdict(self):
+        return dict(zip(USER_FIELDS, self))
+
+    def __repr__(self):
+        return f"UserRow(user_id={self.user_id!r}, name={self.name!r}, email={self.email!r}, age={self.age!r})"
+
+
+class UserTuple(namedtuple('UserTuple', USER_FIELDS, defaults=(None,) * len(USER_FIELDS))):
+    """A user_data row as a namedtuple that also answers row['age']"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
+_CLASSES = {'slots': UserRow, 'namedtuple': UserTuple}
+
+
+@lru_cache(maxsize=64)
+def field_positions(column_names):
+    """For each of USER_FIELDS, its position in a row with these columns (None when absent)"""
+    unknown = set(column_names) - set(USER_FIELDS)
+    if unknown:
+        raise ValueError(f"Columns {sorted(unknown)} are not user_data fields")
+    return tuple(column_names.index(field) if field in column_names else None for field in USER_FIELDS)
+
+
+@lru_cache(maxsize=64)
+def _converter(row_factory, column_names):
+    cls = _CLASSES[row_factory]
+    if column_names == USER_FIELDS:
+        # the usual SELECT *: the tuple already has the constructor's argument order
+        return lambda batch: list(starmap(cls, batch))
+    # pad every row with a None for the fields the query did not select
+    absent = len(column_names)
+    pick = itemgetter(*(absent if position is None else position for position in field_positions(column_names)))
+    pad = (None,)
+    return lambda batch: list(starmap(cls, (pick(row + pad) for row in batch)))
+
+
+def row_converter(row_factory, column_names):
+    """A function turning a batch of tuple rows with `column_names` into a list of rows.
+
+    row_factory is 'dict', 'slots', 'namedtuple' or a callable taking the column names and
+    returning such a function.
+    """
+    column_names = tuple(column_names)
+    if callable(row_factory):
+        return row_factory(column_names)
+    if row_factory == 'dict':
+        return lambda batch: [dict(zip(column_names, row)) for row in batch]
+    if row_factory not in _CLASSES:
+        raise ValueError(f"row_factory must be one of {ROW_FACTORIES} or a callable")
+    return _converter(row_factory, column_names)
@@ -0,0 +1,173 @@
+# A local SQLite stand-in for the ALX_prodev MySQL database.
+# Every generator gets its connections from pool.py, so pointing the pool at this module
+# runs the very same streaming code against a SQLite file instead of a MySQL server:
+#
+#   sqlite_standin.build('user_data_standin.db', rows=1_000_000)
+#   sqlite_standin.use('user_data_standin.db')     # or set the sqlite_standin env var
+#
+# The connection and cursor classes only implement the slice of the mysql-connector API
+# the generators use (cursor(dictionary=..., buffered=...), %s parameters, fetchmany, ...),
+# plus the upsert and IGNORE statements of seed.py, so sync_data can run against it too.
+import csv
+import functools
+import itertools
+import os
+import re
+import sqlite3
+import uuid
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'user_data.csv')
+
+
+@functools.lru_cache(maxsize=256)
+def _sqlite_sql(sql):
+    """The MySQL statements seed.py writes with, in SQLite's words"""
+    # our statements never contain a literal %s, so a plain replace is enough
+    sql = sql.replace('%s', '?')
+    sql = sql.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+    sql = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql)
+    return re.sub(r'\b(INSERT|UPDATE) IGNORE\b', r'\1 OR IGNORE', sql)
+
+
+class StandinCursor:
+    """sqlite3 cursor with mysql-connector's %s parameters, dictionary rows and column_names"""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_sqlite_sql(sql), tuple(params))
+        if self._dictionary and self._cursor.description:
+            names = self.column_names
+            self._cursor.row_factory = lambda _, row: dict(zip(names, row))
+        return self
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(_sqlite_sql(sql), rows)
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StandinConnection:
+    """What the pool needs from a connection, on top of a sqlite3 database file"""
+    unread_result = False  # sqlite3 cursors can be abandoned halfway without side effects
+
+    def __init__(self, path):
+        # the pool may hand the connection to another thread (prefetch, partition workers),
+        # but only ever to one at a time
+        self._db = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, dictionary=False, buffered=None):
+        return StandinCursor(self._db, dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1")
+
+    def cmd_reset_connection(self):
+        self._db.rollback()
+        return True
+
+    def is_connected(self):
+        return True
+
+    def shutdown(self):
+        self._db.close()
+
+    def close(self):
+        self._db.close()
+
+
+def _scaled_rows(rows):
+    """user_data.csv repeated until there are `rows` users, each with its own uuid"""
+    with open(CSV_PATH, newline='') as file:
+        base = [(row['name'], row['email'], int(row['age'])) for row in csv.DictReader(file)]
+    for n, (name, email, age) in zip(range(rows), itertools.cycle(base)):
+        copy = n // len(base)
+        if copy:
+            local, _, domain = email.partition('@')
+            email = f"{local}+{copy}@{domain}"
+        yield (str(uuid.uuid4()), name, email, age)
+
+
+def row_count(path):
+    if not os.path.exists(path):
+        return 0
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM user_data").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        db.close()
+
+
+def build(path, rows=1_000_000, chunk_size=50_000):
+    """Create (or rebuild) a user_data table with `rows` users in the SQLite file at `path`"""
+    if row_count(path) == rows:
+        return path
+    db = sqlite3.connect(path)
+    try:
+        db.execute("DROP TABLE IF EXISTS user_data")
+        db.execute("""
+        CREATE TABLE user_data (
+            user_id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            age INT
+        )
+        """)
+        db.execute("PRAGMA journal_mode = MEMORY")
+        db.execute("PRAGMA synchronous = OFF")
+        source = _scaled_rows(rows)
+        while True:
+            chunk = list(itertools.islice(source, chunk_size))
+            if not chunk:
+                break
+            db.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)", chunk)
+        db.execute("CREATE INDEX idx_user_data_age ON user_data (age)")
+        db.commit()
+    finally:
+        db.close()
+    return path
+
+
+def use(path, size=None):
+    """Point the shared pool (and so every generator) at the stand-in at `path`"""
+    pool = __import__('pool')
+    # child processes (partitioned scans in process mode) pick it up from the environment
+    os.environ['sqlite_standin'] = os.path.abspath(path)
+    return pool.configure(size=size, factory=lambda: StandinConnection(os.path.abspath(path)))
@@ -0,0 +1,225 @@
+# One-pass statistics over a stream of numbers (e.g. the ages from stream_user_ages).
+# Everything is computed in a single pass with bounded memory:
+#   - count, mean, variance (Welford), min and max in O(1)
+#   - approximate quantiles with a KLL sketch in O(k log(n/k))
+#   - a fixed-width histogram, bounded by the value range
+# States can be saved as JSON checkpoints to resume a long scan, and merged so that
+# scans over different partitions can be combined.
+import json
+import math
+import os
+import random
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items are kept in a stack of compactors; an item at level h stands for 2**h items of
+    the stream. A full compactor sorts itself and promotes every other item one level up.
+    """
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self._random = random.Random(seed)
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _compact(self, height):
+        items = self.compactors[height]
+        items.sort()
+        # keep the odd item out at this level, promote every other one of the rest
+        keep = [items.pop()] if len(items) % 2 else []
+        offset = self._random.randint(0, 1)
+        self.compactors[height + 1].extend(items[offset::2])
+        self.compactors[height] = keep
+
+    def _compress(self):
+        for height in range(len(self.compactors)):
+            if len(self.compactors[height]) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+                self._compact(height)
+                self.size = sum(len(items) for items in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, items in enumerate(other.compactors):
+            self.compactors[height].extend(items)
+        self.size = sum(len(items) for items in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def quantiles(self, fractions):
+        """Approximate values at the given fractions (0..1) of the stream"""
+        weighted = sorted((value, 2 ** height)
+                          for height, items in enumerate(self.compactors) for value in items)
+        total = sum(weight for _, weight in weighted)
+        if not total:
+            return [None for _ in fractions]
+        results = []
+        for fraction in fractions:
+            target = fraction * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results.append(value)
+        return results
+
+    def to_state(self):
+        return {'k': self.k, 'c': self.c, 'compactors': [list(items) for items in self.compactors]}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(k=state['k'], c=state['c'])
+        for _ in state['compactors'][1:]:
+            sketch._grow()
+        sketch.compactors = [list(items) for items in state['compactors']]
+        sketch.size = sum(len(items) for items in sketch.compactors)
+        return sketch
+
+
+class StreamingStats:
+    """Single-pass count/mean/variance/min/max, KLL quantiles and a histogram.
+
+    `position` is free for the producer to record where the stream got to (for
+    stream_user_ages, the last user_id seen), so a checkpoint knows where to resume.
+    """
+
+    def __init__(self, bin_width=10, k=200):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.bin_width = bin_width
+        self.histogram = {}
+        self.sketch = KLLSketch(k=k)
+        self.position = None
+
+    def update(self, value):
+        # Welford's update keeps the variance numerically stable in one pass
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        low = value // self.bin_width * self.bin_width
+        self.histogram[low] = self.histogram.get(low, 0) + 1
+        self.sketch.update(value)
+
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance"""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def sample_variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance) if self.count else None
+
+    def quantile(self, fraction):
+        return self.sketch.quantiles([fraction])[0]
+
+    def quantiles(self, fractions=(0.25, 0.5, 0.75, 0.9, 0.99)):
+        return dict(zip(fractions, self.sketch.quantiles(fractions)))
+
+    def merge(self, other):
+        """Fold another partial state (e.g. from another partition) into this one"""
+        if other.bin_width != self.bin_width:
+            raise ValueError("Cannot merge histograms with different bin widths")
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            # Chan et al. parallel combination of mean and M2
+            self._m2 += other._m2 + delta * delta * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.count = total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            for low, n in other.histogram.items():
+                self.histogram[low] = self.histogram.get(low, 0) + n
+            self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'variance': self.variance,
+            'stddev': self.stddev,
+            'min': self.min,
+            'max': self.max,
+            'quantiles': self.quantiles(),
+            'histogram': dict(sorted(self.histogram.items())),
+        }
+
+    def to_state(self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self._m2,
+            'min': self.min,
+            'max': self.max,
+            'bin_width': self.bin_width,
+            'histogram': [[low, n] for low, n in self.histogram.items()],
+            'sketch': self.sketch.to_state(),
+            'position': self.position,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(bin_width=state['bin_width'])
+        stats.count = state['count']
+        stats.mean = state['mean']
+        stats._m2 = state['m2']
+        stats.min = state['min']
+        stats.max = state['max']
+        stats.histogram = {low: n for low, n in state['histogram']}
+        stats.sketch = KLLSketch.from_state(state['sketch'])
+        stats.position = state['position']
+        return stats
+
+    def save(self, path):
+        """Write a checkpoint atomically, so a crash mid-write leaves the previous one intact"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.to_state(), file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_state(json.load(file))
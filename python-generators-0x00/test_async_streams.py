@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the async generator variants, run against the SQLite stand-in.
+"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+async_streams = __import__('async_streams')
+Query = __import__('query').Query
+
+ROWS = 300
+
+
+async def collect(iterator, limit=None):
+    """The items of an async iterator, or its first `limit` ones (then it is closed)"""
+    items = []
+    async for item in iterator:
+        items.append(item)
+        if limit is not None and len(items) == limit:
+            await iterator.aclose()
+            break
+    return items
+
+
+class TestPrefetch(unittest.TestCase):
+    """Testing the async read-ahead stage"""
+    def test_order_and_backpressure(self):
+        """Items come in order and the reader stays `depth` items ahead."""
+        produced = []
+
+        async def source():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        async def main():
+            items = async_streams.prefetch(source(), depth=3)
+            first = await items.__anext__()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            ahead = len(produced)
+            rest = await collect(items)
+            return [first] + rest, ahead
+
+        items, ahead = asyncio.run(main())
+        self.assertEqual(items, list(range(20)))
+        self.assertLessEqual(ahead, 5)  # 1 consumed, 3 queued, 1 waiting for room
+
+    def test_error_reraised(self):
+        """An error in the source reaches the consumer after the items before it."""
+        async def source():
+            yield 1
+            raise ValueError("lost connection")
+
+        async def main():
+            items = async_streams.prefetch(source())
+            first = await items.__anext__()
+            with self.assertRaises(ValueError):
+                await items.__anext__()
+            return first
+
+        self.assertEqual(asyncio.run(main()), 1)
+
+    def test_close_closes_source(self):
+        """Closing early cancels the reader and closes the source."""
+        closed = []
+
+        async def source():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                closed.append(True)
+
+        self.assertEqual(asyncio.run(collect(async_streams.prefetch(source()), limit=2)), [0, 1])
+        self.assertEqual(closed, [True])
+
+    def test_invalid_depth(self):
+        """A depth below 1 is refused."""
+        async def main():
+            async def source():
+                yield 1
+            with self.assertRaises(ValueError):
+                await async_streams.prefetch(source(), depth=0).__anext__()
+
+        asyncio.run(main())
+
+
+class TestAsyncStreams(unittest.TestCase):
+    """Testing the rows the async streams yield"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    @parameterized.expand([
+        (0,),
+        (2,),
+    ])
+    def test_stream_users(self, prefetch_depth):
+        """Every user comes once, with or without read-ahead."""
+        rows = asyncio.run(collect(async_streams.stream_users(fetch_size=64, prefetch_depth=prefetch_depth,
+                                                              database=self.standin)))
+        self.assertEqual(sorted(row[0] for row in rows), self.user_ids)
+
+    def test_dict_rows_and_query(self):
+        """Dict rows carry the selected columns, filtered in SQLite."""
+        query = Query().select('name', 'age').where('age', '<', 30)
+        rows = asyncio.run(collect(async_streams.stream_users(row_format='dict', query=query,
+                                                              database=self.standin)))
+        self.assertTrue(rows)
+        self.assertTrue(all(set(row) == {'name', 'age'} and row['age'] < 30 for row in rows))
+
+    def test_invalid_row_format(self):
+        """Unknown row formats are refused."""
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(async_streams.stream_users(row_format='namedtuple', database=self.standin)))
+
+    def test_batches(self):
+        """Batches are lists of dicts of batch_size rows, the last one shorter."""
+        batches = asyncio.run(collect(async_streams.stream_users_in_batches(128, database=self.standin)))
+        self.assertEqual([len(batch) for batch in batches], [128, 128, 44])
+        self.assertIsInstance(batches[0][0], dict)
+
+    def test_ages_resume(self):
+        """stream_user_ages goes in user_id order and resumes after a user_id."""
+        rows = asyncio.run(collect(async_streams.stream_user_ages(after_id=self.user_ids[99],
+                                                                  database=self.standin)))
+        self.assertEqual([row['user_id'] for row in rows], self.user_ids[100:])
+
+    def test_concurrent_scans(self):
+        """Several scans share one event loop."""
+        async def main():
+            scans = [collect(async_streams.stream_users(fetch_size=50, database=self.standin)) for _ in range(3)]
+            return await asyncio.gather(*scans)
+
+        self.assertEqual([len(rows) for rows in asyncio.run(main())], [ROWS] * 3)
+
+    def test_early_close(self):
+        """Stopping after a few rows closes the scan."""
+        rows = asyncio.run(collect(async_streams.stream_users(fetch_size=10, database=self.standin), limit=5))
+        self.assertEqual(len(rows), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Unit tests for checkpointed streams, run against the SQLite stand-in.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from itertools import islice
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+checkpoint_module = __import__('checkpoint')
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+ROWS = 1000
+
+
+class TestCheckpointResume(unittest.TestCase):
+    """Testing that a stream resumed from its checkpoint redoes only the unfinished tail"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=4)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    def checkpoint_path(self, kind):
+        return os.path.join(self.directory, f"{self._testMethodName}.{kind}")
+
+    def tearDown(self):
+        for kind in ('json', 'db'):
+            if os.path.exists(self.checkpoint_path(kind)):
+                os.remove(self.checkpoint_path(kind))
+
+    @parameterized.expand([
+        ('json',),
+        ('db',),
+    ])
+    def test_resume_after_crash(self, kind):
+        """Rows finished before the last save are not delivered again, none are skipped."""
+        path = self.checkpoint_path(kind)
+        rows = stream_users(checkpoint=path, checkpoint_every=100)
+        # 350 rows handed out, 349 finished: the last save was after row 300
+        first_run = [row[0] for row in islice(rows, 350)]
+        state = checkpoint_module.open_checkpoint(path).load()
+        self.assertEqual((state['position'], state['rows']), (self.user_ids[299], 300))
+
+        resumed = [row[0] for row in stream_users(checkpoint=path, resume_from=True)]
+        self.assertEqual(resumed, self.user_ids[300:])
+        self.assertEqual(sorted(set(first_run[:300] + resumed)), self.user_ids)
+        rows.close()
+
+    def test_close_saves_progress(self):
+        """Closing the stream saves the rows finished since the last save (not the one in hand)."""
+        path = self.checkpoint_path('json')
+        rows = stream_users(checkpoint=path, checkpoint_every=100)
+        for _ in islice(rows, 150):
+            pass
+        rows.close()
+        state = checkpoint_module.FileCheckpoint(path).load()
+        self.assertEqual((state['position'], state['rows']), (self.user_ids[148], 149))
+        resumed = [row[0] for row in stream_users(checkpoint=path, resume_from=True)]
+        self.assertEqual(resumed, self.user_ids[149:])
+
+    def test_resume_from_user_id(self):
+        """resume_from also takes the user_id to continue after."""
+        resumed = [row[0] for row in stream_users(resume_from=self.user_ids[899])]
+        self.assertEqual(resumed, self.user_ids[900:])
+
+    @parameterized.expand([
+        (1,),
+        (3,),
+    ])
+    def test_batches_resume(self, partitions):
+        """Batches resume after the last batch the consumer finished."""
+        path = self.checkpoint_path('db')
+        batches = stream_users_in_batches(50, partitions=partitions, checkpoint=path, checkpoint_every=100)
+        first_run = [row['user_id'] for batch in islice(batches, 5) for row in batch]
+        self.assertEqual(first_run, self.user_ids[:250])
+        # batches 1 to 4 are finished and saved, the fifth is still in the consumer's hands
+        state = checkpoint_module.SQLiteCheckpoint(path).load()
+        self.assertEqual((state['position'], state['rows']), (self.user_ids[199], 200))
+
+        resumed = [row['user_id']
+                   for batch in stream_users_in_batches(50, partitions=partitions, checkpoint=path, resume_from=True)
+                   for row in batch]
+        self.assertEqual(resumed, self.user_ids[200:])
+        batches.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for columnar batches.
+"""
+
+import unittest
+
+from parameterized import parameterized
+
+columnar = __import__('columnar')
+ColumnBatch = columnar.ColumnBatch
+
+ROWS = [
+    ('id-1', 'Alice', 'alice@example.com', 30),
+    ('id-2', 'Bob', 'bob@example.com', None),
+    ('id-3', 'Carol', 'carol@example.com', 20),
+]
+
+
+class TestColumnBatch(unittest.TestCase):
+    """Testing ColumnBatch with both backends"""
+    @parameterized.expand([
+        ('array',),
+        ('numpy',),
+    ])
+    def test_rows_round_trip(self, backend):
+        """rows() gives back the dict rows, with plain ints and None for NULL ages."""
+        batch = ColumnBatch.from_rows(ROWS, backend=backend)
+        rows = list(batch.rows())
+        self.assertEqual(rows, [dict(zip(columnar.USER_COLUMNS, row)) for row in ROWS])
+        self.assertEqual([type(row['age']) for row in rows], [int, type(None), int])
+
+    @parameterized.expand([
+        ('array',),
+        ('numpy',),
+    ])
+    def test_null_age(self, backend):
+        """A NULL age never matches a filter and is left out of totals."""
+        batch = ColumnBatch.from_rows(ROWS, backend=backend)
+        self.assertEqual(batch.total('age'), 50)
+        self.assertEqual([int(i) for i in batch.indexes_where('age', '!=', 0)], [0, 2])
+        self.assertEqual([row['name'] for row in batch.where('age', '>', 25).rows()], ['Alice'])
+
+    @parameterized.expand([
+        ('array',),
+        ('numpy',),
+    ])
+    def test_only_nulls(self, backend):
+        """A batch whose ages are all NULL totals 0."""
+        batch = ColumnBatch.from_rows(ROWS[1:2], backend=backend)
+        self.assertEqual(batch.total('age'), 0)
+        self.assertEqual(len(batch.where('age', '>', 0)), 0)
+
+    def test_string_column(self):
+        """Strings come back from their shared buffer, negative indexes included."""
+        column = columnar.StringColumn(['ab', '', 'cde'])
+        self.assertEqual(list(column), ['ab', '', 'cde'])
+        self.assertEqual(column[-1], 'cde')
+        self.assertEqual(list(column.take([2, 0])), ['cde', 'ab'])
+
+
+if __name__ == '__main__':
+    unittest.main()
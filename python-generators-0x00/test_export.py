@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the streaming export, run against the SQLite stand-in.
+"""
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+export = __import__('export')
+Query = __import__('query').Query
+
+ROWS = 300
+
+
+class TestRotatingWriter(unittest.TestCase):
+    """Testing file rotation and headers without a database"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rotation(self):
+        """Past rotate_bytes a new numbered file starts, each with its own header."""
+        path = os.path.join(self.directory, 'users.csv.gz')
+        batch = [('id', 'name', 'name@example.com', 30)] * 50
+        with export.RotatingWriter(path, columns=('user_id', 'name', 'email', 'age'),
+                                   compression='gzip', rotate_bytes=1) as writer:
+            for _ in range(3):
+                writer.write(batch)
+        self.assertEqual([os.path.basename(f) for f in writer.files],
+                         ['users.00000.csv.gz', 'users.00001.csv.gz', 'users.00002.csv.gz'])
+        for name in writer.files:
+            with gzip.open(name, 'rt') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], 'user_id,name,email,age')
+            self.assertEqual(len(lines), 51)
+
+    def test_empty(self):
+        """An empty CSV export still leaves a header-only file."""
+        path = os.path.join(self.directory, 'users.csv')
+        with export.RotatingWriter(path, columns=('user_id', 'age')) as writer:
+            writer.write([])
+        with open(path) as f:
+            self.assertEqual(f.read(), 'user_id,age\n')
+
+    def test_shard_path(self):
+        """Shard numbers go before every suffix."""
+        self.assertEqual(export.shard_path('out/users.csv.gz', 3), os.path.join('out', 'users.shard03.csv.gz'))
+        self.assertEqual(export.shard_path('users', 0), 'users.shard00')
+
+
+class TestExportUsers(unittest.TestCase):
+    """Testing full exports of the stand-in table"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=4)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, self.id().rsplit('.', 1)[-1] + '-' + name)
+
+    def read_user_ids(self, files, fmt):
+        user_ids = []
+        for name in files:
+            with (gzip.open(name, 'rt') if name.endswith('.gz') else open(name)) as f:
+                if fmt == 'csv':
+                    user_ids += [row['user_id'] for row in csv.DictReader(f)]
+                else:
+                    user_ids += [json.loads(line)['user_id'] for line in f]
+        return user_ids
+
+    @parameterized.expand([
+        ('users.csv', 'csv', 1),
+        ('users.jsonl.gz', 'jsonl', 1),
+        ('users.csv.gz', 'csv', 3),
+    ])
+    def test_every_row_once(self, name, fmt, partitions):
+        """The format and compression follow the path, and every user is written once."""
+        with patch('builtins.print'):
+            summary = export.export_users(self.path(name), batch_size=64, partitions=partitions)
+        self.assertEqual(summary['rows'], ROWS)
+        self.assertEqual(len(summary['files']), partitions)
+        self.assertEqual(sorted(self.read_user_ids(summary['files'], fmt)), self.user_ids)
+
+    def test_columns(self):
+        """A query's columns are the only ones written."""
+        with patch('builtins.print'):
+            summary = export.export_users(self.path('users.csv'), query=Query().select('user_id', 'age'))
+        with open(summary['files'][0]) as f:
+            self.assertEqual(f.readline(), 'user_id,age\n')
+
+    def test_invalid(self):
+        """Unknown formats and compressions are refused."""
+        with self.assertRaises(ValueError):
+            export.export_users(self.path('users.csv'), fmt='xml')
+        with self.assertRaises(ValueError):
+            export.export_users(self.path('users.csv'), compression='bz2')
+
+    def test_instant_export(self):
+        """An export faster than the clock's resolution reports no rate instead of failing."""
+        with patch.object(export.time, 'perf_counter', return_value=1.0), patch('builtins.print') as printed:
+            summary = export.export_users(self.path('users.csv'))
+        self.assertEqual(summary['seconds'], 0)
+        self.assertIsNone(summary['mb_per_s'])
+        self.assertNotIn('MB/s', printed.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
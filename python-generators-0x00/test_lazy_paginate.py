@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Unit tests for keyset pagination and its continuation tokens.
+"""
+
+import base64
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+paginate = __import__('2-lazy_paginate')
+
+ROWS = 250
+
+
+class TestContinuationToken(unittest.TestCase):
+    """Testing encode_token/decode_token"""
+    @parameterized.expand([
+        ('00000000-0000-4000-8000-000000000000',),
+        ('ffffffff-ffff-4fff-bfff-ffffffffffff',),
+        (42,),
+        ('naïve/+=?&',),
+    ])
+    def test_round_trip(self, after_id):
+        """A token decodes back to the user_id it was made from."""
+        token = paginate.encode_token(after_id)
+        self.assertEqual(paginate.decode_token(token), after_id)
+        # safe in a URL as it is: no padding, no '+' or '/'
+        self.assertFalse(set(token) & set('=+/'))
+
+    @parameterized.expand([
+        ('not a token',),
+        ('',),
+        (base64.urlsafe_b64encode(b'[1, 2]').decode(),),
+        (base64.urlsafe_b64encode(b'{"v": 2, "after": "x"}').decode(),),
+        (base64.urlsafe_b64encode(b'{"after": "x"}').decode(),),
+    ])
+    def test_invalid(self, token):
+        """Tokens that are not ours raise ValueError."""
+        with self.assertRaises(ValueError):
+            paginate.decode_token(token)
+
+
+class TestLazyPagination(unittest.TestCase):
+    """Testing the page walk against the SQLite stand-in"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=2)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    @parameterized.expand([
+        (0,),
+        (2,),
+    ])
+    def test_walk(self, prefetch_depth):
+        """Every user comes once, in user_id order, and only the last page has no token."""
+        pages = list(paginate.lazy_pagination(100, prefetch_depth=prefetch_depth))
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertEqual([row['user_id'] for page in pages for row in page], self.user_ids)
+        self.assertEqual([page.next_token is None for page in pages], [False, False, True])
+
+    def test_resume(self):
+        """A page's token resumes right after it."""
+        pages = paginate.lazy_pagination(100)
+        first = next(pages)
+        pages.close()  # gives its connection back
+        rest = list(paginate.lazy_pagination(100, token=first.next_token))
+        self.assertEqual([row['user_id'] for page in rest for row in page], self.user_ids[100:])
+
+    def test_exact_multiple(self):
+        """When the rows run out on a full page, resuming after it yields nothing."""
+        pages = list(paginate.lazy_pagination(125))
+        self.assertEqual([len(page) for page in pages], [125, 125])
+        self.assertEqual(list(paginate.lazy_pagination(125, token=pages[-1].next_token)), [])
+
+    def test_row_factory(self):
+        """Compact rows walk the same users."""
+        pages = list(paginate.lazy_pagination(100, row_factory='namedtuple'))
+        self.assertEqual([row.user_id for page in pages for row in page], self.user_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
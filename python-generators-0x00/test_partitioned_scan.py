@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests for partitioned scans, run against the SQLite stand-in.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+scan = __import__('partitioned_scan')
+Query = __import__('query').Query
+
+
+class StandinTestCase(unittest.TestCase):
+    """Points the shared pool at a fresh stand-in of `rows` users for the whole class"""
+    rows = 1000
+    pool_size = 2
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=cls.rows)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=cls.pool_size)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    def in_range(self, low, high):
+        return [user_id for user_id in self.user_ids
+                if (low is None or user_id >= low) and (high is None or user_id < high)]
+
+
+class TestPartitionBounds(StandinTestCase):
+    """Testing that the ranges cover the table once and are about the same size"""
+    @parameterized.expand([
+        (1,),
+        (2,),
+        (3,),
+        (7,),
+    ])
+    def test_complete_and_disjoint(self, partitions):
+        """Every user falls in exactly one range, and the ranges are balanced."""
+        ranges = scan.partition_ranges(partitions)
+        self.assertEqual(len(ranges), partitions)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(high, low)  # contiguous: nothing between two ranges
+        parts = [self.in_range(low, high) for low, high in ranges]
+        self.assertEqual(sum(parts, []), self.user_ids)
+        sizes = [len(part) for part in parts]
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_bounds_increase(self):
+        """Split points are strictly increasing user_ids."""
+        bounds = scan.partition_bounds(10)
+        self.assertEqual(bounds, sorted(set(bounds)))
+        self.assertTrue(set(bounds) <= set(self.user_ids))
+
+
+class TestTinyTable(StandinTestCase):
+    """Testing more partitions than rows"""
+    rows = 3
+
+    def test_fewer_ranges(self):
+        """Empty ranges are dropped and the rest still cover the table."""
+        parts = [self.in_range(low, high) for low, high in scan.partition_ranges(8)]
+        self.assertEqual(parts, [[user_id] for user_id in self.user_ids])
+
+
+class TestPartitionedScan(StandinTestCase):
+    """Testing that the merged scan yields every row once"""
+    @parameterized.expand([
+        (3, True),
+        (3, False),
+        (6, True),  # more ranges than pooled connections
+        (6, False),
+    ])
+    def test_threads(self, partitions, ordered):
+        """Ordered scans keep user_id order; unordered ones the same rows in any order."""
+        batches = scan.partitioned_scan(partitions, batch_size=64, ordered=ordered)
+        user_ids = [row['user_id'] for batch in batches for row in batch]
+        self.assertEqual(user_ids if ordered else sorted(user_ids), self.user_ids)
+
+    def test_query(self):
+        """Filters and columns are pushed into every range."""
+        query = Query().select('user_id', 'age').where('age', '>', 50)
+        rows = [row for batch in scan.partitioned_scan(4, batch_size=100, query=query, ordered=True)
+                for row in batch]
+        self.assertTrue(rows)
+        self.assertTrue(all(set(row) == {'user_id', 'age'} and row['age'] > 50 for row in rows))
+
+    def test_early_close(self):
+        """Closing the scan halfway stops the workers and gives the connections back."""
+        batches = scan.partitioned_scan(6, batch_size=10, ordered=True)
+        next(batches)
+        batches.close()
+        self.assertEqual(len(list(scan.partitioned_scan(2, batch_size=500))), 2)
+
+    def test_processes(self):
+        """Workers in processes read the same rows."""
+        batches = scan.partitioned_scan(2, batch_size=250, ordered=True, mode='process')
+        self.assertEqual([row['user_id'] for batch in batches for row in batch], self.user_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
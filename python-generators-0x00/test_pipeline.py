@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Pipeline combinators.
+"""
+
+import unittest
+
+from parameterized import parameterized
+
+Pipeline = __import__('pipeline').Pipeline
+
+
+def batches_of(rows, size):
+    """A callable giving `rows` in lists of `size`, like stream_users_in_batches"""
+    return lambda: (rows[i:i + size] for i in range(0, len(rows), size))
+
+
+class TestPipeline(unittest.TestCase):
+    """Testing that the stages give what the plain loops would"""
+    def setUp(self):
+        self.rows = list(range(100))
+        self.source = batches_of(self.rows, 7)
+
+    def test_fused(self):
+        """Consecutive filters and maps run in order, fused into one stage."""
+        pipeline = (Pipeline(self.source).filter(lambda x: x % 2).map(lambda x: x * 10)
+                    .filter(lambda x: x > 500).map(str))
+        self.assertEqual(pipeline.collect(), [str(x * 10) for x in self.rows if x % 2 and x * 10 > 500])
+        self.assertEqual([stage['stage'] for stage in pipeline.stats()], ['source', 'filter+map+filter+map'])
+
+    @parameterized.expand([
+        (1,),
+        (3,),
+        (10,),
+        (200,),
+    ])
+    def test_batch(self, size):
+        """batch() regroups rows across source batches; only the last group is short."""
+        groups = Pipeline(self.source).batch(size).collect()
+        self.assertEqual(groups, [self.rows[i:i + size] for i in range(0, len(self.rows), size)])
+
+    @parameterized.expand([
+        (3, 1),
+        (3, 2),
+        (5, 5),
+    ])
+    def test_window(self, size, step):
+        """window() gives the last `size` rows every `step` rows, across batches."""
+        windows = Pipeline(self.source).window(size, step).collect()
+        expected = [tuple(self.rows[i:i + size]) for i in range(0, len(self.rows) - size + 1, step)]
+        self.assertEqual(windows, expected)
+
+    def test_invalid(self):
+        """Sizes below 1 are refused."""
+        with self.assertRaises(ValueError):
+            Pipeline(self.source).batch(0)
+        with self.assertRaises(ValueError):
+            Pipeline(self.source).window(2, 0)
+
+    def test_limit_stops_source(self):
+        """A limit stops pulling batches once it has enough."""
+        pulled = []
+
+        def source():
+            for i in range(0, 100, 10):
+                pulled.append(i)
+                yield self.rows[i:i + 10]
+
+        self.assertEqual(Pipeline(source).limit(25).collect(), self.rows[:25])
+        self.assertEqual(pulled, [0, 10, 20])
+
+    def test_rows_chunk_cap(self):
+        """Over a row generator, a limit behind maps reads no more rows than it needs."""
+        read = []
+
+        def rows():
+            for row in self.rows:
+                read.append(row)
+                yield row
+
+        self.assertEqual(Pipeline.rows(rows(), chunk_size=50).map(abs).limit(6).collect(), self.rows[:6])
+        self.assertEqual(len(read), 6)
+
+    def test_sink_and_stats(self):
+        """sink() calls fn on every output row and returns how many there were."""
+        seen = []
+        count = Pipeline(self.source).filter(lambda x: x < 30).batch(4).sink(seen.append)
+        self.assertEqual(count, 8)
+        self.assertEqual(sum(seen, []), self.rows[:30])
+
+    def test_stage_counters(self):
+        """stats() has rows in and out for the source, each stage and the sink."""
+        pipeline = Pipeline(self.source).filter(lambda x: x < 30).batch(4)
+        pipeline.sink(lambda group: None)
+        stats = {stage['stage']: (stage['rows_in'], stage['rows_out']) for stage in pipeline.stats()}
+        self.assertEqual(stats, {'source': (100, 100), 'filter': (100, 30), 'batch': (30, 8), 'sink': (8, 8)})
+
+    def test_rerun(self):
+        """A pipeline over a callable source runs again, as do pipelines built from it."""
+        base = Pipeline(self.source).map(lambda x: x + 1)
+        self.assertEqual(base.collect(), base.collect())
+        self.assertEqual(base.limit(3).collect(), [1, 2, 3])
+
+    def test_one_shot_source(self):
+        """A generator source feeds one run; the next one raises."""
+        pipeline = Pipeline(batches_of(self.rows, 7)())
+        self.assertEqual(list(pipeline), self.rows)
+        with self.assertRaises(RuntimeError):
+            pipeline.collect()
+
+    def test_early_close(self):
+        """Stopping early closes the source generator."""
+        closed = []
+
+        def source():
+            try:
+                yield from batches_of(self.rows, 7)()
+            finally:
+                closed.append(True)
+
+        rows = iter(Pipeline(source))
+        next(rows)
+        rows.close()
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
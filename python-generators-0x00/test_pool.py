@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared connection pool.
+"""
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+pool = __import__('pool')
+
+
+def fake_connection():
+    """What the pool calls on a mysql-connector connection, as a Mock"""
+    connection = Mock(unread_result=False)
+    connection.cmd_reset_connection.return_value = True
+    return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Testing checkout, reset, discard and close"""
+    def setUp(self):
+        self.created = []
+
+        def factory():
+            self.created.append(fake_connection())
+            return self.created[-1]
+
+        self.pool = pool.ConnectionPool(size=2, timeout=1, factory=factory)
+
+    def test_reuse(self):
+        """A released connection is reset and handed out again."""
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(first.cmd_reset_connection.call_count, 2)
+        first.reset_session.assert_not_called()
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+    def test_reset_session_fallback(self):
+        """Servers without COM_RESET_CONNECTION get reset_session instead."""
+        with self.pool.connection() as connection:
+            connection.cmd_reset_connection.return_value = False
+        connection.reset_session.assert_called_once()
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_failed_reset_discards(self):
+        """A connection whose reset fails is closed and its slot freed."""
+        with self.pool.connection() as connection:
+            connection.cmd_reset_connection.side_effect = Error("lost connection")
+        connection.shutdown.assert_called_once()
+        stats = self.pool.stats()
+        self.assertEqual((stats['open'], stats['idle'], stats['discarded']), (0, 0, 1))
+        with self.pool.connection() as fresh:
+            self.assertIsNot(fresh, connection)
+
+    def test_unread_result_discards(self):
+        """A scan abandoned halfway is not drained: the connection is dropped."""
+        with self.assertRaises(GeneratorExit):
+            with self.pool.connection() as connection:
+                connection.unread_result = True
+                raise GeneratorExit
+        connection.cmd_reset_connection.assert_not_called()
+        connection.shutdown.assert_called_once()
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+    def test_shutdown_fallback(self):
+        """Connections that cannot shut down are closed."""
+        with self.pool.connection() as connection:
+            connection.cmd_reset_connection.side_effect = Error("lost connection")
+            connection.shutdown.side_effect = NotImplementedError
+        connection.close.assert_called_once()
+
+    def test_health_check(self):
+        """An idle connection that fails its ping is replaced."""
+        self.pool.ping_after = 0
+        with self.pool.connection() as stale:
+            stale.ping.side_effect = Error("gone away")
+        with self.pool.connection() as connection:
+            self.assertIsNot(connection, stale)
+        self.assertEqual(self.pool.stats()['failed_health_checks'], 1)
+
+    def test_timeout(self):
+        """With every connection checked out a checkout gives up after its timeout."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolError):
+            self.pool.acquire(timeout=0.05)
+        self.assertEqual(self.pool.stats()['waits'], 1)
+        for connection in held:
+            self.pool.release(connection)
+
+    def test_discard_frees_a_waiter(self):
+        """A discarded connection lets a waiting checkout open a new one."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire(timeout=2)))
+        waiter.start()
+        time.sleep(0.05)
+        held[0].unread_result = True
+        self.pool.release(held[0])
+        waiter.join()
+        self.assertIs(got[0], self.created[-1])
+        self.assertEqual(len(self.created), 3)
+
+    def test_factory_error(self):
+        """A failed connect does not use up a slot."""
+        self.pool.factory = Mock(side_effect=Error("refused"))
+        for _ in range(3):
+            with self.assertRaises(Error):
+                self.pool.acquire()
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+    def test_close(self):
+        """close() closes idle connections now and checked-out ones on release."""
+        idle = self.pool.acquire()
+        busy = self.pool.acquire()
+        self.pool.release(idle)
+        self.pool.close()
+        idle.close.assert_called_once()
+        busy.shutdown.assert_not_called()
+        with self.assertRaises(PoolError):
+            self.pool.acquire()
+        self.pool.release(busy)
+        busy.shutdown.assert_called_once()
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+
+class TestConfigure(unittest.TestCase):
+    """Testing that replacing the shared pool closes the old one"""
+    def test_configure(self):
+        """Connections of the replaced pool are closed as they come back."""
+        old = pool.configure(size=1, factory=fake_connection)
+        with old.connection() as connection:
+            new = pool.configure(size=1, factory=fake_connection)
+        self.assertIsNot(new, old)
+        self.assertIs(pool.get_pool(), new)
+        connection.shutdown.assert_called_once()
+        pool.configure()
+
+
+if __name__ == '__main__':
+    unittest.main()
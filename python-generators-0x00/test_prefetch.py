@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the read-ahead prefetch stage.
+"""
+
+import threading
+import time
+import unittest
+
+from parameterized import parameterized
+
+prefetch = __import__('prefetch').prefetch
+
+
+def wait_until(condition, timeout=5):
+    """Poll `condition` until it holds or `timeout` seconds passed"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+class TestPrefetch(unittest.TestCase):
+    """Testing order, read-ahead depth, errors and early close"""
+    @parameterized.expand([
+        (1,),
+        (2,),
+        (10,),
+    ])
+    def test_order(self, depth):
+        """Items come through unchanged and in order."""
+        self.assertEqual(list(prefetch(range(100), depth)), list(range(100)))
+
+    def test_invalid_depth(self):
+        """A depth below 1 is refused."""
+        with self.assertRaises(ValueError):
+            next(prefetch(range(3), depth=0))
+
+    def test_stays_depth_ahead(self):
+        """The producer reads at most `depth` items past what the consumer took (plus one in hand)."""
+        produced = []
+
+        def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        items = prefetch(source(), depth=3)
+        next(items)
+        wait_until(lambda: len(produced) >= 5)
+        time.sleep(0.05)
+        self.assertEqual(len(produced), 5)  # 1 consumed, 3 queued, 1 waiting for room
+        items.close()
+
+    def test_runs_on_another_thread(self):
+        """The source is iterated off the consumer's thread."""
+        threads = []
+
+        def source():
+            threads.append(threading.current_thread())
+            yield 1
+
+        self.assertEqual(list(prefetch(source())), [1])
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_error_reraised(self):
+        """An error in the source reaches the consumer after the items before it."""
+        def source():
+            yield 1
+            raise ValueError("lost connection")
+
+        items = prefetch(source())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+    def test_close_closes_source(self):
+        """Closing early stops the producer and closes the source generator."""
+        closed = threading.Event()
+
+        def source():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                closed.set()
+
+        before = set(threading.enumerate())
+        items = prefetch(source(), depth=2)
+        next(items)
+        items.close()
+        self.assertTrue(closed.is_set())
+        self.assertEqual(set(threading.enumerate()) - before, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the query builder and the filters batch_processing pushes down.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+Query = __import__('query').Query
+processing = __import__('1-batch_processing')
+
+ROWS = 300
+
+
+class TestCompile(unittest.TestCase):
+    """Testing the SQL and parameters a Query compiles to"""
+    @parameterized.expand([
+        (Query(), "SELECT * FROM `user_data`", ()),
+        (Query().select('name', 'age'), "SELECT `name`, `age` FROM `user_data`", ()),
+        (Query().where('age', '>', 25).where('name', 'like', 'A%'),
+         "SELECT * FROM `user_data` WHERE `age` > %s AND `name` LIKE %s", (25, 'A%')),
+        (Query().where('age', 'IN', [20, 30]), "SELECT * FROM `user_data` WHERE `age` IN (%s, %s)", (20, 30)),
+        (Query().where('email', 'IS NULL'), "SELECT * FROM `user_data` WHERE `email` IS NULL", ()),
+        (Query().order_by('user_id').limit_to(10), "SELECT * FROM `user_data` ORDER BY `user_id` LIMIT 10", ()),
+    ])
+    def test_compile(self, query, sql, params):
+        """Columns, filters, order and limit end up in the SQL, values in the parameters."""
+        self.assertEqual(query.compile(), (sql, params))
+
+    def test_placeholder(self):
+        """SQLite placeholders can be asked for."""
+        self.assertEqual(Query().where('age', '=', 1).compile('?')[0], "SELECT * FROM `user_data` WHERE `age` = ?")
+
+    def test_immutable(self):
+        """Builder methods return a new Query and leave the old one alone."""
+        base = Query().where('age', '>', 25)
+        narrowed = base.select('name')
+        self.assertEqual(base.columns, ())
+        self.assertEqual(narrowed.filters, base.filters)
+
+    @parameterized.expand([
+        ('name; DROP TABLE user_data',),
+        ('`name`',),
+        ('1age',),
+    ])
+    def test_invalid_identifier(self, column):
+        """Anything but a plain name is refused, since identifiers cannot be parameters."""
+        with self.assertRaises(ValueError):
+            Query().select(column).compile()
+
+    @parameterized.expand([
+        ('age', 'BETWEEN', (1, 2)),
+        ('age', 'IN', []),
+    ])
+    def test_invalid_filter(self, column, op, value):
+        """Unknown operators and empty IN lists are refused."""
+        with self.assertRaises(ValueError):
+            Query().where(column, op, value)
+
+
+class TestPushdown(unittest.TestCase):
+    """Testing that filtered batches match the same filter applied in Python"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=2)
+        conn = sqlite3.connect(cls.standin)
+        conn.row_factory = sqlite3.Row
+        try:
+            cls.users = [dict(row) for row in conn.execute("SELECT * FROM user_data")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    def test_filter_and_columns(self):
+        """Only matching rows, and only the asked-for columns, come back."""
+        query = Query().select('name', 'age').where('age', '>', 25)
+        rows = [row for batch in processing.stream_users_in_batches(40, query) for row in batch]
+        expected = [{'name': user['name'], 'age': user['age']} for user in self.users if user['age'] > 25]
+        self.assertEqual(sorted(rows, key=repr), sorted(expected, key=repr))
+
+    def test_batch_processing(self):
+        """batch_processing prints exactly the users over 25."""
+        with patch('builtins.print') as printed:
+            processing.batch_processing(50)
+        ages = [call.args[0]['age'] for call in printed.call_args_list]
+        self.assertEqual(len(ages), sum(user['age'] > 25 for user in self.users))
+        self.assertTrue(all(age > 25 for age in ages))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compact row objects and the batch converters.
+"""
+
+import unittest
+
+from parameterized import parameterized
+
+row_factory = __import__('row_factory')
+UserRow = row_factory.UserRow
+UserTuple = row_factory.UserTuple
+
+ROW = ('00000000-0000-4000-8000-000000000000', 'Alice', 'alice@example.com', 42)
+
+
+class TestRows(unittest.TestCase):
+    """Testing that both row types answer like the dict and tuple rows they replace"""
+    @parameterized.expand([
+        (UserRow,),
+        (UserTuple,),
+    ])
+    def test_access(self, cls):
+        """Rows are read by name, by position and by attribute."""
+        row = cls(*ROW)
+        self.assertEqual(row['age'], 42)
+        self.assertEqual(row[1], 'Alice')
+        self.assertEqual(row.email, 'alice@example.com')
+        self.assertEqual(tuple(row), ROW)
+        self.assertEqual(len(row), 4)
+        self.assertEqual(row._asdict(), dict(zip(row_factory.USER_FIELDS, ROW)))
+
+    @parameterized.expand([
+        (UserRow,),
+        (UserTuple,),
+    ])
+    def test_no_instance_dict(self, cls):
+        """Neither row type carries a per-instance __dict__."""
+        self.assertFalse(hasattr(cls(*ROW), '__dict__'))
+
+    def test_equality(self):
+        """UserRows with the same values are equal."""
+        self.assertEqual(UserRow(*ROW), UserRow(*ROW))
+        self.assertNotEqual(UserRow(*ROW), UserRow(*ROW[:3], 43))
+
+
+class TestRowConverter(unittest.TestCase):
+    """Testing row_converter for full and partial column sets"""
+    @parameterized.expand([
+        ('slots', UserRow),
+        ('namedtuple', UserTuple),
+    ])
+    def test_select_star(self, name, cls):
+        """Rows with every column convert straight into the row class."""
+        rows = row_factory.row_converter(name, row_factory.USER_FIELDS)([ROW, ROW])
+        self.assertEqual(rows, [cls(*ROW)] * 2)
+
+    @parameterized.expand([
+        ('slots',),
+        ('namedtuple',),
+    ])
+    def test_partial_columns(self, name):
+        """Columns in another order land in the right fields; missing ones are None."""
+        convert = row_factory.row_converter(name, ('age', 'name'))
+        row, = convert([(42, 'Alice')])
+        self.assertEqual(tuple(row), (None, 'Alice', None, 42))
+
+    def test_dict(self):
+        """'dict' gives the dict rows of the plain cursor."""
+        convert = row_factory.row_converter('dict', ('name', 'age'))
+        self.assertEqual(convert([('Alice', 42)]), [{'name': 'Alice', 'age': 42}])
+
+    def test_callable(self):
+        """A callable gets the column names and returns the converter."""
+        convert = row_factory.row_converter(lambda columns: lambda batch: [columns] * len(batch), ['age'])
+        self.assertEqual(convert([(1,), (2,)]), [('age',), ('age',)])
+
+    def test_invalid(self):
+        """Unknown factories and columns are refused."""
+        with self.assertRaises(ValueError):
+            row_factory.row_converter('object', row_factory.USER_FIELDS)
+        with self.assertRaises(ValueError):
+            row_factory.row_converter('slots', ('user_id', 'password'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests for idempotent seeding, run against the SQLite stand-in.
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+sqlite_standin = __import__('sqlite_standin')
+seed = __import__('seed')
+
+USERS = [
+    ('Alice', 'alice@example.com', 30),
+    ('Bob', 'bob@example.com', 41),
+    ('Carol', 'carol@example.com', 52),
+]
+
+
+class TestSeeding(unittest.TestCase):
+    """Testing that insert_data and sync_data never load a user twice"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.connection = sqlite_standin.StandinConnection(os.path.join(self.directory, 'user_data.db'))
+        self.connection.cursor().execute("""
+        CREATE TABLE user_data (
+            user_id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            age INT
+        )
+        """)
+        self.csv_file = self.write_csv(USERS)
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, users, name='user_data.csv'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+            writer.writerow(['name', 'email', 'age'])
+            writer.writerows(users)
+        return path
+
+    def table(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT user_id, name, email, age FROM user_data ORDER BY email")
+        return cursor.fetchall()
+
+    def sync(self, csv_file=None):
+        return seed.sync_data(self.connection, csv_file or self.csv_file)
+
+    def test_user_id_for(self):
+        """Ids are the UUIDv5 of the normalised email."""
+        self.assertEqual(seed.user_id_for(' Alice@Example.com'),
+                         str(uuid.uuid5(seed.SEED_NAMESPACE, 'alice@example.com')))
+
+    def test_sync_twice(self):
+        """A second sync of the same file writes nothing."""
+        self.assertEqual(self.sync(), dict(inserted=3, updated=0, unchanged=0, adopted=0, duplicates=0))
+        table = self.table()
+        self.assertEqual(self.sync(), dict(inserted=0, updated=0, unchanged=3, adopted=0, duplicates=0))
+        self.assertEqual(self.table(), table)
+
+    def test_sync_changes(self):
+        """Only the changed and the new rows are written."""
+        self.sync()
+        changed = self.write_csv([USERS[0], ('Bob', 'bob@example.com', 42), USERS[2],
+                                  ('Dan', 'dan@example.com', 63)], 'changed.csv')
+        self.assertEqual(self.sync(changed), dict(inserted=1, updated=1, unchanged=2, adopted=0, duplicates=0))
+        self.assertEqual([row[3] for row in self.table()], [30, 42, 52, 63])
+
+    def test_insert_data_twice(self):
+        """insert_data re-run on the same file keeps one row per user."""
+        for mode in ('bulk', 'row', 'bulk'):
+            seed.insert_data(self.connection, self.csv_file, mode=mode)
+        self.assertEqual([row[0] for row in self.table()], [seed.user_id_for(email) for _, email, _ in USERS])
+
+    def test_sync_after_insert_data(self):
+        """Rows insert_data loaded are adopted by sync_data, not inserted again."""
+        seed.insert_data(self.connection, self.csv_file)
+        self.assertEqual(self.sync(), dict(inserted=0, updated=0, unchanged=3, adopted=3, duplicates=0))
+        self.assertEqual(len(self.table()), 3)
+
+    def test_legacy_copies(self):
+        """Copies loaded with random ids are moved to the email's id, extra copies deleted."""
+        cursor = self.connection.cursor()
+        for _ in range(2):
+            cursor.executemany("INSERT INTO user_data VALUES (%s, %s, %s, %s)",
+                               [(str(uuid.uuid4()), *user) for user in USERS])
+        self.connection.commit()
+        self.assertEqual(self.sync(), dict(inserted=0, updated=0, unchanged=3, adopted=3, duplicates=3))
+        self.assertEqual([row[0] for row in self.table()], [seed.user_id_for(email) for _, email, _ in USERS])
+        self.assertEqual(self.sync(), dict(inserted=0, updated=0, unchanged=3, adopted=0, duplicates=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
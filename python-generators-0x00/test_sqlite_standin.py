@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the SQLite stand-in the benchmarks and tests run against.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+
+
+class TestTranslation(unittest.TestCase):
+    """Testing the MySQL statements the stand-in rewrites for SQLite"""
+    @parameterized.expand([
+        ("SELECT * FROM user_data WHERE age > %s", "SELECT * FROM user_data WHERE age > ?"),
+        ("INSERT INTO t VALUES (%s, %s) ON DUPLICATE KEY UPDATE a=VALUES(a)",
+         "INSERT INTO t VALUES (?, ?) ON CONFLICT DO UPDATE SET a=excluded.a"),
+        ("INSERT IGNORE INTO t VALUES (%s)", "INSERT OR IGNORE INTO t VALUES (?)"),
+        ("UPDATE IGNORE t SET a = %s", "UPDATE OR IGNORE t SET a = ?"),
+    ])
+    def test_sqlite_sql(self, mysql, sqlite):
+        """Placeholders, upserts and IGNORE come out in SQLite's syntax."""
+        self.assertEqual(sqlite_standin._sqlite_sql(mysql), sqlite)
+
+
+class TestBuild(unittest.TestCase):
+    """Testing the generated table and the mysql-connector-like API over it"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=2500)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_scaled_rows(self):
+        """The CSV is repeated up to `rows` users with unique ids and emails."""
+        conn = sqlite3.connect(self.path)
+        try:
+            count, ids, emails = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT user_id), COUNT(DISTINCT email) FROM user_data").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual((count, ids, emails), (2500, 2500, 2500))
+        self.assertEqual(sqlite_standin.row_count(self.path), 2500)
+
+    def test_rebuild_skipped(self):
+        """Building the same size again keeps the file as it is."""
+        before = os.path.getmtime(self.path)
+        sqlite_standin.build(self.path, rows=2500)
+        self.assertEqual(os.path.getmtime(self.path), before)
+
+    def test_missing_file(self):
+        """A file that does not exist has no rows."""
+        self.assertEqual(sqlite_standin.row_count(os.path.join(self.directory, 'missing.db')), 0)
+
+    def test_cursor(self):
+        """Cursors take %s parameters, give dictionary rows and fetch in batches."""
+        connection = sqlite_standin.StandinConnection(self.path)
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT name, age FROM user_data WHERE age > %s ORDER BY age", (50,))
+            self.assertEqual(cursor.column_names, ('name', 'age'))
+            batch = cursor.fetchmany(10)
+            self.assertEqual(len(batch), 10)
+            self.assertTrue(all(set(row) == {'name', 'age'} and row['age'] > 50 for row in batch))
+            cursor.close()
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
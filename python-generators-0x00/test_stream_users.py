@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for stream_users, against the SQLite stand-in and a mocked unbuffered cursor.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from itertools import islice
+from unittest.mock import Mock
+
+from parameterized import parameterized
+
+sqlite_standin = __import__('sqlite_standin')
+pool = __import__('pool')
+stream_users = __import__('0-stream_users').stream_users
+
+ROWS = 300
+
+
+class TestStreamUsers(unittest.TestCase):
+    """Testing the rows stream_users yields"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.standin = sqlite_standin.build(os.path.join(cls.directory, 'user_data.db'), rows=ROWS)
+        cls.environ = os.environ.get('sqlite_standin')
+        sqlite_standin.use(cls.standin, size=3)
+        conn = sqlite3.connect(cls.standin)
+        try:
+            cls.user_ids = [row[0] for row in conn.execute("SELECT user_id FROM user_data ORDER BY user_id")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        pool.get_pool().close()
+        if cls.environ is None:
+            os.environ.pop('sqlite_standin', None)
+        else:
+            os.environ['sqlite_standin'] = cls.environ
+        pool.configure()
+        shutil.rmtree(cls.directory)
+
+    @parameterized.expand([
+        (1,),
+        (7,),
+        (1000,),
+    ])
+    def test_every_row(self, fetch_size):
+        """Every user comes once whatever the fetch size."""
+        rows = list(stream_users(fetch_size=fetch_size))
+        self.assertEqual(sorted(row[0] for row in rows), self.user_ids)
+        self.assertTrue(all(len(row) == 4 for row in rows))
+
+    def test_dict_rows(self):
+        """row_format='dict' gives the columns by name."""
+        row = next(iter(stream_users(row_format='dict')))
+        self.assertEqual(set(row), {'user_id', 'name', 'email', 'age'})
+
+    def test_invalid_row_format(self):
+        """Unknown row formats are refused."""
+        with self.assertRaises(ValueError):
+            list(stream_users(row_format='namedtuple'))
+
+    @parameterized.expand([
+        (True,),
+        (False,),
+    ])
+    def test_partitions(self, ordered):
+        """A partitioned stream yields the same users, in order when asked to."""
+        user_ids = [row[0] for row in stream_users(fetch_size=50, partitions=3, ordered=ordered)]
+        self.assertEqual(user_ids if ordered else sorted(user_ids), self.user_ids)
+
+    def test_early_stop(self):
+        """Stopping after a few rows gives the connection back."""
+        rows = stream_users(fetch_size=10)
+        self.assertEqual(len(list(islice(rows, 5))), 5)
+        rows.close()
+        self.assertEqual(pool.stats()['in_use'], 0)
+
+
+class TestUnbufferedCursor(unittest.TestCase):
+    """Testing how stream_users drives a mysql-connector cursor"""
+    def setUp(self):
+        self.connection = Mock(unread_result=False)
+        self.connection.cmd_reset_connection.return_value = True
+        self.cursor = self.connection.cursor.return_value
+        self.cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+        self.pool = pool.configure(size=1, factory=lambda: self.connection)
+
+    def tearDown(self):
+        self.pool.close()
+        pool.configure()
+
+    def test_unbuffered_by_default(self):
+        """The cursor is unbuffered and read fetch_size rows at a time."""
+        self.assertEqual(list(stream_users(fetch_size=2)), [(1,), (2,), (3,)])
+        self.connection.cursor.assert_called_once_with(buffered=False, dictionary=False)
+        self.cursor.fetchmany.assert_called_with(2)
+
+    def test_buffered(self):
+        """buffered=True asks for a buffered cursor."""
+        list(stream_users(buffered=True))
+        self.connection.cursor.assert_called_once_with(buffered=True, dictionary=False)
+
+    def test_abandoned_scan_drops_connection(self):
+        """A stream closed with rows left on the socket discards its connection."""
+        rows = stream_users(fetch_size=2)
+        next(rows)
+        self.connection.unread_result = True
+        rows.close()
+        self.connection.cmd_reset_connection.assert_not_called()
+        self.connection.shutdown.assert_called_once()
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
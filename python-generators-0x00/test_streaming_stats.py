@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the one-pass statistics behind age_statistics.
+"""
+
+import bisect
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+streaming_stats = __import__('streaming_stats')
+KLLSketch = streaming_stats.KLLSketch
+StreamingStats = streaming_stats.StreamingStats
+
+
+def values(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.randint(18, 100) + rng.random() for _ in range(count)]
+
+
+class TestWelford(unittest.TestCase):
+    """Testing count, mean and variance against the statistics module"""
+    def test_one_pass(self):
+        """A single pass matches the two-pass results."""
+        data = values(10_000)
+        stats = StreamingStats().update_many(data)
+        self.assertEqual(stats.count, len(data))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(data), places=9)
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(data), places=6)
+        self.assertAlmostEqual(stats.sample_variance, statistics.variance(data), places=6)
+        self.assertEqual((stats.min, stats.max), (min(data), max(data)))
+
+    def test_large_offset(self):
+        """Welford stays accurate where a sum of squares would cancel out."""
+        data = [1e9 + v for v in (4, 7, 13, 16)]
+        self.assertAlmostEqual(StreamingStats().update_many(data).variance, 22.5, places=6)
+
+    def test_merge(self):
+        """Merging partial states gives the state of one pass over everything."""
+        data = values(9000)
+        merged = StreamingStats()
+        for start in range(0, len(data), 3000):
+            merged.merge(StreamingStats().update_many(data[start:start + 3000]))
+        whole = StreamingStats().update_many(data)
+        self.assertEqual(merged.count, whole.count)
+        self.assertAlmostEqual(merged.mean, whole.mean, places=9)
+        self.assertAlmostEqual(merged.variance, whole.variance, places=6)
+        self.assertEqual(merged.histogram, whole.histogram)
+
+    def test_empty(self):
+        """An empty stream has no mean or variance."""
+        summary = StreamingStats().summary()
+        self.assertEqual((summary['count'], summary['mean'], summary['variance']), (0, None, None))
+
+
+class TestKLLSketch(unittest.TestCase):
+    """Testing the rank error of the KLL quantile sketch"""
+    def rank_error(self, sketch, data, fraction):
+        ordered = sorted(data)
+        value = sketch.quantiles([fraction])[0]
+        return abs(bisect.bisect_left(ordered, value) / len(ordered) - fraction)
+
+    @parameterized.expand([
+        (0.01,),
+        (0.25,),
+        (0.5,),
+        (0.9,),
+        (0.99,),
+    ])
+    def test_rank_error(self, fraction):
+        """Quantiles of 100k values are within 1% of their true rank, in bounded space."""
+        data = values(100_000, seed=1)
+        sketch = KLLSketch(k=200, seed=1)
+        for value in data:
+            sketch.update(value)
+        self.assertLess(self.rank_error(sketch, data, fraction), 0.01)
+        self.assertLess(sketch.size, 1000)
+
+    def test_merge(self):
+        """A sketch merged from partitions is as accurate as one over the whole stream."""
+        data = values(60_000, seed=2)
+        merged = KLLSketch(k=200, seed=2)
+        for start in range(0, len(data), 20_000):
+            part = KLLSketch(k=200, seed=start)
+            for value in data[start:start + 20_000]:
+                part.update(value)
+            merged.merge(part)
+        for fraction in (0.1, 0.5, 0.9):
+            self.assertLess(self.rank_error(merged, data, fraction), 0.01)
+
+    def test_exact_when_small(self):
+        """Below its capacity the sketch keeps every value."""
+        sketch = KLLSketch(k=200)
+        for value in range(1, 101):
+            sketch.update(value)
+        self.assertEqual(sketch.quantiles([0.5, 1.0]), [50, 100])
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Testing that a saved state resumes where it left off"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load(self):
+        """A state saved halfway and loaded again ends like an uninterrupted pass."""
+        data = values(5000)
+        path = os.path.join(self.directory, 'stats.json')
+        first = StreamingStats().update_many(data[:2500])
+        first.position = 'user-2500'
+        first.save(path)
+        resumed = StreamingStats.load(path)
+        self.assertEqual(resumed.position, 'user-2500')
+        resumed.update_many(data[2500:])
+        whole = StreamingStats().update_many(data)
+        self.assertEqual(resumed.count, whole.count)
+        self.assertAlmostEqual(resumed.mean, whole.mean, places=9)
+        self.assertAlmostEqual(resumed.variance, whole.variance, places=6)
+        self.assertEqual(resumed.histogram, whole.histogram)
+
+
+if __name__ == '__main__':
+    unittest.main()